@@ -1,7 +1,8 @@
 from flask import Flask, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from config import Config
-from extensions import db, login_manager
+from extensions import db, login_manager, query_profiler, init_sqlite_pragmas
+from utils.query_budget import init_query_budget, query_budget
 import os
 
 # Initialisation de l'application
@@ -10,10 +11,15 @@ app.config.from_object(Config)
 
 # Initialisation des extensions
 db.init_app(app)
+init_sqlite_pragmas(app)
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Veuillez vous connecter pour accéder à cette page.'
 
+# Profilage SQL et budget de requêtes par route (détection des N+1)
+query_profiler.init_app(app)
+init_query_budget(app)
+
 # Créer les dossiers nécessaires
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PDF_FOLDER'], exist_ok=True)
@@ -21,8 +27,22 @@ os.makedirs(app.config['PDF_FOLDER'], exist_ok=True)
 # Import des modèles (après db)
 from models import User, Patient, Appointment, Questionnaire, QuestionnaireResponse
 
+# Polices et styles PDF (une fois par processus) et file d'attente des générations
+from utils.pdf_generator import init_pdf_resources
+from utils.pdf_jobs import pdf_job_queue
+init_pdf_resources(app)
+pdf_job_queue.init_app(app)
+
+# Clients Google API (credentials chargés une fois par processus)
+from utils.google_clients import google_clients
+google_clients.init_app(app)
+
+# Exports Google Docs/Sheets en arrière-plan
+from utils.export_outbox import export_outbox
+export_outbox.init_app(app)
+
 # Import des routes
-from routes import auth, patients, appointments, questionnaires, documents
+from routes import auth, patients, appointments, questionnaires, documents, analytics, changes, exports
 
 # Enregistrement des blueprints
 app.register_blueprint(auth.bp)
@@ -30,6 +50,9 @@ app.register_blueprint(patients.bp)
 app.register_blueprint(appointments.bp)
 app.register_blueprint(questionnaires.bp)
 app.register_blueprint(documents.bp)
+app.register_blueprint(analytics.bp)
+app.register_blueprint(changes.bp)
+app.register_blueprint(exports.bp)
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -44,30 +67,18 @@ def index():
 
 @app.route('/dashboard')
 @login_required
+@query_budget(3)
 def dashboard():
     """Tableau de bord principal"""
-    from datetime import datetime, timedelta
-
-    # Statistiques du jour
-    today = datetime.now().date()
-    today_appointments = Appointment.query.filter(
-        Appointment.date == today
-    ).all()
-
-    # Rendez-vous à venir
-    upcoming_appointments = Appointment.query.filter(
-        Appointment.date >= today
-    ).order_by(Appointment.date, Appointment.time).limit(5).all()
+    from utils.dashboard import get_dashboard_data
 
-    # Statistiques générales
-    total_patients = Patient.query.count()
-    total_appointments = Appointment.query.count()
+    data = get_dashboard_data()
 
     return render_template('dashboard.html',
-                         today_appointments=today_appointments,
-                         upcoming_appointments=upcoming_appointments,
-                         total_patients=total_patients,
-                         total_appointments=total_appointments)
+                         today_appointments=data['today_appointments'],
+                         upcoming_appointments=data['upcoming_appointments'],
+                         total_patients=data['total_patients'],
+                         total_appointments=data['total_appointments'])
 
 if __name__ == '__main__':
     with app.app_context():
@@ -0,0 +1,99 @@
+"""
+Benchmark : coût de préparation des clients Google API
+Compare l'ancien comportement (credentials relus et trois services construits à chaque
+requête) au fournisseur partagé : démarrage (premier appel) puis coût par requête.
+Hors ligne : une clé de compte de service jetable est générée et le jeton est simulé,
+l'aller-retour OAuth que l'ancien code payait à chaque requête n'est donc pas compté.
+
+Usage : python benchmarks/google_clients.py [--iterations 200]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import rsa
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.google_clients import SCOPES, GoogleClientProvider  # noqa: E402
+
+
+def write_credentials(directory):
+    """Fichier de compte de service factice (clé RSA générée pour l'occasion)"""
+    _, private_key = rsa.newkeys(2048)
+    path = os.path.join(directory, 'google_credentials.json')
+    with open(path, 'w') as f:
+        json.dump({
+            'type': 'service_account',
+            'project_id': 'benchmark',
+            'private_key_id': 'benchmark',
+            'private_key': private_key.save_pkcs1().decode(),
+            'client_email': 'benchmark@benchmark.iam.gserviceaccount.com',
+            'client_id': '0',
+            'token_uri': 'https://oauth2.googleapis.com/token',
+        }, f)
+    return path
+
+
+def legacy_request(credentials_file):
+    """Ce que faisait chaque requête : lecture des credentials et trois build()"""
+    credentials = service_account.Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+    return (build('docs', 'v1', credentials=credentials),
+            build('sheets', 'v4', credentials=credentials),
+            build('drive', 'v3', credentials=credentials))
+
+
+def provider_request(provider):
+    """Requête avec le fournisseur partagé"""
+    return provider.service('docs'), provider.service('sheets'), provider.service('drive')
+
+
+def measure(function, iterations):
+    """Durées (ms) de `iterations` appels"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label, timings):
+    print(f"  {label:<38} médiane {statistics.median(timings):8.3f} ms   max {max(timings):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        credentials_file = write_credentials(directory)
+
+        print(f"Clients Google API ({args.iterations} requêtes)")
+        report('ancien : credentials + 3 build()', measure(lambda: legacy_request(credentials_file), args.iterations))
+
+        provider = GoogleClientProvider()
+        provider.credentials_file = credentials_file
+
+        started = time.perf_counter()
+        credentials = provider.credentials
+        # Jeton simulé : pas d'appel réseau vers oauth2.googleapis.com
+        credentials.token = 'benchmark'
+        credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+        provider_request(provider)
+        print(f"  {'fournisseur : démarrage (1er appel)':<38} {(time.perf_counter() - started) * 1000:8.3f} ms")
+
+        report('fournisseur : par requête', measure(lambda: provider_request(provider), args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark : coût de préparation d'un PDFGenerator
+Compare la reconstruction de la feuille de styles à chaque instance
+(ancien comportement) et le registre partagé, puis mesure un rendu complet
+
+Usage : python benchmarks/pdf_setup.py [--iterations 2000]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import TableStyle
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.pdf_generator import PDFGenerator  # noqa: E402
+
+
+def legacy_setup():
+    """Préparation telle qu'elle était faite à chaque instanciation et chaque tableau"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='CustomTitle', parent=styles['Heading1'], fontSize=18,
+                              textColor=colors.HexColor('#2c3e50'), spaceAfter=30, alignment=TA_CENTER))
+    styles.add(ParagraphStyle(name='CustomHeading', parent=styles['Heading2'], fontSize=14,
+                              textColor=colors.HexColor('#34495e'), spaceAfter=12, spaceBefore=12))
+    styles.add(ParagraphStyle(name='CustomBody', parent=styles['Normal'], fontSize=11, spaceAfter=8))
+    for _ in range(4):
+        TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8)
+        ])
+    return styles
+
+
+def sample_session():
+    """Séance fictive (aucune base de données nécessaire)"""
+    patient = SimpleNamespace(first_name='Camille', last_name='Durand')
+    return SimpleNamespace(
+        patient=patient, session_date=datetime(2024, 3, 1, 10), therapy_type='TCC', session_number=4,
+        objectives='Travail sur les pensées automatiques.', interventions='Restructuration cognitive.',
+        patient_progress='Bonne implication.', mood_score=6, anxiety_score=4,
+        homework='Tableau de Beck quotidien.', next_session_plan='Exposition graduée.'
+    )
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    PDFGenerator()  # Construction initiale du registre
+    session = sample_session()
+
+    legacy = timed(legacy_setup, args.iterations)
+    shared = timed(PDFGenerator, args.iterations)
+    render = timed(lambda: PDFGenerator().generate_session_report(session, io.BytesIO()), max(args.iterations // 20, 10))
+
+    print(f"{'Préparation (ancienne)':<28}{legacy:10.1f} µs / document")
+    print(f"{'Préparation (registre)':<28}{shared:10.1f} µs / document")
+    print(f"{'Rendu complet (séance)':<28}{render:10.1f} µs / document")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark : débit lecture/écriture concurrent sur SQLite
+Compare la configuration par défaut et le profil de production
+(WAL, synchronous=NORMAL, cache, mmap, busy_timeout, pool de connexions)
+
+Usage : python benchmarks/sqlite_concurrency.py [--seconds 5] [--readers 4] [--writers 1]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import Config, _engine_options  # noqa: E402
+from extensions import apply_sqlite_pragmas  # noqa: E402
+
+
+def make_engine(path, tuned):
+    """Moteur SQLAlchemy par défaut ou avec le profil de production"""
+    uri = f'sqlite:///{path}'
+    if not tuned:
+        return create_engine(uri)
+
+    engine = create_engine(uri, **_engine_options(uri))
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, Config.SQLITE_PRAGMAS)
+
+    return engine
+
+
+def prepare(engine, rows=20000):
+    """Créer une table de rendez-vous et la remplir"""
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE appointments (id INTEGER PRIMARY KEY, patient_id INTEGER, '
+            'date DATE, time TIME, status VARCHAR(50))'
+        ))
+        conn.execute(text('CREATE INDEX ix_date ON appointments (date, time, status)'))
+        conn.execute(
+            text('INSERT INTO appointments (patient_id, date, time, status) VALUES (:p, :d, :t, :s)'),
+            [{'p': i % 500, 'd': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+              't': f'{9 + i % 9:02d}:00', 's': 'scheduled'} for i in range(rows)]
+        )
+
+
+def run(engine, seconds, readers, writers):
+    """Lancer lecteurs et écrivains en parallèle ; retourne (lectures, écritures, erreurs)"""
+    counters = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def reader(n):
+        while time.monotonic() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text(
+                        "SELECT * FROM appointments WHERE date BETWEEN :a AND :b ORDER BY date, time"
+                    ), {'a': f'2024-{n % 12 + 1:02d}-01', 'b': f'2024-{n % 12 + 1:02d}-07'}).fetchall()
+                key = 'reads'
+            except OperationalError:
+                key = 'errors'
+            with lock:
+                counters[key] += 1
+
+    def writer(n):
+        i = 0
+        while time.monotonic() < deadline:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        "INSERT INTO appointments (patient_id, date, time, status) "
+                        "VALUES (:p, '2024-06-15', '10:00', 'scheduled')"
+                    ), {'p': n * 100000 + i})
+                key = 'writes'
+            except OperationalError:
+                key = 'errors'
+            i += 1
+            with lock:
+                counters[key] += 1
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.readers} lecteur(s), {args.writers} écrivain(s), {args.seconds:.0f} s par configuration\n")
+    print(f"{'Configuration':<16}{'lectures/s':>12}{'écritures/s':>14}{'erreurs':>10}")
+
+    for label, tuned in (('par défaut', False), ('production', True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_engine(os.path.join(tmp, 'bench.db'), tuned)
+            prepare(engine)
+            counters = run(engine, args.seconds, args.readers, args.writers)
+            engine.dispose()
+        print(f"{label:<16}{counters['reads'] / args.seconds:>12.0f}"
+              f"{counters['writes'] / args.seconds:>14.0f}{counters['errors']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,29 @@ from dotenv import load_dotenv
 basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env'))
 
+
+def _engine_options(database_uri):
+    """Options du moteur SQLAlchemy adaptées à la base utilisée"""
+    if database_uri.startswith('sqlite'):
+        if ':memory:' in database_uri or database_uri.rstrip('/') == 'sqlite:':
+            return {}
+        # SQLite fichier : pool de connexions persistantes (les PRAGMA ne sont
+        # exécutés qu'à l'ouverture), attente plutôt qu'erreur si la base est verrouillée
+        return {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'connect_args': {'timeout': 30, 'check_same_thread': False},
+        }
+
+    # PostgreSQL et autres serveurs : connexions vérifiées et recyclées
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    }
+
+
 class Config:
     """Configuration de base pour l'application"""
 
@@ -14,18 +37,113 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'cabinet.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # PRAGMA appliqués à chaque nouvelle connexion SQLite
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # Les lecteurs ne bloquent plus l'écrivain (et inversement)
+        'synchronous': 'NORMAL',  # Sûr en mode WAL, beaucoup moins de fsync
+        'cache_size': -20000,  # Cache de pages d'environ 20 Mo
+        'mmap_size': 268435456,  # Lecture par mmap jusqu'à 256 Mo
+        'busy_timeout': 5000,  # Attendre un verrou jusqu'à 5 s
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+    }
 
     # Configuration Google API
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
     GOOGLE_REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI')
 
+    # Clients Google API partagés : compte de service, délai HTTP (s), renouvellement du jeton
+    # lorsqu'il expire dans moins de GOOGLE_TOKEN_REFRESH_MARGIN secondes
+    GOOGLE_CREDENTIALS_FILE = os.environ.get('GOOGLE_CREDENTIALS_FILE') or os.path.join(basedir, 'google_credentials.json')
+    GOOGLE_HTTP_TIMEOUT = int(os.environ.get('GOOGLE_HTTP_TIMEOUT', 30))
+    GOOGLE_TOKEN_REFRESH_MARGIN = 300
+
+    # Exports Google en arrière-plan (file export_outbox) : exports simultanés, tentatives,
+    # délai avant la 1re relance (doublé ensuite), scrutation et délai d'abandon (secondes)
+    GOOGLE_EXPORT_WORKERS = int(os.environ.get('GOOGLE_EXPORT_WORKERS', 2))
+    GOOGLE_EXPORT_MAX_ATTEMPTS = 6
+    GOOGLE_EXPORT_RETRY_DELAY = 10
+    GOOGLE_EXPORT_POLL_INTERVAL = 5
+    GOOGLE_EXPORT_TIMEOUT = 600
+
+    # Synchronisation Google Sheets : quota d'écriture (requêtes/minute), rafale et reprises
+    SHEETS_REQUESTS_PER_MINUTE = int(os.environ.get('SHEETS_REQUESTS_PER_MINUTE', 60))
+    SHEETS_BURST = 5
+    SHEETS_MAX_RETRIES = 5
+    # Service Sheets simulé en mémoire (utils/fake_sheets.py) quand aucun compte n'est configuré
+    GOOGLE_SHEETS_FAKE = os.environ.get('GOOGLE_SHEETS_FAKE', '').lower() in ('1', 'true', 'yes')
+
     # Dossiers de stockage
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
     PDF_FOLDER = os.path.join(basedir, 'generated_pdfs')
 
+    # Polices TrueType supplémentaires pour les PDF {nom: chemin du fichier .ttf}
+    PDF_FONTS = {}
+
+    # Génération des PDF en arrière-plan
+    PDF_WORKERS = int(os.environ.get('PDF_WORKERS', 2))  # Rendus simultanés
+    PDF_JOB_MAX_ATTEMPTS = 3
+    PDF_JOB_RETRY_DELAY = 5  # Secondes avant la 1re relance (doublé ensuite)
+    PDF_JOB_TIMEOUT = 600  # Travail considéré comme interrompu après ce délai (secondes)
+
+    # Cache des PDF (un fichier par version des données sources)
+    PDF_CACHE_FOLDER = os.path.join(PDF_FOLDER, 'cache')
+    PDF_CACHE_MAX_BYTES = 500 * 1024 * 1024
+    PDF_CACHE_MAX_AGE_DAYS = 180
+
+    # Envoi direct (?stream=1) : taille au-delà de laquelle le rendu déborde sur disque
+    PDF_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+    # Dossier patient : séances lues par lots, points par courbe
+    PDF_DOSSIER_CHUNK_SIZE = 200
+    PDF_CHART_MAX_POINTS = 120
+
+    # Export groupé : processus de rendu en parallèle, dossier et durée de conservation (jours)
+    PDF_EXPORT_WORKERS = int(os.environ.get('PDF_EXPORT_WORKERS', os.cpu_count() or 2))
+    PDF_EXPORT_FOLDER = os.path.join(PDF_FOLDER, 'exports')
+    PDF_EXPORT_MAX_AGE_DAYS = 7
+
+    # Export CSV / NDJSON des données : lignes lues par lot en base
+    DATA_EXPORT_CHUNK_SIZE = 1000
+
     # Configuration de pagination
     ITEMS_PER_PAGE = 20
 
+    # Calendrier : durée de conservation des grilles mensuelles (secondes)
+    CALENDAR_CACHE_TTL = 600
+
+    # Tableau de bord : période affichée (jours) et durée du cache des compteurs (secondes)
+    DASHBOARD_WINDOW_DAYS = 7
+    DASHBOARD_STATS_TTL = 60
+
+    # Budget de requêtes SQL par route (toujours vérifié en mode TESTING)
+    QUERY_BUDGET_ENFORCE = False
+
+    # Profilage SQL : en-tête Server-Timing, panneau de debug et journal des requêtes lentes
+    SQL_SERVER_TIMING = True
+    SQL_DEBUG_PANEL = os.environ.get('SQL_DEBUG_PANEL', '').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_LOG = os.path.join(basedir, 'logs', 'slow_queries.log')
+    SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 5
+
+    # Analyse de l'évolution : séances par moyenne glissante, durée maximale du cache (secondes)
+    ANALYTICS_ROLLING_WINDOW = 3
+    ANALYTICS_CACHE_TTL = 3600
+
+    # Recherche de patients : durée de vie de l'index en mémoire (bases sans FTS5), en secondes
+    PATIENT_SEARCH_INDEX_TTL = 300
+
+    # Horaires d'ouverture du cabinet (créneaux proposés à la prise de rendez-vous)
+    OPENING_TIME = '09:00'
+    CLOSING_TIME = '18:00'
+    BREAKS = []  # Pauses, ex. [('12:30', '13:30')]
+    OPEN_WEEKDAYS = [0, 1, 2, 3, 4, 5, 6]  # 0 = lundi
+    SLOT_DURATION = 60  # Durée d'un créneau en minutes
+    SLOT_GRANULARITY = 60  # Écart entre deux débuts de créneau en minutes
+
     # Fuseau horaire
     TIMEZONE = 'Europe/Paris'
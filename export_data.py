@@ -0,0 +1,67 @@
+"""
+Export des données cliniques en CSV ou NDJSON
+Les lignes sont écrites au fil de la lecture (mémoire constante) ; les réponses aux
+questionnaires sont aplaties, une colonne par sous-échelle et par item
+
+Exemples :
+    python export_data.py responses --questionnaire PHQ-9 -o phq9.csv
+    python export_data.py sessions --format ndjson -o - | gzip > sessions.ndjson.gz
+"""
+
+import argparse
+import sys
+import time
+
+from app import app
+from utils.data_export import DATASETS, FORMATS, UnknownQuestionnaire, open_export, stream_export
+
+
+class _CountingRows:
+    """Compte les lignes lues au passage"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporter un jeu de données en CSV ou NDJSON")
+    parser.add_argument('dataset', choices=DATASETS)
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv', help="défaut : csv")
+    parser.add_argument('--questionnaire', help="sigle du questionnaire (réponses uniquement)")
+    parser.add_argument('--patient', type=int, help="limiter à un patient")
+    parser.add_argument('--chunk-size', type=int, help="lignes lues par lot (défaut : configuration)")
+    parser.add_argument('-o', '--output', default='-', help="fichier de sortie ('-' : sortie standard)")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        try:
+            export = open_export(args.dataset, patient_id=args.patient, questionnaire=args.questionnaire,
+                                 chunk_size=args.chunk_size or app.config['DATA_EXPORT_CHUNK_SIZE'])
+        except UnknownQuestionnaire as e:
+            print(f"✗ {e}", file=sys.stderr)
+            return 1
+        export.rows = counter = _CountingRows(export.rows)
+
+        started = time.perf_counter()
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+        try:
+            for chunk in stream_export(export, args.format):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+
+        rate = counter.count / elapsed if elapsed else 0
+        print(f"✓ {counter.count} ligne(s) exportée(s) en {elapsed:.2f} s ({rate:.0f} lignes/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Export groupé des documents PDF en ligne de commande
+
+Exemples :
+    python export_pdfs.py --patient 12 -o dossier_12.zip
+    python export_pdfs.py --start 2024-01-01 --end 2024-12-31 -o bilan_2024.zip
+    python export_pdfs.py --patient 12 --format pdf -o dossier_12.pdf
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from app import app
+from utils.pdf_export import count_items, iter_items, export_zip, export_merged
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def print_progress(started):
+    """Afficher l'avancement sur une seule ligne"""
+    def progress(done, total):
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed else 0
+        sys.stdout.write(f"\r  {done}/{total} documents ({rate:.1f}/s)")
+        sys.stdout.flush()
+        if done == total:
+            sys.stdout.write("\n")
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporter séances et questionnaires en PDF")
+    parser.add_argument('--patient', type=int, help="identifiant du patient")
+    parser.add_argument('--start', type=parse_date, help="première date incluse (AAAA-MM-JJ)")
+    parser.add_argument('--end', type=parse_date, help="dernière date incluse (AAAA-MM-JJ)")
+    parser.add_argument('--format', choices=['zip', 'pdf'], default='zip',
+                        help="archive ZIP (un fichier par document) ou PDF unique")
+    parser.add_argument('--workers', type=int, help="processus de rendu (défaut : PDF_EXPORT_WORKERS)")
+    parser.add_argument('-o', '--output', required=True, help="fichier à écrire")
+    args = parser.parse_args(argv)
+
+    if args.patient is None and args.start is None and args.end is None:
+        parser.error("préciser --patient et/ou une période (--start / --end)")
+
+    with app.app_context():
+        total = count_items(args.patient, args.start, args.end)
+        if not total:
+            print("Aucun document à exporter")
+            return 1
+
+        print(f"Export de {total} document(s) vers {args.output}")
+        items = iter_items(args.patient, args.start, args.end)
+        started = time.perf_counter()
+        if args.format == 'pdf':
+            export_merged(items, args.output, total=total, progress=print_progress(started))
+        else:
+            export_zip(items, args.output, total=total,
+                       workers=args.workers or app.config['PDF_EXPORT_WORKERS'],
+                       fonts=app.config['PDF_FONTS'],
+                       progress=print_progress(started))
+
+        print(f"✓ Export terminé en {time.perf_counter() - started:.1f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,38 @@ Extensions Flask
 Séparation des extensions pour éviter les importations circulaires
 """
 
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from flask_login import LoginManager
+from utils.query_profiler import QueryProfiler
 
 # Initialisation des extensions
 db = SQLAlchemy()
 login_manager = LoginManager()
+query_profiler = QueryProfiler()
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """Exécuter les PRAGMA sur une connexion SQLite"""
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def init_sqlite_pragmas(app):
+    """Appliquer SQLITE_PRAGMAS à chaque connexion ouverte par l'application"""
+    pragmas = app.config['SQLITE_PRAGMAS']
+
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            apply_sqlite_pragmas(dbapi_connection, pragmas)
@@ -5,8 +5,72 @@ avec les tables et les questionnaires pré-définis
 
 from app import app
 from extensions import db
+from sqlalchemy import inspect, text
 from models import User, Questionnaire
 from utils.predefined_questionnaires import get_predefined_questionnaires
+from utils.patient_search import ensure_search_index
+from utils.patient_summary import rebuild_summaries
+
+def add_column(conn, table, column):
+    """Ajouter une colonne à une table existante, lignes existantes comprises
+
+    La valeur par défaut côté serveur (server_default) est reprise dans l'ALTER TABLE ;
+    une valeur par défaut Python (default) est recopiée dans les lignes existantes,
+    et NOT NULL n'est posé qu'une fois ces lignes remplies (impossible sous SQLite).
+    """
+    dialect = conn.dialect
+    compiler = dialect.ddl_compiler(dialect, None)
+    spec = f'{compiler.preparer.format_column(column)} {column.type.compile(dialect=dialect)}'
+    server_default = compiler.get_column_default_string(column)
+    if server_default is not None:
+        spec += f' DEFAULT {server_default}'
+        if not column.nullable:
+            spec += ' NOT NULL'
+    conn.execute(text(f'ALTER TABLE {compiler.preparer.format_table(table)} ADD COLUMN {spec}'))
+
+    default = column.default
+    if server_default is not None or default is None or default.is_sequence:
+        return
+    if default.is_clause_element:
+        value = default.arg
+    elif default.is_callable:
+        value = default.arg(None)
+    else:
+        value = default.arg
+    conn.execute(table.update().where(column.is_(None)).values({column.name: value}))
+
+    if not column.nullable and dialect.name != 'sqlite':
+        conn.execute(text(
+            f'ALTER TABLE {compiler.preparer.format_table(table)} '
+            f'ALTER COLUMN {compiler.preparer.format_column(column)} SET NOT NULL'
+        ))
+
+
+def upgrade_database():
+    """Mettre à jour le schéma d'une base existante (colonnes et index manquants)"""
+    # db.create_all() crée les tables absentes mais ne modifie jamais
+    # une table existante : on ajoute ici ce qui manque aux anciennes bases
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            with db.engine.begin() as conn:
+                add_column(conn, table, column)
+            print(f"  ✓ Colonne ajoutée: {table.name}.{column.name}")
+
+        existing_indexes = {idx['name'] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            index.create(bind=db.engine, checkfirst=True)
+            print(f"  ✓ Index créé: {index.name}")
 
 def init_database():
     """Initialiser la base de données"""
@@ -16,6 +80,20 @@ def init_database():
         db.create_all()
         print("✓ Tables créées")
 
+        # Mettre à niveau les bases créées par une version précédente
+        print("\nMise à jour du schéma...")
+        upgrade_database()
+        print("✓ Schéma à jour")
+
+        # Index de recherche plein texte des patients
+        if ensure_search_index():
+            print("✓ Index de recherche des patients (FTS5) à jour")
+        else:
+            print("✓ Recherche des patients par index en mémoire (FTS5 indisponible)")
+
+        # Synthèses dénormalisées affichées dans la liste des patients
+        print(f"✓ Synthèse de {rebuild_summaries()} patient(s) à jour")
+
         # Vérifier s'il y a déjà des questionnaires
         existing_questionnaires = Questionnaire.query.count()
 
@@ -31,6 +109,7 @@ def init_database():
                     category=q_data['category'],
                     questions=q_data['questions'],
                     scoring_method=q_data['scoring_method'],
+                    scoring=q_data.get('scoring'),
                     interpretation=q_data['interpretation'],
                     active=True
                 )
@@ -26,6 +26,10 @@ class User(UserMixin, db.Model):
 class Patient(db.Model):
     """Modèle pour les patients"""
     __tablename__ = 'patients'
+    __table_args__ = (
+        # Liste des patients actifs triée par nom
+        db.Index('ix_patients_active_name', 'active', 'last_name', 'first_name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(100), nullable=False)
@@ -46,6 +50,9 @@ class Patient(db.Model):
     first_session_date = db.Column(db.Date)
     notes = db.Column(db.Text)
 
+    # Feuille de suivi Google Sheets synchronisée (utils/sheets_sync.py)
+    google_spreadsheet_id = db.Column(db.String(200))
+
     # Métadonnées
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -55,14 +62,50 @@ class Patient(db.Model):
     appointments = db.relationship('Appointment', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     questionnaire_responses = db.relationship('QuestionnaireResponse', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
     sessions = db.relationship('TherapySession', backref='patient', lazy='dynamic', cascade='all, delete-orphan')
+    # Synthèse maintenue par utils/patient_summary.py (lecture seule côté ORM)
+    summary = db.relationship('PatientSummary', uselist=False, viewonly=True)
 
     def __repr__(self):
         return f'<Patient {self.first_name} {self.last_name}>'
 
 
+class PatientSummary(db.Model):
+    """Synthèse dénormalisée d'un patient (rendez-vous, séances, derniers scores)"""
+    __tablename__ = 'patient_summary'
+    __table_args__ = (
+        # Synthèses dont le prochain rendez-vous est passé et doit être recalculé
+        db.Index('ix_patient_summary_next_appointment', 'next_appointment_date'),
+    )
+
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id', ondelete='CASCADE'), primary_key=True)
+
+    last_appointment_date = db.Column(db.Date)
+    next_appointment_id = db.Column(db.Integer)
+    next_appointment_date = db.Column(db.Date)
+    next_appointment_time = db.Column(db.Time)
+
+    session_count = db.Column(db.Integer, default=0)
+    last_session_date = db.Column(db.DateTime)
+    last_mood_score = db.Column(db.Integer)
+    last_anxiety_score = db.Column(db.Integer)
+
+    latest_scores = db.Column(db.JSON)  # Dernier score par questionnaire (sigle -> score, date)
+
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PatientSummary Patient {self.patient_id}>'
+
+
 class Appointment(db.Model):
     """Modèle pour les rendez-vous"""
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # Calendrier, tableau de bord et recherche de créneaux
+        db.Index('ix_appointments_date_time_status', 'date', 'time', 'status'),
+        # Historique des rendez-vous d'un patient
+        db.Index('ix_appointments_patient_date', 'patient_id', 'date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
@@ -85,6 +128,9 @@ class Appointment(db.Model):
 class TherapySession(db.Model):
     """Modèle pour les séances de thérapie (notes détaillées)"""
     __tablename__ = 'therapy_sessions'
+    __table_args__ = (
+        db.Index('ix_therapy_sessions_patient_date', 'patient_id', 'session_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
@@ -122,10 +168,12 @@ class Questionnaire(db.Model):
     category = db.Column(db.String(100))  # Anxiété, Dépression, etc.
     questions = db.Column(db.JSON)  # Liste des questions au format JSON
     scoring_method = db.Column(db.Text)  # Instructions de cotation
+    scoring = db.Column(db.JSON)  # Règles de cotation : agrégation, sous-échelles, seuils
     interpretation = db.Column(db.Text)  # Guide d'interprétation
 
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relations
     responses = db.relationship('QuestionnaireResponse', backref='questionnaire', lazy='dynamic')
@@ -137,6 +185,9 @@ class Questionnaire(db.Model):
 class QuestionnaireResponse(db.Model):
     """Modèle pour les réponses aux questionnaires"""
     __tablename__ = 'questionnaire_responses'
+    __table_args__ = (
+        db.Index('ix_questionnaire_responses_patient_completed', 'patient_id', 'completed_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     questionnaire_id = db.Column(db.Integer, db.ForeignKey('questionnaires.id'), nullable=False)
@@ -145,10 +196,12 @@ class QuestionnaireResponse(db.Model):
 
     responses = db.Column(db.JSON)  # Réponses au format JSON
     total_score = db.Column(db.Float)
+    subscale_scores = db.Column(db.JSON)  # Scores par sous-échelle
     interpretation = db.Column(db.Text)
 
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
     notes = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f'<QuestionnaireResponse {self.questionnaire_id} - Patient {self.patient_id}>'
@@ -157,15 +210,124 @@ class QuestionnaireResponse(db.Model):
 class Document(db.Model):
     """Modèle pour les documents générés"""
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_patient_created', 'patient_id', 'created_at'),
+        # Document PDF déjà enregistré pour les mêmes données sources
+        db.Index('ix_documents_patient_fingerprint', 'patient_id', 'fingerprint'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'))
     document_type = db.Column(db.String(100))  # Compte-rendu, Ordonnance, etc.
     title = db.Column(db.String(200))
     file_path = db.Column(db.String(500))
+    fingerprint = db.Column(db.String(64))  # Empreinte des données sources d'un PDF généré
     google_doc_id = db.Column(db.String(200))  # ID du document Google Docs si intégré
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f'<Document {self.title}>'
+
+
+class PdfJob(db.Model):
+    """Modèle pour les générations de PDF en arrière-plan"""
+    __tablename__ = 'pdf_jobs'
+    __table_args__ = (
+        db.Index('ix_pdf_jobs_status', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # session_report, questionnaire_report, patient_file, export
+    target_id = db.Column(db.Integer, nullable=False)  # Séance, réponse ou patient concerné (0 : export du cabinet)
+    params = db.Column(db.JSON)  # Export groupé : patient, période et format
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'))
+    status = db.Column(db.String(20), default='pending')  # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    progress_done = db.Column(db.Integer)  # Export groupé : documents rendus / à rendre
+    progress_total = db.Column(db.Integer)
+
+    file_path = db.Column(db.String(500))
+    download_name = db.Column(db.String(255))
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'))
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PdfJob {self.id} {self.kind} {self.status}>'
+
+
+class ExportOutbox(db.Model):
+    """Export Google (Docs, Sheets) en attente ; son Document est créé une fois l'export réussi"""
+    __tablename__ = 'export_outbox'
+    __table_args__ = (
+        # Exports à reprendre par le worker, par échéance
+        db.Index('ix_export_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # gdocs_session, sheets_patient
+    target_id = db.Column(db.Integer, nullable=False)  # Séance ou patient exporté
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'))
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'))
+    status = db.Column(db.String(20), default='pending')  # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32))  # Jeton du worker qui exécute l'export
+
+    google_id = db.Column(db.String(200))  # Document ou classeur Google obtenu
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    document = db.relationship('Document')
+
+    def __repr__(self):
+        return f'<ExportOutbox {self.id} {self.kind} {self.status}>'
+
+
+class SheetSyncState(db.Model):
+    """Dernière version d'une séance ou d'une réponse écrite dans une feuille Google Sheets"""
+    __tablename__ = 'sheet_sync_state'
+    __table_args__ = (
+        db.UniqueConstraint('spreadsheet_id', 'record_type', 'record_id', name='uq_sheet_sync_state_record'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    spreadsheet_id = db.Column(db.String(200), nullable=False)
+    record_type = db.Column(db.String(20), nullable=False)  # session, questionnaire
+    record_id = db.Column(db.Integer, nullable=False)
+    row_number = db.Column(db.Integer, nullable=False)  # Ligne occupée dans l'onglet (1 = en-têtes)
+    content_hash = db.Column(db.String(40), nullable=False)  # SHA-1 des valeurs écrites
+
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SheetSyncState {self.record_type} {self.record_id} -> ligne {self.row_number}>'
+
+
+class ChangeLog(db.Model):
+    """Journal des écritures sur les données cliniques, dans l'ordre de leur numéro de séquence"""
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        # Historique des changements d'un enregistrement
+        db.Index('ix_change_log_entity', 'entity', 'entity_id'),
+        # AUTOINCREMENT : un numéro n'est jamais réutilisé, même après suppression
+        {'sqlite_autoincrement': True},
+    )
+
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)  # Nom de la table (patients, appointments...)
+    entity_id = db.Column(db.Integer, nullable=False)
+    patient_id = db.Column(db.Integer)
+    operation = db.Column(db.String(10), nullable=False)  # insert, update, delete
+    fields = db.Column(db.JSON)  # Colonnes modifiées (update)
+
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ChangeLog {self.seq} {self.operation} {self.entity} {self.entity_id}>'
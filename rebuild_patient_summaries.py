@@ -0,0 +1,40 @@
+"""
+Reconstruction de la synthèse des patients (table patient_summary)
+La table est tenue à jour à chaque écriture ; à lancer après un import direct
+en base ou une modification des questionnaires (sigles)
+
+Exemple :
+    python rebuild_patient_summaries.py --chunk-size 1000
+"""
+
+import argparse
+import sys
+import time
+
+from app import app
+from utils.patient_summary import rebuild_summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalculer la synthèse de tous les patients")
+    parser.add_argument('--chunk-size', type=int, default=500, help="patients par lot (défaut : 500)")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        started = time.perf_counter()
+
+        def progress(processed):
+            sys.stdout.write(f"\r  {processed} patients traités")
+            sys.stdout.flush()
+
+        processed = rebuild_summaries(chunk_size=args.chunk_size, progress=progress)
+        elapsed = time.perf_counter() - started
+        if processed:
+            sys.stdout.write("\n")
+
+        print(f"✓ Synthèse de {processed} patient(s) reconstruite en {elapsed:.2f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
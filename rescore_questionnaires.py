@@ -0,0 +1,61 @@
+"""
+Recalcul des scores des questionnaires déjà passés
+À lancer après une modification des règles de cotation
+
+Exemples :
+    python rescore_questionnaires.py
+    python rescore_questionnaires.py --questionnaire HAD --dry-run
+"""
+
+import argparse
+import sys
+import time
+
+from app import app
+from models import Questionnaire
+from utils.scoring import backfill_scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalculer scores et interprétations des réponses enregistrées")
+    parser.add_argument('--questionnaire', action='append', metavar='SIGLE',
+                        help="limiter à un questionnaire (ex. HAD), option répétable")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="réponses par lot (défaut : 1000)")
+    parser.add_argument('--dry-run', action='store_true', help="compter les changements sans rien écrire")
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        questionnaire_ids = None
+        if args.questionnaire:
+            found = Questionnaire.query.filter(Questionnaire.short_name.in_(args.questionnaire)).all()
+            missing = set(args.questionnaire) - {q.short_name for q in found}
+            if missing:
+                print(f"Questionnaire(s) introuvable(s) : {', '.join(sorted(missing))}")
+                return 1
+            questionnaire_ids = [q.id for q in found]
+
+        started = time.perf_counter()
+
+        def progress(scanned, changed):
+            elapsed = time.perf_counter() - started
+            rate = scanned / elapsed if elapsed else 0
+            sys.stdout.write(f"\r  {scanned} réponses lues, {changed} à mettre à jour ({rate:.0f}/s)")
+            sys.stdout.flush()
+
+        scanned, changed = backfill_scores(
+            chunk_size=args.chunk_size,
+            questionnaire_ids=questionnaire_ids,
+            dry_run=args.dry_run,
+            progress=progress
+        )
+        elapsed = time.perf_counter() - started
+        if scanned:
+            sys.stdout.write("\n")
+
+        verb = "seraient mises à jour" if args.dry_run else "mises à jour"
+        print(f"✓ {scanned} réponse(s) lue(s), {changed} {verb} en {elapsed:.2f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
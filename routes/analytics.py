@@ -0,0 +1,31 @@
+from flask import Blueprint, jsonify, request
+from flask_login import login_required
+from models import Patient, Questionnaire
+from utils.analytics import get_analytics
+
+bp = Blueprint('analytics', __name__, url_prefix='/analytics')
+
+@bp.route('/patients/<int:patient_id>')
+@login_required
+def patient_trajectory(patient_id):
+    """Évolution d'un patient : notes de séance et scores, moyennes glissantes, changement fiable"""
+    Patient.query.get_or_404(patient_id)
+    return jsonify(get_analytics().patient_trajectory(patient_id))
+
+@bp.route('/reliable-change')
+@login_required
+def reliable_change():
+    """Changement fiable de chaque patient, éventuellement pour un seul questionnaire (?questionnaire=HAD)"""
+    questionnaire_id = None
+    short_name = request.args.get('questionnaire')
+    if short_name:
+        questionnaire = Questionnaire.query.filter_by(short_name=short_name).first_or_404()
+        questionnaire_id = questionnaire.id
+
+    return jsonify(get_analytics().reliable_change(questionnaire_id))
+
+@bp.route('/cohorts')
+@login_required
+def cohorts():
+    """Synthèse de l'évolution par type de thérapie"""
+    return jsonify(get_analytics().cohorts)
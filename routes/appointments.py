@@ -1,58 +1,91 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required
 from models import Appointment, Patient
 from extensions import db
+from utils.dashboard import get_dashboard_data
+from utils.availability import AvailabilityEngine
+from utils.calendar_grid import month_grid
+from utils.pagination import KeysetPage
+from utils.query_budget import query_budget
+from werkzeug.http import is_resource_modified
 from datetime import datetime, timedelta, date, time
+import hashlib
 
 bp = Blueprint('appointments', __name__, url_prefix='/appointments')
 
+def _form_slot(form):
+    """Date, heure et durée (minutes, positive) d'un formulaire de rendez-vous ; ValueError si invalides"""
+    try:
+        appointment_date = datetime.strptime(form.get('date', ''), '%Y-%m-%d').date()
+        appointment_time = datetime.strptime(form.get('time', ''), '%H:%M').time()
+        duration = int(form.get('duration', 60))
+    except ValueError:
+        raise ValueError('Date, heure ou durée invalide.')
+    if duration <= 0:
+        raise ValueError('La durée doit être un nombre de minutes positif.')
+    return appointment_date, appointment_time, duration
+
+def _active_patients():
+    """Patients actifs proposés dans les formulaires"""
+    return Patient.query.filter_by(active=True).order_by(Patient.last_name, Patient.first_name).all()
+
 @bp.route('/dashboard')
 @login_required
+@query_budget(3)
 def dashboard():
     """Tableau de bord des rendez-vous"""
-    today = date.today()
-
-    # Rendez-vous d'aujourd'hui
-    today_appointments = Appointment.query.filter(
-        Appointment.date == today
-    ).order_by(Appointment.time).all()
-
-    # Rendez-vous de la semaine
-    week_start = today
-    week_end = today + timedelta(days=7)
-    week_appointments = Appointment.query.filter(
-        Appointment.date.between(week_start, week_end)
-    ).order_by(Appointment.date, Appointment.time).all()
+    data = get_dashboard_data()
 
     return render_template('appointments/dashboard.html',
-                         today_appointments=today_appointments,
-                         week_appointments=week_appointments,
-                         today=today)
+                         today_appointments=data['today_appointments'],
+                         week_appointments=data['week_appointments'],
+                         today=data['today'])
 
 @bp.route('/calendar')
 @login_required
+@query_budget(2)
 def calendar():
-    """Vue calendrier des rendez-vous"""
-    # Récupérer le mois à afficher
-    year = request.args.get('year', datetime.now().year, type=int)
-    month = request.args.get('month', datetime.now().month, type=int)
-
-    # Récupérer les rendez-vous du mois
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
+    """Vue calendrier des rendez-vous : mois (?year=&month=), semaine ou jour (?view=week&date=)"""
+    view = request.args.get('view', 'month')
+    if view not in ('month', 'week', 'day'):
+        view = 'month'
+
+    try:
+        selected = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        selected = date.today()
+
+    # Récupérer le mois à afficher (grille mise en cache : une requête au plus)
+    year = request.args.get('year', selected.year, type=int)
+    month = request.args.get('month', selected.month, type=int)
+    if view != 'month':
+        year, month = selected.year, selected.month
+    if not 1 <= year <= 9999 or not 1 <= month <= 12:
+        return jsonify({'error': 'Année (1 à 9999) ou mois (1 à 12) invalide'}), 400
+    try:
+        grid = month_grid(year, month)
+    except ValueError:
+        # Semaines complètes au-delà de l'an 9999
+        return jsonify({'error': 'Mois hors de la plage affichable'}), 400
+
+    if view == 'week':
+        days = grid.week(selected)
+    elif view == 'day':
+        days = [grid.day(selected)]
     else:
-        end_date = date(year, month + 1, 1)
-
-    appointments = Appointment.query.filter(
-        Appointment.date >= start_date,
-        Appointment.date < end_date
-    ).order_by(Appointment.date, Appointment.time).all()
+        days = None
 
+    # `appointments` et `page` : contexte des anciens gabarits (tout le mois sur une page)
+    appointments = grid.entries()
     return render_template('appointments/calendar.html',
-                         appointments=appointments,
+                         grid=grid,
+                         days=days,
+                         view=view,
+                         selected=selected,
                          year=year,
-                         month=month)
+                         month=month,
+                         appointments=appointments,
+                         page=KeysetPage(appointments, per_page=len(appointments)))
 
 @bp.route('/new', methods=['GET', 'POST'])
 @login_required
@@ -60,17 +93,15 @@ def new_appointment():
     """Créer un nouveau rendez-vous"""
     if request.method == 'POST':
         patient_id = request.form.get('patient_id')
-        appointment_date = datetime.strptime(request.form.get('date'), '%Y-%m-%d').date()
-        appointment_time = datetime.strptime(request.form.get('time'), '%H:%M').time()
-
-        # Vérifier la disponibilité
-        existing = Appointment.query.filter(
-            Appointment.date == appointment_date,
-            Appointment.time == appointment_time,
-            Appointment.status != 'cancelled'
-        ).first()
-
-        if existing:
+        try:
+            appointment_date, appointment_time, duration = _form_slot(request.form)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return render_template('appointments/new.html', patients=_active_patients()), 400
+
+        # Vérifier la disponibilité (chevauchement avec un rendez-vous existant)
+        engine = AvailabilityEngine.from_config(current_app.config)
+        if engine.find_conflict(appointment_date, appointment_time, duration):
             flash('Ce créneau est déjà réservé.', 'error')
             return redirect(request.url)
 
@@ -78,7 +109,7 @@ def new_appointment():
             patient_id=patient_id,
             date=appointment_date,
             time=appointment_time,
-            duration=int(request.form.get('duration', 60)),
+            duration=duration,
             appointment_type=request.form.get('appointment_type'),
             therapy_type=request.form.get('therapy_type'),
             notes=request.form.get('notes')
@@ -91,9 +122,7 @@ def new_appointment():
         return redirect(url_for('appointments.dashboard'))
 
     # Liste des patients pour le formulaire
-    patients = Patient.query.filter_by(active=True).order_by(Patient.last_name, Patient.first_name).all()
-
-    return render_template('appointments/new.html', patients=patients)
+    return render_template('appointments/new.html', patients=_active_patients())
 
 @bp.route('/<int:appointment_id>')
 @login_required
@@ -109,10 +138,24 @@ def edit_appointment(appointment_id):
     appointment = Appointment.query.get_or_404(appointment_id)
 
     if request.method == 'POST':
+        try:
+            appointment_date, appointment_time, duration = _form_slot(request.form)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return render_template('appointments/edit.html', appointment=appointment,
+                                   patients=_active_patients()), 400
+
+        # Vérifier que le nouveau créneau ne chevauche pas un autre rendez-vous
+        if request.form.get('status') != 'cancelled':
+            engine = AvailabilityEngine.from_config(current_app.config)
+            if engine.find_conflict(appointment_date, appointment_time, duration, exclude_id=appointment.id):
+                flash('Ce créneau est déjà réservé.', 'error')
+                return redirect(request.url)
+
         appointment.patient_id = request.form.get('patient_id')
-        appointment.date = datetime.strptime(request.form.get('date'), '%Y-%m-%d').date()
-        appointment.time = datetime.strptime(request.form.get('time'), '%H:%M').time()
-        appointment.duration = int(request.form.get('duration', 60))
+        appointment.date = appointment_date
+        appointment.time = appointment_time
+        appointment.duration = duration
         appointment.appointment_type = request.form.get('appointment_type')
         appointment.therapy_type = request.form.get('therapy_type')
         appointment.status = request.form.get('status')
@@ -122,8 +165,7 @@ def edit_appointment(appointment_id):
         flash('Rendez-vous modifié avec succès !', 'success')
         return redirect(url_for('appointments.view_appointment', appointment_id=appointment.id))
 
-    patients = Patient.query.filter_by(active=True).order_by(Patient.last_name, Patient.first_name).all()
-    return render_template('appointments/edit.html', appointment=appointment, patients=patients)
+    return render_template('appointments/edit.html', appointment=appointment, patients=_active_patients())
 
 @bp.route('/<int:appointment_id>/cancel', methods=['POST'])
 @login_required
@@ -139,36 +181,74 @@ def cancel_appointment(appointment_id):
 @bp.route('/available-slots')
 @login_required
 def available_slots():
-    """API pour obtenir les créneaux disponibles"""
+    """API pour obtenir les créneaux disponibles d'un jour ou d'une période"""
     date_str = request.args.get('date')
     if not date_str:
         return jsonify({'error': 'Date requise'}), 400
 
-    selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-
-    # Heures d'ouverture par défaut (9h-18h)
-    opening_time = time(9, 0)
-    closing_time = time(18, 0)
-    slot_duration = 60  # minutes
+    try:
+        selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Date invalide (AAAA-MM-JJ)'}), 400
+    days = request.args.get('days', 1, type=int)
+    duration = request.args.get('duration', type=int)
 
-    # Générer tous les créneaux possibles
-    all_slots = []
-    current_time = datetime.combine(selected_date, opening_time)
-    end_time = datetime.combine(selected_date, closing_time)
+    if days < 1 or days > 92:
+        return jsonify({'error': 'Le nombre de jours doit être compris entre 1 et 92'}), 400
+    if duration is not None and duration <= 0:
+        return jsonify({'error': 'La durée doit être un nombre de minutes positif'}), 400
 
-    while current_time < end_time:
-        all_slots.append(current_time.time())
-        current_time += timedelta(minutes=slot_duration)
+    engine = AvailabilityEngine.from_config(current_app.config)
+    end_date = selected_date + timedelta(days=days - 1)
+    slots = engine.free_slots(selected_date, end_date, duration=duration)
 
-    # Récupérer les rendez-vous existants
-    existing_appointments = Appointment.query.filter(
-        Appointment.date == selected_date,
-        Appointment.status != 'cancelled'
-    ).all()
+    if days == 1:
+        return jsonify({'available_slots': slots.get(selected_date, [])})
 
-    booked_slots = [apt.time for apt in existing_appointments]
+    return jsonify({'available_slots': {day.isoformat(): day_slots for day, day_slots in slots.items()}})
 
-    # Créneaux disponibles
-    available = [slot.strftime('%H:%M') for slot in all_slots if slot not in booked_slots]
-
-    return jsonify({'available_slots': available})
+@bp.route('/availability')
+@login_required
+def availability():
+    """API JSON des créneaux libres sur une période (?start=AAAA-MM-JJ&end=AAAA-MM-JJ)"""
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Paramètres start et end requis (AAAA-MM-JJ)'}), 400
+
+    if end_date < start_date or (end_date - start_date).days > 92:
+        return jsonify({'error': 'La période doit être comprise entre 1 et 93 jours'}), 400
+
+    duration = request.args.get('duration', type=int)
+    if duration is not None and duration <= 0:
+        return jsonify({'error': 'La durée doit être un nombre de minutes positif'}), 400
+    engine = AvailabilityEngine.from_config(current_app.config)
+
+    # Une seule requête : elle sert à la fois au calcul et à la validation du cache client
+    rows = engine.busy_rows(start_date, end_date, include_cancelled=True)
+
+    # L'ETag couvre la période, les horaires d'ouverture et chaque rendez-vous (id, mise à jour)
+    fingerprint = hashlib.sha1(repr((
+        start_date, end_date, duration,
+        engine.opening_windows(), sorted(engine.open_weekdays),
+        engine.slot_duration, engine.slot_granularity,
+        [(row.id, row.status, row.updated_at) for row in rows]
+    )).encode()).hexdigest()
+
+    # Validation par ETag seulement : aucune date ne bouge quand un rendez-vous est supprimé,
+    # sort de la période ou quand les horaires changent (If-Modified-Since donnerait un 304 erroné)
+    if not is_resource_modified(request.environ, etag=fingerprint):
+        response = current_app.response_class(status=304)
+    else:
+        slots = engine.free_slots(start_date, end_date, duration=duration, rows=rows)
+        response = jsonify({
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'available_slots': {day.isoformat(): day_slots for day, day_slots in slots.items()}
+        })
+
+    response.set_etag(fingerprint)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
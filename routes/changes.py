@@ -0,0 +1,37 @@
+from flask import Blueprint, jsonify, request, url_for
+from flask_login import login_required
+from utils.change_log import TRACKED_MODELS, changes_since, latest_seq
+
+bp = Blueprint('changes', __name__, url_prefix='/changes')
+
+ENTITIES = {model.__tablename__ for model in TRACKED_MODELS}
+
+@bp.route('', strict_slashes=False)
+@login_required
+def list_changes():
+    """Changements depuis un numéro de séquence (/changes?since=0&limit=500&entity=patients)"""
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+    entity = request.args.get('entity')
+    if entity and entity not in ENTITIES:
+        return jsonify({'error': f"Entité inconnue : {entity}", 'entities': sorted(ENTITIES)}), 400
+
+    changes = changes_since(since, limit=limit, entity=entity)
+    last = changes[-1].seq if changes else max(since, 0)
+
+    return jsonify({
+        'changes': [{
+            'seq': change.seq,
+            'entity': change.entity,
+            'id': change.entity_id,
+            'patient_id': change.patient_id,
+            'operation': change.operation,
+            'fields': change.fields,
+            'changed_at': change.changed_at.isoformat()
+        } for change in changes],
+        'since': since,
+        'next_since': last,
+        'has_more': len(changes) == limit,
+        'latest_seq': latest_seq(),
+        'next_url': url_for('changes.list_changes', since=last, limit=limit, entity=entity)
+    })
@@ -1,121 +1,230 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, current_app, jsonify
 from flask_login import login_required
-from models import Document, Patient, TherapySession, QuestionnaireResponse
+from models import Document, Patient, TherapySession, QuestionnaireResponse, PdfJob, ExportOutbox
 from extensions import db
-from utils.pdf_generator import PDFGenerator
-from utils.google_integration import GoogleDocsIntegration
-import os
+from utils.pdf_jobs import pdf_job_queue, build_spec, get_or_create_document, render_to_spool, persist_spool
+from utils import pdf_cache
+from utils.export_outbox import export_outbox
+from utils.pagination import keyset_paginate
+from utils.pdf_export import count_items
+from datetime import datetime
 
 bp = Blueprint('documents', __name__, url_prefix='/documents')
 
 @bp.route('/generate-session-report/<int:session_id>')
 @login_required
 def generate_session_report(session_id):
-    """Générer un compte-rendu de séance en PDF"""
+    """Générer un compte-rendu de séance en PDF (en arrière-plan)"""
     session = TherapySession.query.get_or_404(session_id)
-
-    pdf_gen = PDFGenerator()
-    filename = f"compte_rendu_seance_{session.id}_{session.session_date.strftime('%Y%m%d')}.pdf"
-    filepath = os.path.join(current_app.config['PDF_FOLDER'], filename)
-
-    pdf_gen.generate_session_report(session, filepath)
-
-    # Enregistrer le document
-    document = Document(
-        patient_id=session.patient_id,
-        document_type='Compte-rendu de séance',
-        title=f"Séance du {session.session_date.strftime('%d/%m/%Y')}",
-        file_path=filepath
-    )
-    db.session.add(document)
-    db.session.commit()
-
-    flash('Document généré avec succès !', 'success')
-    return send_file(filepath, as_attachment=True, download_name=filename)
+    return _generate('session_report', session.id)
 
 @bp.route('/generate-questionnaire-report/<int:response_id>')
 @login_required
 def generate_questionnaire_report(response_id):
-    """Générer un rapport de questionnaire en PDF"""
+    """Générer un rapport de questionnaire en PDF (en arrière-plan)"""
     response = QuestionnaireResponse.query.get_or_404(response_id)
-
-    pdf_gen = PDFGenerator()
-    filename = f"questionnaire_{response.questionnaire.short_name}_{response.patient_id}_{response.completed_at.strftime('%Y%m%d')}.pdf"
-    filepath = os.path.join(current_app.config['PDF_FOLDER'], filename)
-
-    pdf_gen.generate_questionnaire_report(response, filepath)
-
-    # Enregistrer le document
-    document = Document(
-        patient_id=response.patient_id,
-        document_type='Questionnaire',
-        title=f"{response.questionnaire.name} - {response.completed_at.strftime('%d/%m/%Y')}",
-        file_path=filepath
-    )
-    db.session.add(document)
-    db.session.commit()
-
-    flash('Document généré avec succès !', 'success')
-    return send_file(filepath, as_attachment=True, download_name=filename)
+    return _generate('questionnaire_report', response.id)
 
 @bp.route('/generate-patient-file/<int:patient_id>')
 @login_required
 def generate_patient_file(patient_id):
-    """Générer le dossier patient complet en PDF"""
+    """Générer le dossier patient complet en PDF (en arrière-plan)"""
     patient = Patient.query.get_or_404(patient_id)
+    return _generate('patient_file', patient.id)
+
+def _generate(kind, target_id):
+    """Génération en arrière-plan, ou envoi direct du PDF avec ?stream=1
+
+    En mode direct le PDF est rendu en mémoire (débordement sur disque au-delà de
+    PDF_SPOOL_MAX_SIZE) puis envoyé ; ?persist=1 en conserve une copie archivée.
+    """
+    if request.args.get('stream') != '1':
+        return _job_accepted(pdf_job_queue.enqueue(kind, target_id))
+
+    spec = build_spec(kind, target_id)
+    persist = request.args.get('persist') == '1'
+    path = pdf_job_queue.cache_path(spec)
+
+    cached = pdf_cache.open_cached(path)
+    if cached is not None:
+        if persist:
+            get_or_create_document(spec, path)
+            db.session.commit()
+        return send_file(cached, mimetype='application/pdf', as_attachment=True, download_name=spec.download_name)
+
+    buffer = render_to_spool(spec, current_app.config['PDF_SPOOL_MAX_SIZE'])
+
+    if persist:
+        persist_spool(buffer, path)
+        pdf_cache.evict(
+            current_app.config['PDF_CACHE_FOLDER'],
+            current_app.config['PDF_CACHE_MAX_BYTES'],
+            current_app.config['PDF_CACHE_MAX_AGE_DAYS']
+        )
+        get_or_create_document(spec, path)
+        db.session.commit()
 
-    pdf_gen = PDFGenerator()
-    filename = f"dossier_patient_{patient.id}_{patient.last_name.replace(' ', '_')}.pdf"
-    filepath = os.path.join(current_app.config['PDF_FOLDER'], filename)
-
-    pdf_gen.generate_patient_file(patient, filepath)
+    return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name=spec.download_name)
 
-    # Enregistrer le document
-    document = Document(
-        patient_id=patient_id,
-        document_type='Dossier patient',
-        title=f"Dossier complet - {patient.first_name} {patient.last_name}",
-        file_path=filepath
-    )
-    db.session.add(document)
-    db.session.commit()
+@bp.route('/export')
+@login_required
+def export_documents():
+    """Exporter en une fois les séances et questionnaires d'un patient ou d'une période (en arrière-plan)
+
+    ?patient_id= et/ou ?start=AAAA-MM-JJ&end=AAAA-MM-JJ ; ?format=zip (défaut) ou pdf.
+    La réponse 202 indique l'adresse de suivi (avancement) puis de téléchargement.
+    """
+    patient_id = request.args.get('patient_id', type=int)
+    output_format = request.args.get('format', 'zip')
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'Dates au format AAAA-MM-JJ attendues'}), 400
+
+    if output_format not in ('zip', 'pdf'):
+        return jsonify({'error': 'Format zip ou pdf attendu'}), 400
+    if patient_id is None and start is None and end is None:
+        return jsonify({'error': 'Préciser un patient ou une période'}), 400
+    if patient_id is not None:
+        Patient.query.get_or_404(patient_id)
+
+    if not count_items(patient_id, start, end):
+        return jsonify({'error': 'Aucun document sur cette sélection'}), 404
+
+    scope = f'patient_{patient_id}' if patient_id is not None else 'cabinet'
+    period = '_'.join(d.strftime('%Y%m%d') for d in (start, end) if d)
+    download_name = f"export_{scope}{'_' + period if period else ''}.{output_format}"
+    job = pdf_job_queue.enqueue_export(patient_id, start, end, output_format, download_name)
+    return _job_accepted(job)
+
+@bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """État d'une génération PDF (à interroger jusqu'à 'done' ou 'failed')"""
+    job = PdfJob.query.get_or_404(job_id)
+    return jsonify(_job_payload(job))
 
-    flash('Dossier patient généré avec succès !', 'success')
-    return send_file(filepath, as_attachment=True, download_name=filename)
+@bp.route('/jobs/<int:job_id>/download')
+@login_required
+def job_download(job_id):
+    """Télécharger le PDF d'une génération terminée"""
+    job = PdfJob.query.get_or_404(job_id)
+
+    if job.status != 'done':
+        return jsonify(_job_payload(job)), 409 if job.status == 'failed' else 202
+
+    handle = pdf_cache.open_cached(job.file_path) if job.file_path else None
+    if handle is None:
+        # Rendu évincé du cache depuis la génération : il est refait
+        return _job_accepted(pdf_job_queue.rerun(job))
+
+    return send_file(handle, as_attachment=True, download_name=job.download_name)
+
+def _job_payload(job):
+    """Représentation JSON d'une génération PDF"""
+    payload = {
+        'job_id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'status_url': url_for('documents.job_status', job_id=job.id)
+    }
+    if job.status == 'done':
+        payload['download_url'] = url_for('documents.job_download', job_id=job.id)
+        payload['document_id'] = job.document_id
+    if job.progress_total is not None:
+        payload['progress'] = {'done': job.progress_done or 0, 'total': job.progress_total}
+    if job.error:
+        payload['error'] = job.error
+    return payload
+
+def _job_accepted(job):
+    """Réponse 202 : la génération est en file d'attente (ou redirection si déjà en cache)"""
+    if job.status == 'done':
+        return redirect(url_for('documents.job_download', job_id=job.id), code=303)
+
+    response = jsonify(_job_payload(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('documents.job_status', job_id=job.id)
+    return response
 
 @bp.route('/export-to-gdocs/<int:session_id>')
 @login_required
 def export_to_gdocs(session_id):
-    """Exporter une séance vers Google Docs"""
+    """Exporter une séance vers Google Docs (en arrière-plan)"""
     session = TherapySession.query.get_or_404(session_id)
 
-    google_integration = GoogleDocsIntegration()
+    # Le Document est créé par le worker, une fois le Google Doc obtenu
+    entry = export_outbox.enqueue('gdocs_session', session.id, patient_id=session.patient_id)
+    db.session.commit()
+    export_outbox.notify()
 
-    try:
-        doc_id = google_integration.create_session_document(session)
-
-        # Enregistrer le document
-        document = Document(
-            patient_id=session.patient_id,
-            document_type='Compte-rendu de séance (Google Docs)',
-            title=f"Séance du {session.session_date.strftime('%d/%m/%Y')}",
-            google_doc_id=doc_id
-        )
-        db.session.add(document)
-        db.session.commit()
+    return _export_accepted(entry, 'Export vers Google Docs en cours.')
+
+@bp.route('/sync-sheets/<int:patient_id>')
+@login_required
+def sync_patient_sheets(patient_id):
+    """Synchroniser la feuille de suivi Google Sheets d'un patient (en arrière-plan)"""
+    patient = Patient.query.get_or_404(patient_id)
 
-        flash(f'Document exporté vers Google Docs ! ID: {doc_id}', 'success')
-        return redirect(url_for('patients.view_patient', patient_id=session.patient_id))
+    entry = export_outbox.enqueue('sheets_patient', patient.id, patient_id=patient.id)
+    db.session.commit()
+    export_outbox.notify()
+
+    return _export_accepted(entry, 'Synchronisation Google Sheets en cours.')
 
-    except Exception as e:
-        flash(f'Erreur lors de l\'export: {str(e)}', 'error')
-        return redirect(url_for('patients.view_patient', patient_id=session.patient_id))
+@bp.route('/exports/<int:export_id>')
+@login_required
+def export_status(export_id):
+    """État d'un export Google (à interroger jusqu'à 'done' ou 'failed')"""
+    entry = ExportOutbox.query.get_or_404(export_id)
+    return jsonify(_export_payload(entry))
+
+def _export_payload(entry):
+    """Représentation JSON d'un export Google"""
+    payload = {
+        'export_id': entry.id,
+        'kind': entry.kind,
+        'status': entry.status,
+        'attempts': entry.attempts,
+        'document_id': entry.document_id,
+        'status_url': url_for('documents.export_status', export_id=entry.id)
+    }
+    if entry.status == 'pending' and entry.attempts:
+        payload['next_attempt_at'] = entry.next_attempt_at.isoformat()
+    if entry.status == 'done':
+        payload['google_id'] = entry.google_id
+    if entry.error:
+        payload['error'] = entry.error
+    return payload
+
+def _wants_json():
+    """Le client demande-t-il du JSON plutôt qu'une page HTML ?"""
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+def _export_accepted(entry, message):
+    """Export en file d'attente : retour à la fiche patient, ou réponse 202 pour un client JSON"""
+    if not _wants_json():
+        flash(message, 'info')
+        return redirect(url_for('patients.view_patient', patient_id=entry.patient_id))
+
+    response = jsonify(_export_payload(entry))
+    response.status_code = 202
+    response.headers['Location'] = url_for('documents.export_status', export_id=entry.id)
+    return response
 
 @bp.route('/patient/<int:patient_id>')
 @login_required
 def patient_documents(patient_id):
     """Liste des documents d'un patient"""
     patient = Patient.query.get_or_404(patient_id)
-    documents = Document.query.filter_by(patient_id=patient_id).order_by(db.desc(Document.created_at)).all()
+    page = keyset_paginate(
+        Document.query.filter_by(patient_id=patient_id),
+        [Document.created_at, Document.id],
+        cursor=request.args.get('cursor'),
+        per_page=current_app.config['ITEMS_PER_PAGE'],
+        descending=True
+    )
 
-    return render_template('documents/list.html', patient=patient, documents=documents)
+    return render_template('documents/list.html', patient=patient, documents=page.items, page=page)
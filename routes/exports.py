@@ -0,0 +1,43 @@
+from datetime import date
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask_login import login_required
+from models import Patient
+from utils.data_export import DATASETS, FORMATS, UnknownQuestionnaire, open_export, stream_export
+
+bp = Blueprint('exports', __name__, url_prefix='/exports')
+
+@bp.route('/<dataset>')
+@login_required
+def export_dataset(dataset):
+    """Export en flux d'un jeu de données (patients, appointments, sessions, responses)
+
+    ?format=csv (défaut) ou ndjson ; ?patient_id= ; ?questionnaire=SIGLE pour les réponses
+    """
+    output_format = request.args.get('format', 'csv')
+    patient_id = request.args.get('patient_id', type=int)
+    questionnaire = request.args.get('questionnaire')
+
+    if dataset not in DATASETS:
+        return jsonify({'error': f'Jeu de données inconnu : {dataset}', 'datasets': list(DATASETS)}), 404
+    if output_format not in FORMATS:
+        return jsonify({'error': 'Format csv ou ndjson attendu'}), 400
+    if patient_id is not None:
+        Patient.query.get_or_404(patient_id)
+
+    try:
+        export = open_export(dataset, patient_id=patient_id, questionnaire=questionnaire,
+                             chunk_size=current_app.config['DATA_EXPORT_CHUNK_SIZE'])
+    except UnknownQuestionnaire as e:
+        return jsonify({'error': str(e)}), 404
+
+    scope = f'_patient_{patient_id}' if patient_id is not None else ''
+    subset = f'_{questionnaire}' if questionnaire and dataset == 'responses' else ''
+    download_name = f"{dataset}{subset}{scope}_{date.today():%Y%m%d}.{output_format}"
+
+    # Le générateur lit la base pendant l'envoi : contexte de requête conservé
+    return Response(
+        stream_with_context(stream_export(export, output_format)),
+        mimetype=FORMATS[output_format],
+        headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+    )
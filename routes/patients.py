@@ -1,7 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required
-from models import Patient
+from models import Patient, QuestionnaireResponse
 from extensions import db
+from utils.patient_search import search_filter, search_patients
+from utils.patient_summary import refresh_stale_summaries
+from utils.pagination import keyset_paginate
+from utils.query_budget import query_budget
+from sqlalchemy.orm import contains_eager, joinedload
 from datetime import datetime
 
 bp = Blueprint('patients', __name__, url_prefix='/patients')
@@ -10,26 +15,49 @@ bp = Blueprint('patients', __name__, url_prefix='/patients')
 @login_required
 def list_patients():
     """Liste des patients"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
 
-    query = Patient.query.filter_by(active=True)
+    # Prochains rendez-vous dépassés depuis la veille
+    refresh_stale_summaries()
 
-    if search:
-        query = query.filter(
-            db.or_(
-                Patient.first_name.ilike(f'%{search}%'),
-                Patient.last_name.ilike(f'%{search}%'),
-                Patient.email.ilike(f'%{search}%')
-            )
-        )
+    # Colonnes de synthèse lues dans la même requête que les patients
+    query = Patient.query.outerjoin(Patient.summary).options(
+        contains_eager(Patient.summary)
+    ).filter(Patient.active.is_(True))
 
-    patients = query.order_by(Patient.last_name, Patient.first_name).paginate(
-        page=page, per_page=20, error_out=False
+    if search:
+        query = query.filter(search_filter(search))
+
+    patients = keyset_paginate(
+        query,
+        [Patient.last_name, Patient.first_name, Patient.id],
+        cursor=cursor,
+        per_page=current_app.config['ITEMS_PER_PAGE'],
+        with_count=True
     )
 
     return render_template('patients/list.html', patients=patients, search=search)
 
+@bp.route('/search')
+@login_required
+def search():
+    """API d'autocomplétion : patients correspondant à la saisie"""
+    q = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+
+    patients = search_patients(q, limit=limit)
+
+    return jsonify({'results': [{
+        'id': patient.id,
+        'first_name': patient.first_name,
+        'last_name': patient.last_name,
+        'email': patient.email,
+        'phone': patient.phone,
+        'therapy_type': patient.therapy_type,
+        'url': url_for('patients.view_patient', patient_id=patient.id)
+    } for patient in patients]})
+
 @bp.route('/new', methods=['GET', 'POST'])
 @login_required
 def new_patient():
@@ -60,9 +88,10 @@ def new_patient():
 
 @bp.route('/<int:patient_id>')
 @login_required
+@query_budget(5)
 def view_patient(patient_id):
     """Voir le dossier d'un patient"""
-    patient = Patient.query.get_or_404(patient_id)
+    patient = Patient.query.options(joinedload(Patient.summary)).get_or_404(patient_id)
 
     # Récupérer les rendez-vous
     appointments = patient.appointments.order_by(db.desc('date')).limit(10).all()
@@ -71,10 +100,13 @@ def view_patient(patient_id):
     sessions = patient.sessions.order_by(db.desc('session_date')).limit(10).all()
 
     # Récupérer les questionnaires
-    questionnaires = patient.questionnaire_responses.order_by(db.desc('completed_at')).limit(5).all()
+    questionnaires = patient.questionnaire_responses.options(
+        joinedload(QuestionnaireResponse.questionnaire)
+    ).order_by(db.desc('completed_at')).limit(5).all()
 
     return render_template('patients/view.html',
                          patient=patient,
+                         summary=patient.summary,
                          appointments=appointments,
                          sessions=sessions,
                          questionnaires=questionnaires)
@@ -3,6 +3,7 @@ from flask_login import login_required
 from models import Questionnaire, QuestionnaireResponse, Patient, TherapySession
 from extensions import db
 from datetime import datetime
+from utils.scoring import score_response
 
 bp = Blueprint('questionnaires', __name__, url_prefix='/questionnaires')
 
@@ -35,18 +36,17 @@ def administer_questionnaire(questionnaire_id, patient_id):
                 question_id = key.replace('question_', '')
                 responses[question_id] = value
 
-        # Calculer le score si applicable
-        total_score = calculate_score(questionnaire, responses)
-
         # Créer la réponse
         response = QuestionnaireResponse(
             questionnaire_id=questionnaire_id,
             patient_id=patient_id,
             responses=responses,
-            total_score=total_score,
             notes=request.form.get('notes')
         )
 
+        # Score total, sous-échelles et interprétation selon la cotation du questionnaire
+        score_response(response, questionnaire)
+
         db.session.add(response)
         db.session.commit()
 
@@ -73,6 +73,8 @@ def new_questionnaire():
         questions_data = request.form.get('questions_json')
         import json
         questions = json.loads(questions_data) if questions_data else []
+        scoring_data = request.form.get('scoring_json')
+        scoring = json.loads(scoring_data) if scoring_data else None
 
         questionnaire = Questionnaire(
             name=request.form.get('name'),
@@ -81,6 +83,7 @@ def new_questionnaire():
             category=request.form.get('category'),
             questions=questions,
             scoring_method=request.form.get('scoring_method'),
+            scoring=scoring,
             interpretation=request.form.get('interpretation')
         )
 
@@ -91,21 +94,3 @@ def new_questionnaire():
         return redirect(url_for('questionnaires.list_questionnaires'))
 
     return render_template('questionnaires/new.html')
-
-def calculate_score(questionnaire, responses):
-    """Calculer le score d'un questionnaire"""
-    # Logique de base - à adapter selon le type de questionnaire
-    total = 0
-
-    if not questionnaire.questions:
-        return 0
-
-    for question in questionnaire.questions:
-        question_id = str(question.get('id', ''))
-        if question_id in responses:
-            try:
-                total += float(responses[question_id])
-            except (ValueError, TypeError):
-                pass
-
-    return total
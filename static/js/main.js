@@ -39,3 +39,38 @@ async function checkAvailableSlots(date) {
         return [];
     }
 }
+
+// Créneaux disponibles sur une période (une seule requête, réponses 304 gérées par le navigateur)
+async function fetchAvailability(start, end) {
+    try {
+        const response = await fetch(`/appointments/availability?start=${start}&end=${end}`);
+        const data = await response.json();
+        return data.available_slots;
+    } catch (error) {
+        console.error('Erreur lors de la récupération des disponibilités:', error);
+        return {};
+    }
+}
+
+// Autocomplétion de la recherche de patients
+async function searchPatients(query) {
+    try {
+        const response = await fetch(`/patients/search?q=${encodeURIComponent(query)}`);
+        const data = await response.json();
+        return data.results;
+    } catch (error) {
+        console.error('Erreur lors de la recherche de patients:', error);
+        return [];
+    }
+}
+
+// Évolution d'un patient (données des graphiques : séances, questionnaires, changement fiable)
+async function fetchPatientOutcomes(patientId) {
+    try {
+        const response = await fetch(`/analytics/patients/${patientId}`);
+        return await response.json();
+    } catch (error) {
+        console.error('Erreur lors de la récupération de l\'évolution du patient:', error);
+        return null;
+    }
+}
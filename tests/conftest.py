@@ -0,0 +1,59 @@
+"""
+Configuration des tests
+Base SQLite temporaire créée comme par une version précédente (tables sans index),
+puis mise à niveau par init_db
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Avant l'import de l'application : la configuration lit DATABASE_URL au chargement
+_database_dir = tempfile.mkdtemp(prefix='cabinet-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_database_dir, 'cabinet.db')}"
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app as flask_app
+    from extensions import db
+    from init_db import upgrade_database
+    from models import Appointment, Patient, TherapySession, User
+
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        # Base d'une version précédente : aucun index en dehors des clés
+        db.create_all()
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(bind=db.engine, checkfirst=True)
+        upgrade_database()
+
+        user = User(username='therapeute', email='therapeute@example.fr')
+        user.set_password('secret')
+        db.session.add(user)
+
+        today = date.today()
+        for n in range(20):
+            patient = Patient(first_name=f'Prénom {n}', last_name=f'Nom {n:02d}', active=n % 5 != 0)
+            db.session.add(patient)
+            db.session.flush()
+            for day in range(-10, 30, 7):
+                db.session.add(Appointment(patient_id=patient.id, date=today + timedelta(days=day + n % 7),
+                                           time=time(9 + n % 8, 0), duration=60))
+            db.session.add(TherapySession(patient_id=patient.id, session_date=datetime.combine(today, time(10))))
+        db.session.commit()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture()
+def client(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'therapeute', 'password': 'secret'})
+    return client
@@ -0,0 +1,80 @@
+"""
+Index des requêtes chaudes
+Les requêtes émises par chaque route sont rejouées avec EXPLAIN QUERY PLAN sur une base
+mise à niveau par init_db : chacune doit passer par son index, sans parcours complet
+"""
+
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+
+
+@pytest.fixture()
+def statements(app):
+    """Requêtes SQL exécutées pendant le test (texte, paramètres)"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    yield captured
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def query_plans(statements, table):
+    """Plans (lignes de détail) des SELECT qui lisent `table`"""
+    plans = []
+    with db.engine.connect() as connection:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith('SELECT') or f'FROM {table}' not in statement:
+                continue
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+            plans.append([row[-1] for row in rows])
+    return plans
+
+
+def assert_uses_index(statements, table, index):
+    """Au moins une requête cherche dans `table` par `index`, et aucune ne la parcourt en entier"""
+    plans = query_plans(statements, table)
+    assert plans, f'Aucune requête sur {table}'
+
+    details = [detail for plan in plans for detail in plan]
+    assert any(detail.startswith(f'SEARCH {table} ') and f'INDEX {index} ' in detail for detail in details), details
+    assert f'SCAN {table}' not in details, details
+
+
+def test_dashboard_uses_appointment_date_index(client, statements):
+    assert client.get('/dashboard').status_code == 200
+    assert_uses_index(statements, 'appointments', 'ix_appointments_date_time_status')
+
+
+def test_calendar_uses_appointment_date_index(app, statements):
+    from utils.calendar_grid import _grid_cache, month_grid
+
+    with app.app_context():
+        _grid_cache.clear()
+        month_grid(date.today().year, date.today().month)
+    assert_uses_index(statements, 'appointments', 'ix_appointments_date_time_status')
+
+
+def test_available_slots_use_appointment_date_index(client, statements):
+    response = client.get(f'/appointments/available-slots?date={date.today():%Y-%m-%d}&days=7')
+    assert response.status_code == 200
+    assert_uses_index(statements, 'appointments', 'ix_appointments_date_time_status')
+
+
+def test_new_appointment_conflict_uses_appointment_date_index(app, statements):
+    from utils.availability import AvailabilityEngine
+
+    with app.app_context():
+        AvailabilityEngine.from_config(app.config).find_conflict(date.today(), time(10), 60)
+    assert_uses_index(statements, 'appointments', 'ix_appointments_date_time_status')
+
+
+def test_patient_list_uses_active_name_index(client, statements):
+    assert client.get('/patients/').status_code == 200
+    assert_uses_index(statements, 'patients', 'ix_patients_active_name')
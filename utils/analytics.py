@@ -0,0 +1,350 @@
+"""
+Suivi de l'évolution des patients
+Scores de séance et de questionnaires chargés en colonnes, puis trajectoires,
+moyennes glissantes, indices de changement fiable (Jacobson-Truax) et synthèses
+par type de thérapie calculés avec NumPy sur toute la patientèle.
+Les résultats restent en cache tant que la base n'a pas changé : le journal des
+changements et les questionnaires servent d'empreinte, vérifiée à chaque lecture,
+ce qui couvre aussi les écritures des autres processus et les mises à jour groupées
+"""
+
+from datetime import date
+from functools import cached_property
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from extensions import db
+from models import ChangeLog, Patient, Questionnaire, QuestionnaireResponse, TherapySession
+from utils.cache import TTLCache, invalidate_on_commit
+from utils.scoring import get_plan
+
+# Seuil de significativité de l'indice de changement fiable (p < 0,05)
+RCI_THRESHOLD = 1.96
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_UNSPECIFIED = 'Non spécifié'
+
+_analytics_cache = TTLCache()
+invalidate_on_commit(_analytics_cache, TherapySession, QuestionnaireResponse, Patient, Questionnaire)
+
+
+def data_fingerprint():
+    """Empreinte des données analysées, en une requête : dernier changement journalisé
+    (séances, réponses, patients, y compris hors de ce processus) et état des questionnaires"""
+    return tuple(db.session.execute(select(
+        select(db.func.max(ChangeLog.seq)).scalar_subquery(),
+        select(db.func.count(Questionnaire.id)).scalar_subquery(),
+        select(db.func.max(Questionnaire.updated_at)).scalar_subquery(),
+    )).one())
+
+
+def get_analytics():
+    """Analyse de la patientèle (recalculée dès que les données ont changé)"""
+    config = current_app.config
+    _analytics_cache.ttl = config['ANALYTICS_CACHE_TTL']
+    fingerprint = data_fingerprint()
+
+    cached = _analytics_cache.get('analytics')
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    analytics = OutcomeAnalytics(window=config['ANALYTICS_ROLLING_WINDOW'])
+    _analytics_cache.set('analytics', (fingerprint, analytics))
+    return analytics
+
+
+def _columns(rows, count):
+    """Lignes SQL -> tuple de colonnes (vides s'il n'y a aucune ligne)"""
+    return list(zip(*rows)) if rows else [()] * count
+
+
+def _ordinals(values):
+    return np.fromiter((value.toordinal() for value in values), dtype=np.int64, count=len(values))
+
+
+def _iso_dates(ordinals):
+    return (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]').astype(str).tolist()
+
+
+def _json_values(values, digits=2):
+    """Tableau de flottants -> liste JSON (NaN -> None)"""
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+def _group_starts(*keys):
+    """Début de chaque groupe de lignes consécutives de mêmes clés (tableaux triés)"""
+    n = len(keys[0])
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    change = np.zeros(n - 1, dtype=bool)
+    for key in keys:
+        change |= key[1:] != key[:-1]
+    return np.concatenate(([0], np.flatnonzero(change) + 1))
+
+
+def _group_ends(starts, n):
+    """Dernière ligne de chaque groupe"""
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.append(starts[1:], n) - 1
+
+
+def _row_group_start(starts, n):
+    """Pour chaque ligne, l'indice de la première ligne de son groupe"""
+    lengths = np.diff(np.append(starts, n))
+    return np.repeat(starts, lengths)
+
+
+def rolling_mean(values, row_start, window):
+    """Moyenne des `window` dernières lignes de chaque groupe (valeurs manquantes ignorées)"""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    idx = np.arange(len(values))
+    low = np.maximum(idx - window + 1, row_start)
+    total = sums[idx + 1] - sums[low]
+    n = counts[idx + 1] - counts[low]
+    return np.divide(total, n, out=np.full(len(values), np.nan), where=n > 0)
+
+
+def window_change(patients, values, window, group_patients):
+    """Évolution par patient : moyenne des `window` dernières valeurs - moyenne des `window` premières
+
+    Valeurs manquantes ignorées. Avec moins de 2 × window valeurs, la fenêtre est réduite
+    à la moitié des valeurs pour que premières et dernières ne se recouvrent pas ; un
+    patient avec moins de 2 valeurs n'a pas d'évolution (NaN) plutôt qu'une évolution nulle.
+    Le résultat est aligné sur `group_patients` (identifiants triés, un par patient).
+    """
+    change = np.full(len(group_patients), np.nan)
+    valid = ~np.isnan(values)
+    valid_patients = patients[valid]
+    if not len(valid_patients):
+        return change
+    valid_values = values[valid]
+
+    starts = _group_starts(valid_patients)
+    ends = _group_ends(starts, len(valid_patients))
+    k = np.minimum(window, (ends - starts + 1) // 2)
+    sums = np.concatenate(([0.0], np.cumsum(valid_values)))
+    difference = (sums[ends + 1] - sums[ends + 1 - k]) - (sums[starts + k] - sums[starts])
+
+    change[np.searchsorted(group_patients, valid_patients[starts])] = np.divide(
+        difference, k, out=np.full(len(starts), np.nan), where=k > 0
+    )
+    return change
+
+
+class OutcomeAnalytics:
+    """Instantané de tous les scores de la patientèle, en colonnes NumPy"""
+
+    def __init__(self, window=3):
+        self.window = window
+        self._load_sessions()
+        self._load_responses()
+
+    # ------------------------------------------------------------------
+    # Chargement
+    # ------------------------------------------------------------------
+
+    def _load_sessions(self):
+        """Notes d'humeur et d'anxiété, triées par patient puis par date"""
+        rows = db.session.execute(
+            select(TherapySession.patient_id, Patient.therapy_type, TherapySession.session_date,
+                   TherapySession.mood_score, TherapySession.anxiety_score)
+            .join(Patient, Patient.id == TherapySession.patient_id)
+            .order_by(TherapySession.patient_id, TherapySession.session_date, TherapySession.id)
+        ).all()
+        patient_ids, therapy_types, dates, mood, anxiety = _columns(rows, 5)
+
+        self.s_patient = np.array(patient_ids, dtype=np.int64)
+        self.s_therapy = np.array([t or _UNSPECIFIED for t in therapy_types], dtype=object)
+        self.s_day = _ordinals(dates)
+        self.s_mood = np.array(mood, dtype=float)
+        self.s_anxiety = np.array(anxiety, dtype=float)
+
+        n = len(self.s_patient)
+        self.s_starts = _group_starts(self.s_patient)
+        row_start = _row_group_start(self.s_starts, n)
+        self.s_mood_avg = rolling_mean(self.s_mood, row_start, self.window)
+        self.s_anxiety_avg = rolling_mean(self.s_anxiety, row_start, self.window)
+
+    def _load_responses(self):
+        """Scores totaux, triés par questionnaire, patient puis date"""
+        rows = db.session.execute(
+            select(QuestionnaireResponse.questionnaire_id, QuestionnaireResponse.patient_id,
+                   Patient.therapy_type, QuestionnaireResponse.completed_at,
+                   QuestionnaireResponse.total_score)
+            .join(Patient, Patient.id == QuestionnaireResponse.patient_id)
+            .where(QuestionnaireResponse.total_score.isnot(None))
+            .order_by(QuestionnaireResponse.questionnaire_id, QuestionnaireResponse.patient_id,
+                      QuestionnaireResponse.completed_at, QuestionnaireResponse.id)
+        ).all()
+        questionnaire_ids, patient_ids, therapy_types, dates, scores = _columns(rows, 5)
+
+        self.r_questionnaire = np.array(questionnaire_ids, dtype=np.int64)
+        self.r_patient = np.array(patient_ids, dtype=np.int64)
+        self.r_day = _ordinals(dates)
+        self.r_score = np.array(scores, dtype=float)
+
+        n = len(self.r_patient)
+        starts = _group_starts(self.r_questionnaire, self.r_patient)
+        ends = _group_ends(starts, n)
+        self.r_avg = rolling_mean(self.r_score, _row_group_start(starts, n), self.window)
+
+        # Un groupe = un patient pour un questionnaire : premier et dernier score
+        self.g_starts = starts
+        self.g_ends = ends
+        self.g_questionnaire = self.r_questionnaire[starts]
+        self.g_patient = self.r_patient[starts]
+        self.g_therapy = np.array([t or _UNSPECIFIED for t in therapy_types], dtype=object)[starts]
+        self.g_first = self.r_score[starts]
+        self.g_last = self.r_score[ends]
+        self.g_count = ends - starts + 1
+
+        # Données simples (pas d'objets ORM) : l'instantané est partagé entre threads
+        self.labels = {}
+        self.plans = {}
+        for questionnaire in Questionnaire.query.all():
+            plan = get_plan(questionnaire)
+            self.labels[questionnaire.id] = questionnaire.short_name or questionnaire.name
+            self.plans[questionnaire.id] = (plan.reliability, plan.higher_is_better)
+        self._compute_reliable_change()
+
+    # ------------------------------------------------------------------
+    # Changement fiable
+    # ------------------------------------------------------------------
+
+    def _compute_reliable_change(self):
+        """Indice de Jacobson-Truax : (dernier - premier) / (√2 · ET₁ · √(1 - fidélité))
+
+        ET₁ est l'écart-type des scores initiaux de la patientèle pour le questionnaire.
+        """
+        n_groups = len(self.g_questionnaire)
+        self.g_rci = np.full(n_groups, np.nan)
+        self.g_status = np.full(n_groups, None, dtype=object)
+        if not n_groups:
+            return
+
+        ids, index = np.unique(self.g_questionnaire, return_inverse=True)
+        counts = np.bincount(index)
+        means = np.bincount(index, self.g_first) / counts
+        squares = np.bincount(index, (self.g_first - means[index]) ** 2)
+        sd = np.sqrt(np.divide(squares, counts - 1, out=np.full(len(ids), np.nan), where=counts > 1))
+
+        reliability = np.array([self.plans[q][0] or np.nan for q in ids], dtype=float)
+        direction = np.array([1.0 if self.plans[q][1] else -1.0 for q in ids])
+        s_diff = np.sqrt(2.0) * sd * np.sqrt(1.0 - reliability)
+
+        per_group_sdiff = s_diff[index]
+        measurable = (self.g_count > 1) & (per_group_sdiff > 0)
+        self.g_rci = np.divide(self.g_last - self.g_first, per_group_sdiff,
+                               out=np.full(n_groups, np.nan), where=measurable)
+
+        # Amélioration : RCI dans le sens favorable au-delà du seuil
+        oriented = self.g_rci * direction[index]
+        self.g_status[measurable] = 'no_change'
+        self.g_status[measurable & (oriented >= RCI_THRESHOLD)] = 'improved'
+        self.g_status[measurable & (oriented <= -RCI_THRESHOLD)] = 'deteriorated'
+
+    def _short_name(self, questionnaire_id):
+        return self.labels[questionnaire_id]
+
+    def _change_entry(self, group):
+        return {
+            'patient_id': int(self.g_patient[group]),
+            'questionnaire': self._short_name(int(self.g_questionnaire[group])),
+            'measurements': int(self.g_count[group]),
+            'first_score': float(self.g_first[group]),
+            'last_score': float(self.g_last[group]),
+            'change': round(float(self.g_last[group] - self.g_first[group]), 2),
+            'rci': None if np.isnan(self.g_rci[group]) else round(float(self.g_rci[group]), 2),
+            'status': self.g_status[group],
+        }
+
+    # ------------------------------------------------------------------
+    # Résultats
+    # ------------------------------------------------------------------
+
+    def patient_trajectory(self, patient_id):
+        """Séances et questionnaires d'un patient, avec moyennes glissantes et changement fiable"""
+        lo, hi = np.searchsorted(self.s_patient, [patient_id, patient_id + 1])
+        sessions = {
+            'dates': _iso_dates(self.s_day[lo:hi]),
+            'mood': _json_values(self.s_mood[lo:hi]),
+            'mood_rolling': _json_values(self.s_mood_avg[lo:hi]),
+            'anxiety': _json_values(self.s_anxiety[lo:hi]),
+            'anxiety_rolling': _json_values(self.s_anxiety_avg[lo:hi]),
+        }
+
+        questionnaires = {}
+        for group in np.flatnonzero(self.g_patient == patient_id):
+            start, end = self.g_starts[group], self.g_ends[group] + 1
+            entry = self._change_entry(group)
+            entry.update({
+                'dates': _iso_dates(self.r_day[start:end]),
+                'scores': _json_values(self.r_score[start:end]),
+                'rolling': _json_values(self.r_avg[start:end]),
+            })
+            questionnaires[entry.pop('questionnaire')] = entry
+
+        return {
+            'patient_id': patient_id,
+            'window': self.window,
+            'sessions': sessions,
+            'questionnaires': questionnaires,
+        }
+
+    def reliable_change(self, questionnaire_id=None):
+        """Changement fiable de chaque patient (premier et dernier score)"""
+        groups = np.arange(len(self.g_patient))
+        if questionnaire_id is not None:
+            groups = groups[self.g_questionnaire == questionnaire_id]
+        return [self._change_entry(group) for group in groups]
+
+    @cached_property
+    def cohorts(self):
+        """Synthèse par type de thérapie : séances, évolution des notes, changement fiable"""
+        # Par patient suivi en séance : évolution des notes (voir window_change) ;
+        # les patients avec moins de 2 notes sont exclus des moyennes
+        n = len(self.s_patient)
+        ends = _group_ends(self.s_starts, n)
+        s_patients = self.s_patient[self.s_starts]
+        s_therapy = self.s_therapy[self.s_starts]
+        s_sessions = ends - self.s_starts + 1
+        mood_change = window_change(self.s_patient, self.s_mood, self.window, s_patients)
+        anxiety_change = window_change(self.s_patient, self.s_anxiety, self.window, s_patients)
+
+        summary = {}
+        for cohort in np.unique(np.concatenate((s_therapy, self.g_therapy))):
+            in_sessions = s_therapy == cohort
+            in_responses = self.g_therapy == cohort
+
+            questionnaires = {}
+            for questionnaire_id in np.unique(self.g_questionnaire[in_responses]):
+                members = in_responses & (self.g_questionnaire == questionnaire_id)
+                # Évolution moyenne des seuls patients mesurés au moins deux fois
+                measured = members & (self.g_count > 1)
+                status = self.g_status[members]
+                questionnaires[self._short_name(int(questionnaire_id))] = {
+                    'patients': int(members.sum()),
+                    'mean_change': _nanmean(self.g_last[measured] - self.g_first[measured]),
+                    'improved': int((status == 'improved').sum()),
+                    'no_change': int((status == 'no_change').sum()),
+                    'deteriorated': int((status == 'deteriorated').sum()),
+                }
+
+            summary[cohort] = {
+                'patients': int(np.union1d(s_patients[in_sessions], self.g_patient[in_responses]).size),
+                'sessions': int(s_sessions[in_sessions].sum()),
+                'mood_change': _nanmean(mood_change[in_sessions]),
+                'anxiety_change': _nanmean(anxiety_change[in_sessions]),
+                'questionnaires': questionnaires,
+            }
+        return summary
+
+
+def _nanmean(values):
+    values = values[~np.isnan(values)]
+    return round(float(values.mean()), 2) if len(values) else None
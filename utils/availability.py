@@ -0,0 +1,153 @@
+"""
+Moteur de disponibilités
+Calcul des créneaux libres à partir des intervalles occupés (début, début + durée)
+"""
+
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Appointment
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _to_minutes(value):
+    """Convertir une heure (time ou 'HH:MM') en minutes depuis minuit"""
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%H:%M').time()
+    return value.hour * 60 + value.minute
+
+
+def _format_minutes(minutes):
+    """Convertir des minutes depuis minuit en 'HH:MM'"""
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def _merge(intervals):
+    """Fusionner une liste triée d'intervalles qui se chevauchent"""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class AvailabilityEngine:
+    """Calcul des disponibilités selon les horaires d'ouverture du cabinet"""
+
+    def __init__(self, opening_time='09:00', closing_time='18:00', breaks=(),
+                 open_weekdays=range(7), slot_duration=60, slot_granularity=60):
+        self.opening = _to_minutes(opening_time)
+        self.closing = _to_minutes(closing_time)
+        self.breaks = sorted((_to_minutes(start), _to_minutes(end)) for start, end in breaks)
+        self.open_weekdays = set(open_weekdays)
+        self.slot_duration = slot_duration
+        self.slot_granularity = slot_granularity
+
+    @classmethod
+    def from_config(cls, config):
+        """Construire le moteur à partir de la configuration Flask"""
+        return cls(
+            opening_time=config['OPENING_TIME'],
+            closing_time=config['CLOSING_TIME'],
+            breaks=config['BREAKS'],
+            open_weekdays=config['OPEN_WEEKDAYS'],
+            slot_duration=config['SLOT_DURATION'],
+            slot_granularity=config['SLOT_GRANULARITY']
+        )
+
+    def _duration(self, duration):
+        """Durée demandée en minutes (celle d'un créneau par défaut) ; ValueError si elle n'est pas positive"""
+        if duration is None:
+            return self.slot_duration
+        if duration <= 0:
+            raise ValueError('La durée doit être un nombre de minutes positif')
+        return duration
+
+    def opening_windows(self):
+        """Plages d'ouverture d'une journée, pauses déduites"""
+        windows = []
+        start = self.opening
+        for break_start, break_end in self.breaks:
+            if break_start > start:
+                windows.append((start, min(break_start, self.closing)))
+            start = max(start, break_end)
+        if start < self.closing:
+            windows.append((start, self.closing))
+        return windows
+
+    def busy_rows(self, start_date, end_date, exclude_id=None, include_cancelled=False):
+        """Rendez-vous non annulés de la période (une seule requête)"""
+        query = db.session.query(
+            Appointment.id,
+            Appointment.date,
+            Appointment.time,
+            Appointment.duration,
+            Appointment.status,
+            Appointment.updated_at
+        ).filter(
+            Appointment.date.between(start_date, end_date)
+        )
+        # Les annulés servent uniquement à dater la dernière modification de la période
+        if not include_cancelled:
+            query = query.filter(Appointment.status != 'cancelled')
+        if exclude_id is not None:
+            query = query.filter(Appointment.id != exclude_id)
+        return query.order_by(Appointment.date, Appointment.time).all()
+
+    def busy_intervals(self, rows):
+        """Regrouper les rendez-vous par jour en intervalles triés et fusionnés"""
+        by_day = {}
+        for row in rows:
+            if row.status == 'cancelled':
+                continue
+            start = _to_minutes(row.time)
+            end = min(start + (row.duration or self.slot_duration), MINUTES_PER_DAY)
+            by_day.setdefault(row.date, []).append((start, end))
+        return {day: _merge(intervals) for day, intervals in by_day.items()}
+
+    def day_slots(self, busy, duration=None):
+        """Créneaux libres d'une journée à partir de ses intervalles occupés"""
+        duration = self._duration(duration)
+        slots = []
+        j = 0
+        for window_start, window_end in self.opening_windows():
+            slot_start = window_start
+            while slot_start + duration <= window_end:
+                slot_end = slot_start + duration
+                # Les intervalles occupés terminés avant ce créneau ne servent plus
+                while j < len(busy) and busy[j][1] <= slot_start:
+                    j += 1
+                if j == len(busy) or busy[j][0] >= slot_end:
+                    slots.append(_format_minutes(slot_start))
+                slot_start += self.slot_granularity
+        return slots
+
+    def free_slots(self, start_date, end_date, duration=None, rows=None):
+        """Créneaux libres pour chaque jour ouvré de la période {date: ['HH:MM', ...]}"""
+        duration = self._duration(duration)
+        if rows is None:
+            rows = self.busy_rows(start_date, end_date)
+        busy_by_day = self.busy_intervals(rows)
+
+        result = {}
+        day = start_date
+        while day <= end_date:
+            if day.weekday() in self.open_weekdays:
+                result[day] = self.day_slots(busy_by_day.get(day, []), duration)
+            day += timedelta(days=1)
+        return result
+
+    def find_conflict(self, appointment_date, appointment_time, duration, exclude_id=None):
+        """Retourner l'id d'un rendez-vous qui chevauche le créneau demandé, sinon None"""
+        start = _to_minutes(appointment_time)
+        end = start + self._duration(duration)
+
+        for row in self.busy_rows(appointment_date, appointment_date, exclude_id=exclude_id):
+            row_start = _to_minutes(row.time)
+            row_end = row_start + (row.duration or self.slot_duration)
+            if row_start < end and start < row_end:
+                return row.id
+        return None
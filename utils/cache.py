@@ -0,0 +1,111 @@
+"""
+Cache mémoire à durée de vie limitée
+avec invalidation automatique lors des commits SQLAlchemy
+"""
+
+import threading
+import time
+
+from sqlalchemy import event
+
+from extensions import db
+
+
+class TTLCache:
+    """Petit cache clé/valeur dont les entrées expirent après `ttl` secondes"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Retourner la valeur en cache si elle n'a pas expiré"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        """Enregistrer une valeur"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_set(self, key, factory):
+        """Retourner la valeur en cache ou la calculer avec `factory()`"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Vider le cache"""
+        with self._lock:
+            self._data.clear()
+
+
+_MISSING = object()
+
+
+class ChangeCounter:
+    """Compteur de versions à stocker avec les valeurs en cache : chaque invalidation l'incrémente"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """Invalider : les valeurs stockées avec l'ancienne version ne sont plus servies"""
+        with self._lock:
+            self.value += 1
+
+# Caches à vider au commit, par classe de modèle surveillée
+_watched = []
+
+
+def invalidate_on_commit(cache, *models):
+    """Vider `cache` (ou incrémenter un ChangeCounter) dès qu'une instance de `models` est validée en base"""
+    _watched.append((models, cache))
+
+
+def invalidate(*models):
+    """Vider tout de suite les caches liés à `models`
+
+    Pour les écritures qui ne passent pas par le flush (mises à jour groupées, SQL direct),
+    à appeler après leur commit.
+    """
+    for watched, cache in _watched:
+        if any(issubclass(model, watched) for model in models):
+            cache.clear()
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_invalidations(session, flush_context):
+    """Repérer les caches concernés par les objets écrits lors du flush"""
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if not changed:
+        return
+
+    pending = session.info.setdefault('cache_invalidations', [])
+    for models, cache in _watched:
+        if cache not in pending and any(isinstance(obj, models) for obj in changed):
+            pending.append(cache)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_invalidations(session):
+    """Vider les caches une fois la transaction validée"""
+    for cache in session.info.pop('cache_invalidations', []):
+        cache.clear()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_invalidations(session):
+    """Rien n'a été écrit : oublier les invalidations en attente"""
+    session.info.pop('cache_invalidations', None)
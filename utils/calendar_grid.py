@@ -0,0 +1,118 @@
+"""
+Grille du calendrier des rendez-vous
+Les rendez-vous d'un mois sont lus en une requête de colonnes, répartis une fois
+par jour dans la grille semaines x jours, puis la grille est mise en cache ;
+les vues semaine et jour en sont extraites
+"""
+
+import calendar
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import select
+
+from extensions import db
+from models import Appointment, Patient
+from utils.cache import ChangeCounter, TTLCache, invalidate_on_commit
+
+CalendarPatient = namedtuple('CalendarPatient', ['id', 'first_name', 'last_name'])
+
+
+class CalendarEntry(namedtuple('CalendarEntry', [
+    'id', 'date', 'time', 'duration', 'status', 'patient_id', 'first_name', 'last_name'
+])):
+    """Un rendez-vous tel qu'affiché dans le calendrier"""
+
+    __slots__ = ()
+
+    @property
+    def patient(self):
+        """Patient du rendez-vous, comme `Appointment.patient` (gabarits existants)"""
+        return CalendarPatient(self.patient_id, self.first_name, self.last_name)
+
+
+# Une case de la grille ; `in_month` est faux pour les jours des mois voisins
+CalendarDay = namedtuple('CalendarDay', ['date', 'in_month', 'entries'])
+
+# Version des rendez-vous (et des noms de patients) : stockée avec chaque grille
+_appointments_version = ChangeCounter()
+invalidate_on_commit(_appointments_version, Appointment, Patient)
+
+_grid_cache = TTLCache()
+
+_calendar = calendar.Calendar(firstweekday=calendar.MONDAY)
+
+
+class MonthGrid:
+    """Grille d'un mois : semaines complètes du lundi au dimanche"""
+
+    def __init__(self, year, month, weeks):
+        self.year = year
+        self.month = month
+        self.weeks = weeks
+        self._days = {day.date: day for week in weeks for day in week}
+
+    @property
+    def first_day(self):
+        return self.weeks[0][0].date
+
+    @property
+    def last_day(self):
+        return self.weeks[-1][-1].date
+
+    @property
+    def entry_count(self):
+        """Nombre de rendez-vous du mois (hors jours des mois voisins)"""
+        return sum(len(day.entries) for week in self.weeks for day in week if day.in_month)
+
+    def entries(self):
+        """Rendez-vous du mois dans l'ordre (date, heure), sans les jours des mois voisins"""
+        return [entry for week in self.weeks for day in week if day.in_month for entry in day.entries]
+
+    def day(self, value):
+        """Case d'un jour affiché dans la grille"""
+        return self._days[value]
+
+    def week(self, value):
+        """Semaine (7 cases) contenant le jour donné"""
+        for week in self.weeks:
+            if week[0].date <= value <= week[-1].date:
+                return week
+        raise KeyError(value)
+
+
+def _build_grid(year, month):
+    """Lire les rendez-vous affichés par la grille et les répartir par jour"""
+    weeks = _calendar.monthdatescalendar(year, month)
+    rows = db.session.execute(
+        select(Appointment.id, Appointment.date, Appointment.time, Appointment.duration,
+               Appointment.status, Appointment.patient_id, Patient.first_name, Patient.last_name)
+        .join(Patient, Patient.id == Appointment.patient_id)
+        .where(Appointment.date >= weeks[0][0], Appointment.date <= weeks[-1][-1])
+        .order_by(Appointment.date, Appointment.time, Appointment.id)
+    ).all()
+
+    buckets = {}
+    for row in rows:
+        buckets.setdefault(row.date, []).append(CalendarEntry(*row))
+
+    return MonthGrid(year, month, [
+        [CalendarDay(day, day.month == month, tuple(buckets.get(day, ()))) for day in week]
+        for week in weeks
+    ])
+
+
+def month_grid(year, month):
+    """Grille du mois, recalculée seulement si des rendez-vous ont été écrits depuis"""
+    _grid_cache.ttl = current_app.config['CALENDAR_CACHE_TTL']
+    # Une entrée par mois : la grille périmée est remplacée au lieu de rester en mémoire
+    key = (str(db.engine.url), year, month)
+    version = _appointments_version.value
+    cached = _grid_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    grid = _build_grid(year, month)
+    _grid_cache.set(key, (version, grid))
+    return grid
+
@@ -0,0 +1,108 @@
+"""
+Journal des changements (change_log)
+Chaque insertion, modification ou suppression de patient, rendez-vous, séance,
+réponse à un questionnaire ou document ajoute une ligne numérotée, dans la même
+transaction : les exports et synchronisations lisent la suite depuis leur dernier
+numéro au lieu de relire toute la base
+"""
+
+from datetime import datetime
+
+from sqlalchemy import event, inspect, select, text
+
+from extensions import db
+from models import Appointment, ChangeLog, Document, Patient, QuestionnaireResponse, TherapySession
+
+# Modèles journalisés
+TRACKED_MODELS = (Patient, Appointment, TherapySession, QuestionnaireResponse, Document)
+
+# Colonnes techniques dont la seule modification ne constitue pas un changement
+IGNORED_FIELDS = {'updated_at'}
+
+# Verrou PostgreSQL (pg_advisory_xact_lock) des transactions qui écrivent dans le journal
+SEQUENCE_LOCK_KEY = 0x63686C67
+
+
+def _insert_entries(connection, entries):
+    """Ajouter des lignes au journal, numérotées dans l'ordre de validation
+
+    SQLite n'a qu'un écrivain à la fois : les numéros sont toujours validés dans l'ordre.
+    Sur PostgreSQL, deux transactions peuvent valider dans l'ordre inverse de leurs
+    numéros et un lecteur passerait définitivement le plus petit : un verrou de
+    transaction sérialise les écrivains du journal jusqu'à leur commit.
+    """
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': SEQUENCE_LOCK_KEY})
+    connection.execute(ChangeLog.__table__.insert(), entries)
+
+
+def _patient_id(obj):
+    return obj.id if isinstance(obj, Patient) else obj.patient_id
+
+
+def _entry(obj, operation, fields=None, now=None):
+    return {
+        'entity': obj.__tablename__,
+        'entity_id': obj.id,
+        'patient_id': _patient_id(obj),
+        'operation': operation,
+        'fields': fields,
+        'changed_at': now,
+    }
+
+
+def _changed_fields(obj):
+    """Colonnes réellement modifiées d'un objet (historique encore disponible après le flush)"""
+    state = inspect(obj)
+    return sorted(
+        attr.key for attr in state.mapper.column_attrs
+        if attr.key not in IGNORED_FIELDS and state.attrs[attr.key].history.has_changes()
+    )
+
+
+def record_changes(connection, entity, rows, operation, fields=None):
+    """Journaliser des écritures faites hors de l'ORM (mises à jour groupées)
+
+    `rows` : couples (id, patient_id).
+    """
+    now = datetime.utcnow()
+    entries = [{
+        'entity': entity, 'entity_id': entity_id, 'patient_id': patient_id,
+        'operation': operation, 'fields': fields, 'changed_at': now,
+    } for entity_id, patient_id in rows]
+    if entries:
+        _insert_entries(connection, entries)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_flush(session, flush_context):
+    """Journaliser les objets suivis écrits lors du flush"""
+    now = datetime.utcnow()
+    entries = []
+    for obj in session.new:
+        if isinstance(obj, TRACKED_MODELS):
+            entries.append(_entry(obj, 'insert', now=now))
+    for obj in session.dirty:
+        if isinstance(obj, TRACKED_MODELS):
+            fields = _changed_fields(obj)
+            if fields:
+                entries.append(_entry(obj, 'update', fields, now))
+    for obj in session.deleted:
+        if isinstance(obj, TRACKED_MODELS):
+            entries.append(_entry(obj, 'delete', now=now))
+
+    if entries:
+        _insert_entries(session.connection(), entries)
+
+
+def changes_since(since, limit=500, entity=None):
+    """Changements de numéro strictement supérieur à `since`, dans l'ordre"""
+    query = select(ChangeLog).where(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit)
+    if entity:
+        query = query.where(ChangeLog.entity == entity)
+    return db.session.scalars(query).all()
+
+
+def latest_seq():
+    """Dernier numéro attribué (0 si le journal est vide)"""
+    return db.session.scalar(select(db.func.max(ChangeLog.seq))) or 0
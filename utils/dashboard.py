@@ -0,0 +1,55 @@
+"""
+Statistiques du tableau de bord
+Une requête pour les rendez-vous de la période, compteurs globaux en cache
+"""
+
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import Appointment, Patient
+from utils.cache import TTLCache, invalidate_on_commit
+
+# Compteurs globaux (patients, rendez-vous), vidés à chaque commit concerné
+_counters_cache = TTLCache()
+invalidate_on_commit(_counters_cache, Appointment, Patient)
+
+
+def get_counters():
+    """Nombre total de patients et de rendez-vous (en cache)"""
+    _counters_cache.ttl = current_app.config['DASHBOARD_STATS_TTL']
+    return _counters_cache.get_or_set('counters', _count_all)
+
+
+def _count_all():
+    """Calculer les deux compteurs en un seul aller-retour"""
+    row = db.session.execute(select(
+        select(func.count(Patient.id)).scalar_subquery(),
+        select(func.count(Appointment.id)).scalar_subquery()
+    )).one()
+    return {'total_patients': row[0], 'total_appointments': row[1]}
+
+
+def get_dashboard_data(today=None, upcoming_limit=5):
+    """Rendez-vous du jour, de la période à venir et compteurs globaux"""
+    today = today or date.today()
+    window_end = today + timedelta(days=current_app.config['DASHBOARD_WINDOW_DAYS'])
+
+    # Une seule requête pour toute la période (patients chargés par jointure)
+    window_appointments = Appointment.query.options(
+        joinedload(Appointment.patient)
+    ).filter(
+        Appointment.date.between(today, window_end)
+    ).order_by(Appointment.date, Appointment.time).all()
+
+    data = {
+        'today': today,
+        'today_appointments': [apt for apt in window_appointments if apt.date == today],
+        'week_appointments': window_appointments,
+        'upcoming_appointments': window_appointments[:upcoming_limit],
+    }
+    data.update(get_counters())
+    return data
@@ -0,0 +1,205 @@
+"""
+Export des données cliniques en CSV ou NDJSON, en flux
+Les lignes sont lues par lots (yield_per) sous forme de tuples et écrites au fil de
+l'eau par un générateur : la mémoire reste constante quel que soit le volume et les
+premiers octets partent dès le premier lot
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, time
+
+from sqlalchemy import select
+
+from extensions import db
+from models import Appointment, Patient, Questionnaire, QuestionnaireResponse, TherapySession
+from utils.scoring import get_plan
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Jeux de données exportables (modèle exporté colonne par colonne)
+TABLES = {
+    'patients': Patient,
+    'appointments': Appointment,
+    'sessions': TherapySession,
+}
+DATASETS = tuple(TABLES) + ('responses',)
+
+# Colonnes fixes des réponses, avant les sous-échelles et les items de chaque questionnaire
+RESPONSE_COLUMNS = [
+    'id', 'questionnaire', 'questionnaire_id', 'patient_id', 'session_id', 'completed_at',
+    'total_score', 'interpretation', 'notes', 'updated_at'
+]
+
+
+def _plain(value):
+    """Valeur sérialisable (dates au format ISO)"""
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+class _Export:
+    """En-tête et lignes (tuples) d'un jeu de données"""
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+
+def _table_export(model, patient_id, chunk_size):
+    columns = list(model.__table__.columns)
+    query = select(*columns).order_by(model.id)
+    if patient_id is not None:
+        query = query.where((model.id if model is Patient else model.patient_id) == patient_id)
+
+    def rows():
+        yield from db.session.execute(query.execution_options(yield_per=chunk_size))
+
+    return _Export([column.name for column in columns], rows())
+
+
+class UnknownQuestionnaire(LookupError):
+    """Sigle de questionnaire absent de la base"""
+
+
+def _unique(name, taken):
+    """`name`, ou `name_2`, `name_3`… si le nom est déjà pris"""
+    candidate, suffix = name, 2
+    while candidate in taken:
+        candidate = f'{name}_{suffix}'
+        suffix += 1
+    return candidate
+
+
+def _own_columns(prefix, subscale_names, item_ids, taken=()):
+    """Colonnes préfixées des sous-échelles et des items, uniques entre elles et vis-à-vis de `taken`"""
+    taken = set(taken) | {prefix}
+    layout = []
+    for kind, names in (('', subscale_names), ('q', item_ids)):
+        columns = []
+        for name in names:
+            column = _unique(f'{prefix}_{kind}{name}', taken)
+            taken.add(column)
+            columns.append((column, name))
+        layout.append(columns)
+    return layout
+
+
+def _response_export(patient_id, questionnaire, chunk_size):
+    """Réponses aplaties : une colonne par sous-échelle et par item, préfixée du sigle (unique)"""
+    questionnaires = Questionnaire.query.order_by(Questionnaire.id)
+    if questionnaire:
+        questionnaires = questionnaires.filter(Questionnaire.short_name == questionnaire).all()
+        if not questionnaires:
+            raise UnknownQuestionnaire(f'Questionnaire inconnu : {questionnaire}')
+
+    columns = list(RESPONSE_COLUMNS)
+    used = set(columns)
+    # Par questionnaire : (préfixe, [(colonne, sous-échelle)], [(colonne, id de l'item)])
+    layouts = {}
+    for definition in questionnaires:
+        subscale_names = [name for name, _, _, _ in get_plan(definition).subscales]
+        # Numérotation des questions identique à celle du plan de cotation
+        item_ids = [str(question.get('id', idx)) for idx, question in enumerate(definition.questions or [], 1)]
+
+        # Sigle en double ou colonnes déjà prises (colonnes fixes, autre questionnaire) :
+        # repli sur Q<id>, puis sur des noms suffixés, pour qu'aucune cellule n'en écrase une autre
+        candidates = [definition.short_name] if definition.short_name else []
+        for prefix in candidates + [f'Q{definition.id}']:
+            if prefix in used:
+                continue
+            subscales, items = _own_columns(prefix, subscale_names, item_ids)
+            if used.isdisjoint(column for column, _ in subscales + items):
+                break
+        else:
+            prefix = _unique(f'Q{definition.id}', used)
+            subscales, items = _own_columns(prefix, subscale_names, item_ids, used)
+
+        own = [column for column, _ in subscales + items]
+        used.add(prefix)
+        used.update(own)
+        layouts[definition.id] = (prefix, subscales, items)
+        columns.extend(own)
+
+    position = {column: index for index, column in enumerate(columns)}
+
+    query = select(
+        QuestionnaireResponse.id, QuestionnaireResponse.questionnaire_id, QuestionnaireResponse.patient_id,
+        QuestionnaireResponse.session_id, QuestionnaireResponse.completed_at, QuestionnaireResponse.total_score,
+        QuestionnaireResponse.interpretation, QuestionnaireResponse.notes, QuestionnaireResponse.updated_at,
+        QuestionnaireResponse.subscale_scores, QuestionnaireResponse.responses
+    ).where(QuestionnaireResponse.questionnaire_id.in_(list(layouts))).order_by(QuestionnaireResponse.id)
+    if patient_id is not None:
+        query = query.where(QuestionnaireResponse.patient_id == patient_id)
+
+    def rows():
+        for (response_id, qid, pid, session_id, completed_at, total, interpretation,
+             notes, updated_at, subscale_scores, answers) in db.session.execute(
+                query.execution_options(yield_per=chunk_size)):
+            prefix, subscales, items = layouts[qid]
+            row = [response_id, prefix, qid, pid, session_id, completed_at, total, interpretation, notes, updated_at]
+            row.extend([None] * (len(columns) - len(row)))
+            subscale_scores = subscale_scores or {}
+            for column, name in subscales:
+                row[position[column]] = subscale_scores.get(name)
+            answers = answers or {}
+            for column, key in items:
+                row[position[column]] = answers.get(key)
+            yield row
+
+    return _Export(columns, rows())
+
+
+def open_export(dataset, patient_id=None, questionnaire=None, chunk_size=1000):
+    """Préparer l'export d'un jeu de données ; les lignes sont lues au fil de l'itération
+
+    `questionnaire` (sigle, réponses uniquement) limite l'export à un questionnaire.
+    """
+    if dataset == 'responses':
+        return _response_export(patient_id, questionnaire, chunk_size)
+    if dataset not in TABLES:
+        raise ValueError(f'Jeu de données inconnu : {dataset}')
+    return _table_export(TABLES[dataset], patient_id, chunk_size)
+
+
+def stream_csv(export, rows_per_chunk=500):
+    """Générateur de texte CSV (en-tête puis lignes), par blocs de `rows_per_chunk` lignes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export.columns)
+    count = 0
+    for row in export.rows:
+        writer.writerow([_plain(value) for value in row])
+        count += 1
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(export, rows_per_chunk=500):
+    """Générateur NDJSON : un objet JSON par ligne, par blocs de `rows_per_chunk` lignes"""
+    columns = export.columns
+    lines = []
+    for row in export.rows:
+        lines.append(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_plain))
+        if len(lines) == rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def stream_export(export, fmt):
+    """Générateur de texte au format demandé"""
+    if fmt == 'csv':
+        return stream_csv(export)
+    if fmt == 'ndjson':
+        return stream_ndjson(export)
+    raise ValueError(f'Format inconnu : {fmt}')
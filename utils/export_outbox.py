@@ -0,0 +1,288 @@
+"""
+File d'export vers Google Docs et Sheets (outbox)
+La route enregistre l'export dans la table export_outbox ; un thread
+de fond lit la table, exécute les exports en parallèle (nombre limité) et relance
+les échecs avec un délai croissant : aucun export n'est perdu et la requête web
+n'attend jamais Google. Le Document d'un export n'est créé qu'une fois celui-ci réussi
+"""
+
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import httplib2
+from google.auth.exceptions import TransportError
+from googleapiclient.errors import HttpError
+from sqlalchemy import select, update
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import Document, ExportOutbox, Patient, TherapySession
+from utils.google_integration import GoogleDocsIntegration
+from utils.sheets_sync import RETRY_STATUSES
+
+
+def _export_session_document(entry):
+    """Créer le Google Doc d'une séance, puis le Document qui le référence
+
+    Le Document n'est ajouté qu'après la création du Google Doc : un export en échec
+    ne laisse pas de document vide dans le dossier du patient.
+    """
+    session = db.session.get(TherapySession, entry.target_id)
+    if session is None:
+        raise LookupError(f'Séance {entry.target_id} introuvable')
+
+    # Document déjà créé par une tentative précédente : pas de doublon dans Google Docs
+    if entry.document is not None and entry.document.google_doc_id:
+        return entry.document.google_doc_id
+
+    doc_id = GoogleDocsIntegration().create_session_document(session)
+    if entry.document is None:
+        entry.document = Document(
+            patient_id=session.patient_id,
+            document_type='Compte-rendu de séance (Google Docs)',
+            title=f"Séance du {session.session_date.strftime('%d/%m/%Y')}"
+        )
+    entry.document.google_doc_id = doc_id
+    return doc_id
+
+
+def _sync_patient_sheet(entry):
+    """Synchroniser la feuille de suivi d'un patient"""
+    patient = db.session.get(Patient, entry.target_id)
+    if patient is None:
+        raise LookupError(f'Patient {entry.target_id} introuvable')
+
+    GoogleDocsIntegration().sync_patient_spreadsheet(patient)
+    return patient.google_spreadsheet_id
+
+
+# Exécution de chaque type d'export ; retourne l'identifiant Google obtenu
+EXPORTERS = {
+    'gdocs_session': _export_session_document,
+    'sheets_patient': _sync_patient_sheet,
+}
+
+
+def _is_transient(error):
+    """Erreur passagère (quota, erreur serveur Google, réseau) qui justifie une relance
+
+    Les erreurs Google sont souvent ré-emballées : la chaîne des causes est parcourue.
+    Tout le reste (API non configurée, cible supprimée, requête refusée) est définitif.
+    """
+    while error is not None:
+        if isinstance(error, HttpError):
+            return int(error.resp.status) in RETRY_STATUSES
+        if isinstance(error, (httplib2.HttpLib2Error, TransportError, ConnectionError, TimeoutError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _target_running():
+    """Un autre export de la même cible est-il en cours ? (un seul à la fois par cible)"""
+    running = aliased(ExportOutbox)
+    return select(running.id).where(
+        running.kind == ExportOutbox.kind,
+        running.target_id == ExportOutbox.target_id,
+        running.status == 'running'
+    ).exists()
+
+
+class ExportOutboxWorker:
+    """Vide la table export_outbox en arrière-plan"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self._slots = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        workers = app.config['GOOGLE_EXPORT_WORKERS']
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='google-export')
+        self._slots = threading.BoundedSemaphore(workers)
+        # Démarrage à la première requête : les exports laissés en attente sont repris
+        app.before_request(self.start)
+
+    def enqueue(self, kind, target_id, patient_id=None):
+        """Ajouter un export à la session courante (validé par le commit de l'appelant)
+
+        Un export identique encore en attente est réutilisé plutôt que dupliqué ; un export
+        déjà en cours a lu ses données avant les dernières modifications : un nouvel
+        export est alors mis en attente (lancé une fois le premier terminé).
+        """
+        if kind not in EXPORTERS:
+            raise ValueError(f"Type d'export inconnu : {kind}")
+
+        existing = ExportOutbox.query.filter(
+            ExportOutbox.kind == kind,
+            ExportOutbox.target_id == target_id,
+            ExportOutbox.status == 'pending'
+        ).first()
+        if existing is not None:
+            return existing
+
+        entry = ExportOutbox(kind=kind, target_id=target_id, patient_id=patient_id,
+                             status='pending', next_attempt_at=datetime.utcnow())
+        db.session.add(entry)
+        return entry
+
+    def notify(self):
+        """Signaler de nouveaux exports (après le commit) et démarrer le worker au besoin"""
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        """Lancer le thread de fond (une fois par processus) ; il reprend aussi les exports en attente"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='google-export-outbox', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    try:
+                        self.drain()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                self.app.logger.exception(f"File d'export Google : {e}")
+            self._wakeup.wait(self.app.config['GOOGLE_EXPORT_POLL_INTERVAL'])
+            self._wakeup.clear()
+
+    def drain(self):
+        """Confier au pool les exports arrivés à échéance, dans la limite des places libres"""
+        self._recover_stale()
+
+        due = ExportOutbox.query.with_entities(ExportOutbox.id).filter(
+            ExportOutbox.status == 'pending',
+            ExportOutbox.next_attempt_at <= datetime.utcnow(),
+            ~_target_running()
+        ).order_by(ExportOutbox.next_attempt_at, ExportOutbox.id).limit(self.app.config['GOOGLE_EXPORT_WORKERS']).all()
+
+        submitted = 0
+        for (entry_id,) in due:
+            if not self._slots.acquire(blocking=False):
+                break
+            token = self._claim(entry_id)
+            if token is None:
+                self._slots.release()
+                continue
+            self.executor.submit(self._run, entry_id, token)
+            submitted += 1
+        return submitted
+
+    def _recover_stale(self):
+        """Remettre en attente les exports 'running' abandonnés (worker arrêté en cours de route)
+
+        Un export actif rafraîchit updated_at (voir _heartbeat) : seuls ceux restés sans
+        nouvelles pendant GOOGLE_EXPORT_TIMEOUT sont repris.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=self.app.config['GOOGLE_EXPORT_TIMEOUT'])
+        db.session.execute(
+            update(ExportOutbox)
+            .where(ExportOutbox.status == 'running', ExportOutbox.updated_at < stale_before)
+            .values(status='pending', next_attempt_at=datetime.utcnow(), updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    def _claim(self, entry_id):
+        """Passer un export de 'pending' à 'running' ; retourne le jeton du worker, None s'il est déjà pris"""
+        token = uuid.uuid4().hex
+        claimed = db.session.execute(
+            update(ExportOutbox)
+            .where(ExportOutbox.id == entry_id, ExportOutbox.status == 'pending', ~_target_running())
+            .values(status='running', attempts=ExportOutbox.attempts + 1, claim_token=token,
+                    updated_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        return token if claimed == 1 else None
+
+    @contextmanager
+    def _heartbeat(self, entry_id, token):
+        """Rafraîchir updated_at pendant l'export, pour qu'un export lent ne soit pas repris"""
+        engine = db.engine
+        interval = self.app.config['GOOGLE_EXPORT_TIMEOUT'] / 3
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    with engine.begin() as connection:
+                        connection.execute(
+                            ExportOutbox.__table__.update()
+                            .where(ExportOutbox.id == entry_id, ExportOutbox.claim_token == token)
+                            .values(updated_at=datetime.utcnow())
+                        )
+                except Exception as e:
+                    self.app.logger.warning(f"Export {entry_id} : signal d'activité impossible ({e})")
+
+        thread = threading.Thread(target=beat, name=f'google-export-heartbeat-{entry_id}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+
+    def _finish(self, entry_id, token, **values):
+        """Enregistrer l'issue d'un export, s'il appartient encore à ce worker"""
+        owned = db.session.execute(
+            update(ExportOutbox)
+            .where(ExportOutbox.id == entry_id, ExportOutbox.claim_token == token)
+            .values(updated_at=datetime.utcnow(), **values)
+        ).rowcount
+        if not owned:
+            self.app.logger.warning(f"Export {entry_id} repris par un autre worker : issue non enregistrée")
+        return owned == 1
+
+    def _retry_delay(self, attempts):
+        """Délai croissant avant la tentative suivante, avec gigue"""
+        delay = self.app.config['GOOGLE_EXPORT_RETRY_DELAY'] * 2 ** (attempts - 1)
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def _run(self, entry_id, token):
+        """Exécuter un export (dans un thread du pool)"""
+        try:
+            with self.app.app_context():
+                try:
+                    entry = db.session.get(ExportOutbox, entry_id)
+                    try:
+                        with self._heartbeat(entry_id, token):
+                            google_id = EXPORTERS[entry.kind](entry)
+                        # L'identifiant Google du Document est validé même si l'export a été
+                        # repris entre-temps : la reprise le trouvera au lieu d'en recréer un
+                        self._finish(entry_id, token, status='done', google_id=google_id, error=None)
+                        db.session.commit()
+
+                    except Exception as e:
+                        db.session.rollback()
+                        entry = db.session.get(ExportOutbox, entry_id)
+                        if _is_transient(e) and entry.attempts < self.app.config['GOOGLE_EXPORT_MAX_ATTEMPTS']:
+                            outcome = {'status': 'pending',
+                                       'next_attempt_at': datetime.utcnow() + self._retry_delay(entry.attempts)}
+                        else:
+                            outcome = {'status': 'failed'}
+                        self._finish(entry_id, token, error=str(e), **outcome)
+                        db.session.commit()
+                finally:
+                    db.session.remove()
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+
+export_outbox = ExportOutboxWorker()
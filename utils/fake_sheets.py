@@ -0,0 +1,172 @@
+"""
+Service Google Sheets simulé en mémoire
+Mêmes appels que le client googleapiclient (spreadsheets().values().batchUpdate(...).execute())
+pour développer et vérifier la synchronisation sans compte Google ni réseau
+"""
+
+import itertools
+import re
+import threading
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+_RANGE_PATTERN = re.compile(r"^'?(?P<sheet>[^'!]+)'?!(?P<col>[A-Z]+)(?P<row>\d+)(?::(?P<end_col>[A-Z]+)(?P<end_row>\d+))?$")
+
+
+def _column_number(letters):
+    """Lettres de colonne A1 en numéro (A = 1)"""
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+
+def _column_letter(number):
+    """Numéro de colonne (1 = A) en lettres A1"""
+    letters = ''
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def parse_range(a1_range):
+    """'Séances!A2:J5' -> ('Séances', ligne de départ, colonne de départ)"""
+    match = _RANGE_PATTERN.match(a1_range)
+    if not match:
+        raise ValueError(f'Plage A1 invalide : {a1_range}')
+    return match['sheet'], int(match['row']), _column_number(match['col'])
+
+
+class _Request:
+    """Requête différée, comme celles de googleapiclient"""
+
+    def __init__(self, service, method, action):
+        self._service = service
+        self._method = method
+        self._action = action
+
+    def execute(self, num_retries=0):
+        with self._service._lock:
+            self._service.calls.append(self._method)
+            if self._service._failures:
+                status = self._service._failures.pop(0)
+                raise HttpError(httplib2.Response({'status': status}), b'{"error": "simulated"}')
+            return self._action()
+
+
+class _Values:
+    def __init__(self, service):
+        self._service = service
+
+    def batchUpdate(self, spreadsheetId, body):
+        def action():
+            for block in body['data']:
+                self._service._write(spreadsheetId, block['range'], block['values'])
+            return {'spreadsheetId': spreadsheetId, 'totalUpdatedRows': sum(len(b['values']) for b in body['data'])}
+        return _Request(self._service, 'values.batchUpdate', action)
+
+    def append(self, spreadsheetId, range, valueInputOption, body):
+        def action():
+            sheet, _, _ = parse_range(range)
+            rows = self._service.sheet(spreadsheetId, sheet)
+            start = max(rows, default=1) + 1
+            self._service._write(spreadsheetId, f'{sheet}!A{start}', body['values'])
+            return {'spreadsheetId': spreadsheetId}
+        return _Request(self._service, 'values.append', action)
+
+    def get(self, spreadsheetId, range):
+        def action():
+            sheet, _, _ = parse_range(range if '!' in range else f'{range}!A1')
+            return {'range': range, 'values': self._service.rows(spreadsheetId, sheet)}
+        return _Request(self._service, 'values.get', action)
+
+
+class _Spreadsheets:
+    def __init__(self, service):
+        self._service = service
+
+    def values(self):
+        return _Values(self._service)
+
+    def create(self, body, fields=None):
+        def action():
+            spreadsheet_id = f'fake-{next(self._service._ids)}'
+            sheets = {}
+            for index, sheet in enumerate(body.get('sheets', [])):
+                properties = sheet['properties']
+                sheets[properties['title']] = {'sheet_id': properties.get('sheetId', index), 'rows': {}}
+            self._service.spreadsheets_data[spreadsheet_id] = sheets
+            return {'spreadsheetId': spreadsheet_id}
+        return _Request(self._service, 'spreadsheets.create', action)
+
+    def batchUpdate(self, spreadsheetId, body):
+        def action():
+            sheets = self._service.spreadsheets_data[spreadsheetId]
+            by_id = {sheet['sheet_id']: title for title, sheet in sheets.items()}
+            for request in body['requests']:
+                update = request.get('updateCells')
+                if not update:
+                    continue
+                grid = update['range']
+                rows = [
+                    [next(iter(cell['userEnteredValue'].values())) for cell in row['values']]
+                    for row in update['rows']
+                ]
+                title = by_id[grid['sheetId']]
+                column = _column_letter(grid.get('startColumnIndex', 0) + 1)
+                self._service._write(spreadsheetId, f"{title}!{column}{grid['startRowIndex'] + 1}", rows)
+            return {'spreadsheetId': spreadsheetId, 'replies': [{} for _ in body['requests']]}
+        return _Request(self._service, 'spreadsheets.batchUpdate', action)
+
+
+class FakeSheetsService:
+    """Classeurs en mémoire ; `calls` liste les appels exécutés, `fail_next` simule des erreurs HTTP"""
+
+    def __init__(self):
+        self.spreadsheets_data = {}  # id -> {onglet: {'sheet_id', 'rows': {ligne: [valeurs]}}}
+        self.calls = []
+        self._failures = []
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def spreadsheets(self):
+        return _Spreadsheets(self)
+
+    def fail_next(self, *statuses):
+        """Faire échouer les prochains appels avec ces statuts HTTP (ex. 429, 503)"""
+        self._failures.extend(statuses)
+
+    def sheet(self, spreadsheet_id, title):
+        """Lignes d'un onglet ({numéro de ligne: valeurs})"""
+        sheets = self.spreadsheets_data.setdefault(spreadsheet_id, {})
+        sheet = sheets.setdefault(title, {'sheet_id': len(sheets), 'rows': {}})
+        return sheet['rows']
+
+    def rows(self, spreadsheet_id, title):
+        """Contenu d'un onglet de la ligne 1 à la dernière ligne écrite"""
+        rows = self.sheet(spreadsheet_id, title)
+        return [rows.get(number, []) for number in range(1, max(rows, default=0) + 1)]
+
+    def _write(self, spreadsheet_id, a1_range, values):
+        sheet, start_row, start_column = parse_range(a1_range)
+        rows = self.sheet(spreadsheet_id, sheet)
+        for offset, row_values in enumerate(values):
+            row = list(rows.get(start_row + offset, []))
+            end = start_column - 1 + len(row_values)
+            row.extend([''] * (end - len(row)))
+            row[start_column - 1:end] = row_values
+            rows[start_row + offset] = row
+
+
+# Service partagé par le processus (GOOGLE_SHEETS_FAKE)
+_shared_service = None
+
+
+def shared_service():
+    """Instance commune, pour que les données simulées survivent d'une requête à l'autre"""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = FakeSheetsService()
+    return _shared_service
@@ -0,0 +1,134 @@
+"""
+Clients Google API partagés par le processus
+Les credentials sont lus une seule fois, les services (Docs, Sheets, Drive) construits
+à la demande à partir des documents de découverte fournis avec googleapiclient,
+un client HTTP (connexions persistantes, délai d'attente) par thread, et le jeton
+d'accès renouvelé avant son expiration plutôt qu'au milieu d'une requête
+"""
+
+import functools
+import threading
+from datetime import datetime, timedelta
+
+import google_auth_httplib2
+import httplib2
+from google.oauth2 import service_account
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+SCOPES = [
+    'https://www.googleapis.com/auth/documents',
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive.file'
+]
+
+# Version de chaque API utilisée
+SERVICES = {'docs': 'v1', 'sheets': 'v4', 'drive': 'v3'}
+
+
+@functools.lru_cache(maxsize=None)
+def discovery_document(name, version):
+    """Document de découverte fourni avec la bibliothèque (jamais téléchargé)"""
+    document = get_static_doc(name, version)
+    if document is None:
+        raise ValueError(f"Document de découverte introuvable pour {name} {version}")
+    return document
+
+
+class GoogleClientProvider:
+    """Credentials chargés une fois et services Google réutilisés d'une requête à l'autre"""
+
+    def __init__(self, app=None):
+        self.credentials_file = None
+        self.timeout = 30
+        self.refresh_margin = timedelta(minutes=5)
+        self.use_fake_sheets = False
+        self._credentials = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.credentials_file = app.config['GOOGLE_CREDENTIALS_FILE']
+        self.timeout = app.config['GOOGLE_HTTP_TIMEOUT']
+        self.refresh_margin = timedelta(seconds=app.config['GOOGLE_TOKEN_REFRESH_MARGIN'])
+        self.use_fake_sheets = app.config['GOOGLE_SHEETS_FAKE']
+        self.reset()
+
+    def reset(self):
+        """Oublier credentials et services (changement de fichier de credentials)"""
+        with self._lock:
+            self._credentials = None
+            self._loaded = False
+            self._local = threading.local()
+
+    @property
+    def credentials(self):
+        """Credentials du compte de service, lus au premier usage ; None si absents"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._credentials = self._load_credentials()
+                    self._loaded = True
+        return self._credentials
+
+    def _load_credentials(self):
+        if not self.credentials_file:
+            return None
+        try:
+            return service_account.Credentials.from_service_account_file(self.credentials_file, scopes=SCOPES)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Erreur lors de la configuration des credentials: {e}")
+            return None
+
+    def service(self, name):
+        """Service `name` ('docs', 'sheets', 'drive') du thread courant, ou None sans credentials"""
+        credentials = self.credentials
+        if credentials is None:
+            if name == 'sheets' and self.use_fake_sheets:
+                # Développement hors ligne : classeurs simulés en mémoire
+                from utils.fake_sheets import shared_service
+                return shared_service()
+            return None
+
+        self._refresh_if_expiring(credentials)
+
+        services = getattr(self._local, 'services', None)
+        if services is None:
+            services = self._local.services = {}
+        if name not in services:
+            services[name] = build_from_document(
+                discovery_document(name, SERVICES[name]),
+                http=self._authorized_http(credentials)
+            )
+        return services[name]
+
+    def _authorized_http(self, credentials):
+        """Client HTTP authentifié du thread (httplib2 n'est pas sûr entre threads)"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(
+                credentials, http=httplib2.Http(timeout=self.timeout)
+            )
+        return http
+
+    def _refresh_if_expiring(self, credentials):
+        """Renouveler le jeton s'il manque ou expire dans moins de `refresh_margin`"""
+        if not self._expiring(credentials):
+            return
+        with self._lock:
+            if self._expiring(credentials):
+                credentials.refresh(google_auth_httplib2.Request(httplib2.Http(timeout=self.timeout)))
+
+    def _expiring(self, credentials):
+        # google-auth exprime `expiry` en UTC sans fuseau
+        return (not credentials.token or credentials.expiry is None
+                or credentials.expiry - datetime.utcnow() < self.refresh_margin)
+
+
+# Instance du processus, configurée par app.py
+google_clients = GoogleClientProvider()
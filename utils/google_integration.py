@@ -1,47 +1,31 @@
 from google.oauth2.credentials import Credentials
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from config import Config
-import os
+from extensions import db
+from utils.google_clients import google_clients
+from utils.sheets_sync import SheetsSync, session_row, questionnaire_row, SESSION_HEADERS, QUESTIONNAIRE_HEADERS
 
 class GoogleDocsIntegration:
     """Intégration avec Google Docs et Sheets"""
 
-    def __init__(self):
-        self.credentials = None
-        self.docs_service = None
-        self.sheets_service = None
-        self.drive_service = None
-        self._setup_credentials()
-
-    def _setup_credentials(self):
-        """Configurer les credentials Google API"""
-        # Cette méthode nécessite la configuration d'un compte de service Google
-        # ou l'authentification OAuth2
-
-        # Pour l'instant, on utilise une approche simple avec un fichier de credentials
-        credentials_file = os.path.join(os.path.dirname(__file__), '..', 'google_credentials.json')
-
-        if os.path.exists(credentials_file):
-            try:
-                SCOPES = [
-                    'https://www.googleapis.com/auth/documents',
-                    'https://www.googleapis.com/auth/spreadsheets',
-                    'https://www.googleapis.com/auth/drive.file'
-                ]
+    def __init__(self, provider=None):
+        # Credentials et services partagés par le processus (voir utils/google_clients.py)
+        self.provider = provider or google_clients
+
+    @property
+    def credentials(self):
+        return self.provider.credentials
 
-                self.credentials = service_account.Credentials.from_service_account_file(
-                    credentials_file, scopes=SCOPES
-                )
+    @property
+    def docs_service(self):
+        return self.provider.service('docs')
 
-                self.docs_service = build('docs', 'v1', credentials=self.credentials)
-                self.sheets_service = build('sheets', 'v4', credentials=self.credentials)
-                self.drive_service = build('drive', 'v3', credentials=self.credentials)
+    @property
+    def sheets_service(self):
+        return self.provider.service('sheets')
 
-            except Exception as e:
-                print(f"Erreur lors de la configuration des credentials: {e}")
-                self.credentials = None
+    @property
+    def drive_service(self):
+        return self.provider.service('drive')
 
     def create_session_document(self, session):
         """Créer un document Google Docs pour une séance"""
@@ -129,12 +113,14 @@ Numéro de séance: {session.session_number or 'N/A'}
                 'sheets': [
                     {
                         'properties': {
+                            'sheetId': 0,
                             'title': 'Séances',
                             'gridProperties': {'rowCount': 100, 'columnCount': 10}
                         }
                     },
                     {
                         'properties': {
+                            'sheetId': 1,
                             'title': 'Questionnaires',
                             'gridProperties': {'rowCount': 100, 'columnCount': 10}
                         }
@@ -159,17 +145,8 @@ Numéro de séance: {session.session_number or 'N/A'}
 
     def _add_spreadsheet_headers(self, spreadsheet_id):
         """Ajouter les en-têtes aux feuilles"""
-        # En-têtes pour les séances
-        session_headers = [
-            'Date', 'Numéro', 'Type de thérapie', 'Objectifs',
-            'Interventions', 'Progrès', 'Humeur (1-10)', 'Anxiété (1-10)',
-            'Exercices', 'Prochaine séance'
-        ]
-
-        # En-têtes pour les questionnaires
-        questionnaire_headers = [
-            'Date', 'Questionnaire', 'Score total', 'Interprétation', 'Notes'
-        ]
+        session_headers = SESSION_HEADERS
+        questionnaire_headers = QUESTIONNAIRE_HEADERS
 
         requests = [
             {
@@ -215,18 +192,7 @@ Numéro de séance: {session.session_number or 'N/A'}
             raise Exception("Google Sheets API non configurée")
 
         try:
-            values = [[
-                session.session_date.strftime('%d/%m/%Y'),
-                session.session_number or '',
-                session.therapy_type or '',
-                session.objectives or '',
-                session.interventions or '',
-                session.patient_progress or '',
-                session.mood_score or '',
-                session.anxiety_score or '',
-                session.homework or '',
-                session.next_session_plan or ''
-            ]]
+            values = [session_row(session)]
 
             body = {'values': values}
 
@@ -246,13 +212,7 @@ Numéro de séance: {session.session_number or 'N/A'}
             raise Exception("Google Sheets API non configurée")
 
         try:
-            values = [[
-                response.completed_at.strftime('%d/%m/%Y'),
-                response.questionnaire.name,
-                response.total_score or '',
-                response.interpretation or '',
-                response.notes or ''
-            ]]
+            values = [questionnaire_row(response)]
 
             body = {'values': values}
 
@@ -265,3 +225,18 @@ Numéro de séance: {session.session_number or 'N/A'}
 
         except HttpError as error:
             raise Exception(f"Erreur lors de l'export du questionnaire: {error}")
+
+    def sync_patient_spreadsheet(self, patient):
+        """Synchroniser la feuille de suivi d'un patient (créée au besoin) en un seul appel groupé"""
+        if not self.sheets_service:
+            raise Exception("Google Sheets API non configurée")
+
+        try:
+            if not patient.google_spreadsheet_id:
+                patient.google_spreadsheet_id = self.create_patient_spreadsheet(patient)
+                db.session.commit()
+
+            return SheetsSync.from_config(self.sheets_service).sync_patient(patient)
+
+        except HttpError as error:
+            raise Exception(f"Erreur lors de la synchronisation de la feuille: {error}")
@@ -0,0 +1,109 @@
+"""
+Pagination par clé (keyset / seek)
+Chaque page repart de la dernière ligne affichée au lieu d'un OFFSET,
+le coût est donc constant quelle que soit la position dans la liste
+"""
+
+import base64
+import json
+from datetime import date, datetime, time
+
+from sqlalchemy import tuple_
+
+from utils.cache import TTLCache
+
+# Comptages approximatifs (recalculés au plus une fois par minute)
+_count_cache = TTLCache(ttl=60)
+
+
+def encode_cursor(values, direction='next'):
+    """Encoder les valeurs de tri d'une ligne en curseur opaque"""
+    payload = {
+        'd': direction,
+        'k': [value.isoformat() if isinstance(value, (date, datetime, time)) else value for value in values]
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Décoder un curseur ; retourne (valeurs, direction) ou (None, 'next') s'il est invalide"""
+    if not cursor:
+        return None, 'next'
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if len(payload['k']) != len(columns):
+            return None, 'next'
+        values = []
+        for column, value in zip(columns, payload['k']):
+            python_type = column.type.python_type
+            if value is not None and python_type in (date, datetime, time):
+                value = python_type.fromisoformat(value)
+            values.append(value)
+        direction = payload['d'] if payload['d'] in ('next', 'prev') else 'next'
+        return values, direction
+    except (ValueError, KeyError, TypeError):
+        return None, 'next'
+
+
+class KeysetPage:
+    """Une page de résultats et les curseurs vers les pages voisines"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def approximate_count(query):
+    """Nombre de lignes de la requête, mis en cache quelques instants"""
+    compiled = query.statement.compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    return _count_cache.get_or_set(key, query.order_by(None).count)
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, descending=False, with_count=False):
+    """Paginer `query` selon `columns` (la dernière colonne doit être unique, ex. id)"""
+    values, direction = decode_cursor(cursor, columns)
+    total = approximate_count(query) if with_count else None
+
+    # Pour la page précédente on parcourt l'index en sens inverse
+    backwards = direction == 'prev'
+    reverse_order = descending != backwards
+
+    keys = tuple_(*columns)
+    if values is not None:
+        query = query.filter(keys < tuple_(*values) if reverse_order else keys > tuple_(*values))
+
+    order = [column.desc() if reverse_order else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def key_of(item):
+        return [getattr(item, column.key) for column in columns]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        # En avançant, il reste des lignes si on en a reçu une de plus ;
+        # en reculant, la page suivante existe forcément (on en vient)
+        if (has_more and not backwards) or (backwards and values is not None):
+            next_cursor = encode_cursor(key_of(rows[-1]), 'next')
+        if (has_more and backwards) or (not backwards and values is not None):
+            prev_cursor = encode_cursor(key_of(rows[0]), 'prev')
+
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor, total)
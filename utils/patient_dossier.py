@@ -0,0 +1,145 @@
+"""
+Historique d'un patient pour le dossier PDF
+Séances et scores lus par petits lots de colonnes (sans charger les relations
+ni le texte complet des notes), courbes réduites à un nombre de points borné
+"""
+
+import math
+
+from sqlalchemy import func, select, tuple_
+
+from extensions import db
+from models import Questionnaire, QuestionnaireResponse, TherapySession
+
+
+class _Downsampler:
+    """Moyenne des points (x, y) consécutifs pour n'en garder qu'au plus max_points"""
+
+    def __init__(self, count, max_points):
+        self.bucket = max(1, math.ceil(count / max_points))
+        self.points = []
+        self._sum_x = self._sum_y = self._n = 0
+
+    def add(self, x, y):
+        if y is None:
+            return
+        self._sum_x += x
+        self._sum_y += y
+        self._n += 1
+        if self._n == self.bucket:
+            self._flush()
+
+    def _flush(self):
+        self.points.append((self._sum_x / self._n, self._sum_y / self._n))
+        self._sum_x = self._sum_y = self._n = 0
+
+    def result(self):
+        if self._n:
+            self._flush()
+        return self.points
+
+
+class PatientHistory:
+    """Séances et évolutions des scores d'un patient, lues à la demande"""
+
+    SUMMARY_LENGTH = 160
+
+    def __init__(self, patient_id, chunk_size=200, max_points=120):
+        self.patient_id = patient_id
+        self.chunk_size = chunk_size
+        self.max_points = max_points
+
+    def fingerprint(self):
+        """Résumé des séances et réponses (invalide le PDF en cache quand elles changent)"""
+        sessions = db.session.execute(
+            select(func.count(TherapySession.id), func.max(TherapySession.updated_at))
+            .where(TherapySession.patient_id == self.patient_id)
+        ).one()
+        responses = db.session.execute(
+            select(func.count(QuestionnaireResponse.id), func.max(QuestionnaireResponse.id),
+                   func.sum(QuestionnaireResponse.total_score), func.max(QuestionnaireResponse.updated_at))
+            .where(QuestionnaireResponse.patient_id == self.patient_id)
+        ).one()
+        return {'sessions': list(sessions), 'responses': list(responses)}
+
+    def session_rows(self):
+        """Séances dans l'ordre chronologique : (date, numéro, type, humeur, anxiété, objectifs)"""
+        summary = func.substr(TherapySession.objectives, 1, self.SUMMARY_LENGTH)
+        query = (
+            select(TherapySession.session_date, TherapySession.id, TherapySession.session_number,
+                   TherapySession.therapy_type, TherapySession.mood_score,
+                   TherapySession.anxiety_score, summary)
+            .where(TherapySession.patient_id == self.patient_id)
+            .order_by(TherapySession.session_date, TherapySession.id)
+            .limit(self.chunk_size)
+        )
+
+        last = None
+        while True:
+            chunk_query = query
+            if last is not None:
+                chunk_query = query.where(tuple_(TherapySession.session_date, TherapySession.id) > tuple_(*last))
+            rows = db.session.execute(chunk_query).all()
+            for session_date, _, number, therapy_type, mood, anxiety, objectives in rows:
+                yield session_date, number, therapy_type, mood, anxiety, objectives
+            if len(rows) < self.chunk_size:
+                return
+            last = rows[-1][:2]
+
+    def session_series(self):
+        """Courbes humeur / anxiété : {libellé: [(jour ordinal, score)]}"""
+        count = db.session.execute(
+            select(func.count(TherapySession.id)).where(TherapySession.patient_id == self.patient_id)
+        ).scalar()
+        if not count:
+            return {}
+
+        rows = db.session.execute(
+            select(TherapySession.session_date, TherapySession.mood_score, TherapySession.anxiety_score)
+            .where(TherapySession.patient_id == self.patient_id)
+            .order_by(TherapySession.session_date)
+            .execution_options(yield_per=self.chunk_size)
+        )
+        mood = _Downsampler(count, self.max_points)
+        anxiety = _Downsampler(count, self.max_points)
+        for session_date, mood_score, anxiety_score in rows:
+            x = session_date.toordinal()
+            mood.add(x, mood_score)
+            anxiety.add(x, anxiety_score)
+
+        series = {'Humeur': mood.result(), 'Anxiété': anxiety.result()}
+        return {label: points for label, points in series.items() if points}
+
+    def questionnaire_series(self):
+        """Scores totaux par questionnaire : {id: (nom, [(jour ordinal, score)])}
+
+        Indexé par identifiant : deux questionnaires de même nom gardent chacun leur courbe.
+        """
+        counts = dict(db.session.execute(
+            select(QuestionnaireResponse.questionnaire_id, func.count(QuestionnaireResponse.id))
+            .where(QuestionnaireResponse.patient_id == self.patient_id,
+                   QuestionnaireResponse.total_score.isnot(None))
+            .group_by(QuestionnaireResponse.questionnaire_id)
+        ).all())
+        if not counts:
+            return {}
+
+        rows = db.session.execute(
+            select(QuestionnaireResponse.questionnaire_id, Questionnaire.name,
+                   QuestionnaireResponse.completed_at, QuestionnaireResponse.total_score)
+            .join(Questionnaire, Questionnaire.id == QuestionnaireResponse.questionnaire_id)
+            .where(QuestionnaireResponse.patient_id == self.patient_id,
+                   QuestionnaireResponse.total_score.isnot(None))
+            .order_by(QuestionnaireResponse.questionnaire_id, QuestionnaireResponse.completed_at)
+            .execution_options(yield_per=self.chunk_size)
+        )
+
+        series = {}
+        current_id = None
+        for questionnaire_id, name, completed_at, total_score in rows:
+            if questionnaire_id != current_id:
+                current_id = questionnaire_id
+                reducer = _Downsampler(counts[questionnaire_id], self.max_points)
+                series[questionnaire_id] = (name, reducer)
+            reducer.add(completed_at.toordinal(), total_score)
+        return {questionnaire_id: (name, reducer.result()) for questionnaire_id, (name, reducer) in series.items()}
@@ -0,0 +1,230 @@
+"""
+Index de recherche des patients
+Table virtuelle SQLite FTS5 synchronisée par les événements SQLAlchemy,
+avec un index en mémoire pour les autres bases de données
+"""
+
+import bisect
+import re
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import event, literal_column, select, text
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import Patient
+from utils.cache import TTLCache, invalidate_on_commit
+
+FTS_TABLE = 'patients_fts'
+INDEXED_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'therapy_type')
+
+# Bases de données (URL du moteur) dont la table FTS existe
+_fts_state = {}
+
+# Index en mémoire utilisé lorsque FTS5 n'est pas disponible
+_python_index_cache = TTLCache(ttl=300)
+invalidate_on_commit(_python_index_cache, Patient)
+
+
+def normalize(value):
+    """Minuscules sans accents : 'Hélène' -> 'helene'"""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _normalize_phone(value):
+    """Ne garder que les chiffres d'un numéro de téléphone"""
+    return re.sub(r'\D', '', value or '')
+
+
+def _tokenize(query):
+    """Découper une recherche en mots normalisés"""
+    query = (query or '').strip()
+    # Un numéro saisi avec des espaces ('06 11 22') est recherché d'un seul bloc
+    if re.fullmatch(r'[\d\s.+-]+', query):
+        digits = _normalize_phone(query)
+        return [digits] if digits else []
+    return re.findall(r'\w+', normalize(query))
+
+
+def _document(patient):
+    """Valeurs indexées d'un patient"""
+    values = {field: getattr(patient, field) or '' for field in INDEXED_FIELDS}
+    values['phone'] = _normalize_phone(values['phone'])
+    return values
+
+
+# ---------------------------------------------------------------------------
+# SQLite FTS5
+# ---------------------------------------------------------------------------
+
+def _fts_enabled(connection):
+    """La table FTS existe-t-elle pour cette base ?
+
+    Seule sa présence est mémorisée : tant qu'elle manque, elle est recherchée à chaque
+    appel (lecture de sqlite_master), pour que la table créée ensuite par init_db, dans
+    ce processus ou un autre, soit utilisée sans redémarrage.
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+    key = str(connection.engine.url)
+    if not _fts_state.get(key):
+        _fts_state[key] = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}
+        ).first() is not None
+    return _fts_state[key]
+
+
+def ensure_search_index():
+    """Créer la table FTS5 si possible et l'alimenter (appelé par init_db)"""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    _fts_state.pop(str(db.engine.url), None)
+    columns = ', '.join(INDEXED_FIELDS)
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{columns}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            ))
+    except OperationalError:
+        # SQLite compilé sans FTS5 : l'index en mémoire prend le relais
+        return False
+
+    _fts_state[str(db.engine.url)] = True
+    rebuild_search_index()
+    return True
+
+
+def rebuild_search_index():
+    """Reconstruire entièrement la table FTS à partir des patients"""
+    with db.engine.begin() as conn:
+        conn.execute(text(f'DELETE FROM {FTS_TABLE}'))
+        rows = conn.execute(select(Patient.id, *[getattr(Patient, f) for f in INDEXED_FIELDS]))
+        for row in rows.mappings().all():
+            values = {field: row[field] or '' for field in INDEXED_FIELDS}
+            values['phone'] = _normalize_phone(values['phone'])
+            _fts_upsert(conn, row['id'], values, replace=False)
+
+
+def _fts_upsert(connection, patient_id, values, replace=True):
+    """Écrire la ligne FTS d'un patient"""
+    if replace:
+        _fts_delete(connection, patient_id)
+    columns = ', '.join(INDEXED_FIELDS)
+    placeholders = ', '.join(f':{field}' for field in INDEXED_FIELDS)
+    connection.execute(
+        text(f'INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (:rowid, {placeholders})'),
+        dict(values, rowid=patient_id)
+    )
+
+
+def _fts_delete(connection, patient_id):
+    """Supprimer la ligne FTS d'un patient"""
+    connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :rowid'), {'rowid': patient_id})
+
+
+@event.listens_for(db.session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    """Répercuter dans la table FTS les patients écrits lors du flush"""
+    written = [obj for obj in list(session.new) + list(session.dirty) if isinstance(obj, Patient)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Patient)]
+    if not written and not deleted:
+        return
+
+    connection = session.connection()
+    if not _fts_enabled(connection):
+        return
+
+    for patient in written:
+        _fts_upsert(connection, patient.id, _document(patient))
+    for patient in deleted:
+        _fts_delete(connection, patient.id)
+
+
+def _fts_match_expression(tokens):
+    """Requête FTS5 : chaque mot est cherché en préfixe ('hel' trouve 'Hélène')"""
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+# ---------------------------------------------------------------------------
+# Index en mémoire (autres bases de données)
+# ---------------------------------------------------------------------------
+
+class PythonSearchIndex:
+    """Index inversé trié permettant la recherche par préfixe"""
+
+    def __init__(self, rows):
+        entries = set()
+        for row in rows:
+            values = dict(zip(INDEXED_FIELDS, row[1:]))
+            words = re.findall(r'\w+', normalize(' '.join(
+                values[field] or '' for field in INDEXED_FIELDS if field != 'phone'
+            )))
+            phone = _normalize_phone(values['phone'])
+            if phone:
+                words.append(phone)
+            entries.update((word, row[0]) for word in words)
+        self._entries = sorted(entries)
+        self._words = [word for word, _ in self._entries]
+
+    def _prefix_ids(self, prefix):
+        """Identifiants des patients ayant un mot commençant par `prefix`"""
+        position = bisect.bisect_left(self._words, prefix)
+        ids = set()
+        while position < len(self._entries) and self._words[position].startswith(prefix):
+            ids.add(self._entries[position][1])
+            position += 1
+        return ids
+
+    def search(self, tokens):
+        """Patients correspondant à tous les mots (recherche par préfixe)"""
+        result = None
+        for token in tokens:
+            ids = self._prefix_ids(token)
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result or set()
+
+
+def _python_index():
+    """Index en mémoire, reconstruit après chaque modification de patient"""
+    def build():
+        rows = db.session.execute(select(Patient.id, *[getattr(Patient, f) for f in INDEXED_FIELDS])).all()
+        return PythonSearchIndex(rows)
+
+    _python_index_cache.ttl = current_app.config['PATIENT_SEARCH_INDEX_TTL']
+    return _python_index_cache.get_or_set('index', build)
+
+
+# ---------------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------------
+
+def search_filter(query):
+    """Condition SQLAlchemy restreignant Patient aux résultats de la recherche"""
+    tokens = _tokenize(query)
+    if not tokens:
+        return Patient.id.is_(None)
+
+    if _fts_enabled(db.session.connection()):
+        matches = select(literal_column('rowid')).select_from(text(FTS_TABLE)).where(
+            text(f'{FTS_TABLE} MATCH :fts_query').bindparams(fts_query=_fts_match_expression(tokens))
+        )
+        return Patient.id.in_(matches)
+
+    return Patient.id.in_(_python_index().search(tokens))
+
+
+def search_patients(query, limit=10, active_only=True):
+    """Patients correspondant à la recherche, triés par nom (autocomplétion)"""
+    patients = Patient.query.filter(search_filter(query))
+    if active_only:
+        patients = patients.filter_by(active=True)
+    return patients.order_by(Patient.last_name, Patient.first_name).limit(limit).all()
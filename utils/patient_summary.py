@@ -0,0 +1,220 @@
+"""
+Synthèse dénormalisée des patients
+Une ligne par patient dans `patient_summary` (derniers et prochains rendez-vous,
+nombre de séances, dernières évaluations, dernier score par questionnaire),
+recalculée pour les seuls patients touchés à chaque flush
+"""
+
+from datetime import date, datetime
+
+from sqlalchemy import delete, event, func, inspect, select
+
+from extensions import db
+from models import (Appointment, Patient, PatientSummary, Questionnaire,
+                    QuestionnaireResponse, TherapySession)
+
+# Taille des lots de patients recalculés ensemble (limite des listes IN)
+REFRESH_BATCH_SIZE = 500
+
+# Modèles dont l'écriture modifie la synthèse de leur patient
+TRACKED_MODELS = (Appointment, TherapySession, QuestionnaireResponse)
+
+# Dernière recherche des prochains rendez-vous dépassés (URL du moteur -> date)
+_stale_checked = {}
+
+
+def _empty_summary(patient_id, now):
+    """Synthèse d'un patient sans rendez-vous, séance ni questionnaire"""
+    return {
+        'patient_id': patient_id,
+        'last_appointment_date': None,
+        'next_appointment_id': None,
+        'next_appointment_date': None,
+        'next_appointment_time': None,
+        'session_count': 0,
+        'last_session_date': None,
+        'last_mood_score': None,
+        'last_anxiety_score': None,
+        'latest_scores': {},
+        'refreshed_at': now,
+    }
+
+
+def _first_per_group(partition, order, columns, *criteria):
+    """Première ligne de chaque groupe selon `order` (ROW_NUMBER() OVER)"""
+    rank = func.row_number().over(partition_by=partition, order_by=order).label('rank')
+    return select(*columns, rank).where(*criteria).subquery()
+
+
+def _compute(connection, patient_ids, today, now):
+    """Calculer la synthèse de chaque patient existant parmi `patient_ids`"""
+    existing = connection.scalars(select(Patient.id).where(Patient.id.in_(patient_ids))).all()
+    summaries = {patient_id: _empty_summary(patient_id, now) for patient_id in existing}
+    if not summaries:
+        return summaries
+    ids = list(summaries)
+
+    # Séances : nombre, date et évaluations de la dernière
+    for patient_id, count in connection.execute(
+        select(TherapySession.patient_id, func.count(TherapySession.id))
+        .where(TherapySession.patient_id.in_(ids))
+        .group_by(TherapySession.patient_id)
+    ):
+        summaries[patient_id]['session_count'] = count
+
+    last_session = _first_per_group(
+        TherapySession.patient_id,
+        [TherapySession.session_date.desc(), TherapySession.id.desc()],
+        [TherapySession.patient_id, TherapySession.session_date,
+         TherapySession.mood_score, TherapySession.anxiety_score],
+        TherapySession.patient_id.in_(ids)
+    )
+    for patient_id, session_date, mood, anxiety, _ in connection.execute(
+        select(last_session).where(last_session.c.rank == 1)
+    ):
+        summaries[patient_id].update(
+            last_session_date=session_date, last_mood_score=mood, last_anxiety_score=anxiety
+        )
+
+    # Rendez-vous : dernier passé (hors annulations) et prochain prévu
+    for patient_id, last_date in connection.execute(
+        select(Appointment.patient_id, func.max(Appointment.date))
+        .where(Appointment.patient_id.in_(ids),
+               Appointment.date < today,
+               Appointment.status != 'cancelled')
+        .group_by(Appointment.patient_id)
+    ):
+        summaries[patient_id]['last_appointment_date'] = last_date
+
+    next_appointment = _first_per_group(
+        Appointment.patient_id,
+        [Appointment.date, Appointment.time, Appointment.id],
+        [Appointment.patient_id, Appointment.id, Appointment.date, Appointment.time],
+        Appointment.patient_id.in_(ids),
+        Appointment.date >= today,
+        Appointment.status == 'scheduled'
+    )
+    for patient_id, appointment_id, appointment_date, appointment_time, _ in connection.execute(
+        select(next_appointment).where(next_appointment.c.rank == 1)
+    ):
+        summaries[patient_id].update(
+            next_appointment_id=appointment_id,
+            next_appointment_date=appointment_date,
+            next_appointment_time=appointment_time
+        )
+
+    # Dernier score de chaque questionnaire
+    latest = _first_per_group(
+        [QuestionnaireResponse.patient_id, QuestionnaireResponse.questionnaire_id],
+        [QuestionnaireResponse.completed_at.desc(), QuestionnaireResponse.id.desc()],
+        [QuestionnaireResponse.patient_id, QuestionnaireResponse.questionnaire_id,
+         QuestionnaireResponse.total_score, QuestionnaireResponse.interpretation,
+         QuestionnaireResponse.completed_at],
+        QuestionnaireResponse.patient_id.in_(ids)
+    )
+    for patient_id, questionnaire_id, short_name, score, interpretation, completed_at in connection.execute(
+        select(latest.c.patient_id, latest.c.questionnaire_id, Questionnaire.short_name,
+               latest.c.total_score, latest.c.interpretation, latest.c.completed_at)
+        .join(Questionnaire, Questionnaire.id == latest.c.questionnaire_id)
+        .where(latest.c.rank == 1)
+        .order_by(latest.c.patient_id, Questionnaire.short_name)
+    ):
+        summaries[patient_id]['latest_scores'][short_name or str(questionnaire_id)] = {
+            'questionnaire_id': questionnaire_id,
+            'score': score,
+            'interpretation': interpretation,
+            'completed_at': completed_at.isoformat() if completed_at else None,
+        }
+
+    return summaries
+
+
+def refresh_summaries(connection, patient_ids, today=None):
+    """Recalculer la synthèse des patients donnés (les patients supprimés perdent la leur)"""
+    patient_ids = sorted({patient_id for patient_id in patient_ids if patient_id is not None})
+    today = today or date.today()
+    now = datetime.utcnow()
+
+    for start in range(0, len(patient_ids), REFRESH_BATCH_SIZE):
+        batch = patient_ids[start:start + REFRESH_BATCH_SIZE]
+        summaries = _compute(connection, batch, today, now)
+        connection.execute(delete(PatientSummary).where(PatientSummary.patient_id.in_(batch)))
+        if summaries:
+            connection.execute(PatientSummary.__table__.insert(), list(summaries.values()))
+
+    return len(patient_ids)
+
+
+def rebuild_summaries(chunk_size=REFRESH_BATCH_SIZE, progress=None):
+    """Reconstruire toutes les synthèses, par lots de patients ; retourne le nombre traité"""
+    db.session.execute(delete(PatientSummary).where(
+        PatientSummary.patient_id.not_in(select(Patient.id))
+    ))
+    db.session.commit()
+
+    processed = 0
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            select(Patient.id).where(Patient.id > last_id).order_by(Patient.id).limit(chunk_size)
+        ).all()
+        if not ids:
+            break
+
+        refresh_summaries(db.session.connection(), ids)
+        db.session.commit()
+
+        processed += len(ids)
+        last_id = ids[-1]
+        if progress:
+            progress(processed)
+        if len(ids) < chunk_size:
+            break
+
+    return processed
+
+
+def refresh_stale_summaries(today=None):
+    """Recalculer les synthèses dont le prochain rendez-vous est passé (une fois par jour)"""
+    today = today or date.today()
+    key = str(db.engine.url)
+    if _stale_checked.get(key) == today:
+        return 0
+
+    stale = db.session.scalars(
+        select(PatientSummary.patient_id).where(PatientSummary.next_appointment_date < today)
+    ).all()
+    if stale:
+        refresh_summaries(db.session.connection(), stale, today)
+        db.session.commit()
+
+    _stale_checked[key] = today
+    return len(stale)
+
+
+def _previous_patient_ids(obj):
+    """Ancien patient d'un objet modifié, si son patient_id a changé"""
+    return set(inspect(obj).attrs.patient_id.history.deleted or ())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_on_flush(session, flush_context):
+    """Recalculer la synthèse des patients dont les données ont été écrites lors du flush"""
+    patient_ids = set()
+    for obj in session.new:
+        if isinstance(obj, Patient):
+            patient_ids.add(obj.id)
+        elif isinstance(obj, TRACKED_MODELS):
+            patient_ids.add(obj.patient_id)
+    for obj in session.dirty:
+        if isinstance(obj, TRACKED_MODELS) and session.is_modified(obj):
+            patient_ids.add(obj.patient_id)
+            patient_ids |= _previous_patient_ids(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            patient_ids.add(obj.id)
+        elif isinstance(obj, TRACKED_MODELS):
+            patient_ids.add(obj.patient_id)
+
+    if patient_ids:
+        refresh_summaries(session.connection(), patient_ids)
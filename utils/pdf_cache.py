@@ -0,0 +1,148 @@
+"""
+Cache des PDF générés
+Chaque rendu est rangé sous l'empreinte de ses données sources : tant que
+la séance, la réponse ou le patient n'a pas changé, le fichier existant est resservi
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import or_, select
+
+from extensions import db
+from models import Document, PdfJob
+from utils.change_log import record_changes
+from utils.pdf_generator import PDFGenerator
+
+
+def fingerprint(kind, payload):
+    """Empreinte SHA-256 des données sources d'un document"""
+    raw = json.dumps(
+        {'kind': kind, 'template': PDFGenerator.TEMPLATE_VERSION, 'data': payload},
+        sort_keys=True, default=str, ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def cache_path(cache_folder, kind, digest):
+    """Chemin du fichier correspondant à une empreinte"""
+    return os.path.join(cache_folder, f'{kind}_{digest[:40]}.pdf')
+
+
+def lookup(path):
+    """Le rendu existe-t-il déjà ? (rafraîchit sa date pour l'éviction LRU)"""
+    if not os.path.exists(path):
+        return False
+    os.utime(path)
+    return True
+
+
+def open_cached(path):
+    """Ouvrir un rendu en cache (date rafraîchie) ; None s'il n'existe pas ou plus
+
+    Le fichier ouvert reste lisible jusqu'à la fin de l'envoi même s'il est évincé entre-temps.
+    """
+    try:
+        handle = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return handle
+
+
+def store(path, render):
+    """Générer le fichier via `render(chemin_temporaire)` puis le publier atomiquement"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        render(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def find_document(patient_id, digest, path):
+    """Document déjà enregistré pour ces données sources (évite les doublons)
+
+    La recherche se fait par empreinte : un Document détaché de son fichier par l'éviction
+    est retrouvé au rendu suivant. Les Documents antérieurs à l'empreinte le sont par chemin.
+    """
+    return Document.query.filter(
+        Document.patient_id == patient_id,
+        or_(Document.fingerprint == digest, Document.file_path == path)
+    ).order_by(Document.id).first()
+
+
+def _remove(path, removed):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    removed.append(path)
+
+
+def forget(paths):
+    """Détacher des fichiers supprimés les Documents et générations qui y renvoient
+
+    Dans la transaction de l'appelant : le Document reste dans l'historique, sans fichier,
+    et le téléchargement d'une génération sans fichier relance le rendu.
+    """
+    connection = db.session.connection()
+    paths = list(paths)
+    for start in range(0, len(paths), 500):
+        chunk = paths[start:start + 500]
+        documents = connection.execute(
+            select(Document.id, Document.patient_id).where(Document.file_path.in_(chunk))
+        ).all()
+        if documents:
+            connection.execute(
+                Document.__table__.update()
+                .where(Document.id.in_([document_id for document_id, _ in documents]))
+                .values(file_path=None, updated_at=datetime.utcnow())
+            )
+            record_changes(connection, Document.__tablename__, documents, 'update', ['file_path'])
+        connection.execute(PdfJob.__table__.update().where(PdfJob.file_path.in_(chunk)).values(file_path=None))
+
+
+def evict(cache_folder, max_bytes, max_age_days):
+    """Supprimer les rendus trop anciens puis les moins récemment servis au-delà de max_bytes
+    (sans limite de taille si max_bytes vaut 0)
+
+    Les Documents et générations liés aux fichiers supprimés en sont détachés (à valider
+    par l'appelant avec sa transaction).
+    """
+    if not os.path.isdir(cache_folder):
+        return 0
+
+    now = time.time()
+    entries = []
+    removed = []
+    for entry in os.scandir(cache_folder):
+        if not entry.is_file() or not entry.name.endswith(('.pdf', '.zip')):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if max_age_days and now - stat.st_mtime > max_age_days * 86400:
+            _remove(entry.path, removed)
+        else:
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if not max_bytes or total <= max_bytes:
+            break
+        _remove(path, removed)
+        total -= size
+
+    if removed:
+        forget(removed)
+    return len(removed)
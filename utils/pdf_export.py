@@ -0,0 +1,212 @@
+"""
+Export groupé des documents PDF
+Séances et questionnaires d'un patient (ou de tous les patients sur une période)
+lus par lots, rendus en parallèle dans un pool de processus, puis réunis en archive ZIP
+ou en un seul PDF
+"""
+
+import heapq
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import datetime, time, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy.orm import joinedload
+
+from models import QuestionnaireResponse, TherapySession
+from utils.pdf_generator import PDFGenerator, register_fonts
+
+
+def _values(instance, *columns):
+    """Copie détachée (et sérialisable) de quelques colonnes d'un enregistrement"""
+    return SimpleNamespace(**{column: getattr(instance, column) for column in columns})
+
+
+def _snapshot_patient(patient):
+    return _values(patient, 'id', 'first_name', 'last_name')
+
+
+def _snapshot_session(session):
+    snapshot = _values(
+        session, 'id', 'patient_id', 'session_date', 'session_number', 'therapy_type',
+        'objectives', 'interventions', 'patient_progress', 'mood_score', 'anxiety_score',
+        'homework', 'next_session_plan'
+    )
+    snapshot.patient = _snapshot_patient(session.patient)
+    return snapshot
+
+
+def _snapshot_response(response):
+    snapshot = _values(
+        response, 'id', 'patient_id', 'completed_at', 'responses',
+        'total_score', 'interpretation', 'notes'
+    )
+    snapshot.patient = _snapshot_patient(response.patient)
+    snapshot.questionnaire = _values(response.questionnaire, 'name', 'short_name', 'questions')
+    return snapshot
+
+
+def _patient_folder(patient):
+    return f"{patient.id}_{patient.last_name.replace(' ', '_')}"
+
+
+def _queries(patient_id=None, start=None, end=None):
+    """Requêtes des séances et des réponses de la sélection"""
+    sessions = TherapySession.query
+    responses = QuestionnaireResponse.query
+    if patient_id is not None:
+        sessions = sessions.filter(TherapySession.patient_id == patient_id)
+        responses = responses.filter(QuestionnaireResponse.patient_id == patient_id)
+    if start is not None:
+        start = datetime.combine(start, time.min)
+        sessions = sessions.filter(TherapySession.session_date >= start)
+        responses = responses.filter(QuestionnaireResponse.completed_at >= start)
+    if end is not None:
+        end = datetime.combine(end + timedelta(days=1), time.min)
+        sessions = sessions.filter(TherapySession.session_date < end)
+        responses = responses.filter(QuestionnaireResponse.completed_at < end)
+    return sessions, responses
+
+
+def count_items(patient_id=None, start=None, end=None):
+    """Nombre de documents de la sélection (deux COUNT, sans charger les lignes)"""
+    sessions, responses = _queries(patient_id, start, end)
+    return sessions.count() + responses.count()
+
+
+def iter_items(patient_id=None, start=None, end=None, chunk_size=200):
+    """Documents à exporter : (type, nom dans l'archive, instantané), par patient puis par date
+
+    `start` / `end` sont des dates incluses ; sans patient, tous les patients de la période.
+    Les lignes sont lues par lots et les deux listes fusionnées au fil de l'eau.
+    """
+    sessions, responses = _queries(patient_id, start, end)
+    sessions = sessions.options(joinedload(TherapySession.patient)).order_by(
+        TherapySession.patient_id, TherapySession.session_date, TherapySession.id
+    ).yield_per(chunk_size)
+    responses = responses.options(
+        joinedload(QuestionnaireResponse.patient),
+        joinedload(QuestionnaireResponse.questionnaire)
+    ).order_by(
+        QuestionnaireResponse.patient_id, QuestionnaireResponse.completed_at, QuestionnaireResponse.id
+    ).yield_per(chunk_size)
+
+    session_items = (
+        (session.patient_id, session.session_date, 'session_report',
+         f"{_patient_folder(session.patient)}/seance_{session.id}_{session.session_date.strftime('%Y%m%d')}.pdf",
+         _snapshot_session(session))
+        for session in sessions
+    )
+    response_items = (
+        (response.patient_id, response.completed_at, 'questionnaire_report',
+         f"{_patient_folder(response.patient)}/questionnaire_{response.questionnaire.short_name}"
+         f"_{response.id}_{response.completed_at.strftime('%Y%m%d')}.pdf",
+         _snapshot_response(response))
+        for response in responses
+    )
+    for _, _, kind, name, snapshot in heapq.merge(session_items, response_items, key=lambda item: item[:2]):
+        yield kind, name, snapshot
+
+
+def _story(generator, kind, snapshot):
+    if kind == 'session_report':
+        return generator.session_report_story(snapshot)
+    return generator.questionnaire_report_story(snapshot)
+
+
+def _render_item(item):
+    """Rendre un document en mémoire (exécuté dans un processus du pool)"""
+    kind, name, snapshot = item
+    buffer = io.BytesIO()
+    generator = PDFGenerator()
+    generator.generate_merged([_story(generator, kind, snapshot)], buffer)
+    return name, buffer.getvalue()
+
+
+def _render_chunk(chunk):
+    """Rendre un lot de documents (un aller-retour avec le pool par lot)"""
+    return [_render_item(item) for item in chunk]
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_zip(items, output, total=None, workers=None, fonts=None, progress=None, chunk_size=8):
+    """Écrire une archive ZIP des documents dans `output` (chemin ou fichier ouvert)
+
+    `items` peut être un itérateur (voir iter_items) : seuls quelques lots sont en cours
+    de rendu à la fois. `progress(fait, total)` est appelé après chaque document.
+    Les processus de rendu sont démarrés en mode « spawn » : pas de fork d'un processus
+    qui fait tourner des threads (serveur web, files d'attente).
+    """
+    if total is None:
+        items = list(items)
+        total = len(items)
+    done = 0
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+        if not total:
+            return 0
+
+        def write(results):
+            nonlocal done
+            for name, data in results:
+                archive.writestr(name, data)
+                done += 1
+                if progress:
+                    progress(done, total)
+
+        workers = min(workers or os.cpu_count() or 1, total)
+        if workers == 1:
+            # Inutile de démarrer des processus pour un seul document
+            write(_render_item(item) for item in items)
+            return done
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=register_fonts, initargs=(fonts,)) as executor:
+            running = set()
+            for chunk in _chunks(items, chunk_size):
+                running.add(executor.submit(_render_chunk, chunk))
+                if len(running) >= workers * 2:
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        write(future.result())
+            for future in as_completed(running):
+                write(future.result())
+    return done
+
+
+def export_merged(items, output, total=None, progress=None):
+    """Écrire tous les documents dans un seul PDF (une mise en page unique, sans pool)
+
+    Les contenus sont préparés d'abord, puis mis en page en une fois : c'est la mise en
+    page, de loin l'étape la plus longue, que suit `progress(fait, total)`, document par
+    document. Un seul PDF ne peut pas être rendu par morceaux sans outil de fusion :
+    tous les contenus restent en mémoire pendant la mise en page.
+    """
+    generator = PDFGenerator()
+    stories = [_story(generator, kind, snapshot) for kind, _, snapshot in items]
+    total = total or len(stories)
+    done = 0
+
+    def laid_out():
+        nonlocal done
+        done += 1
+        # Le dernier document n'est compté qu'une fois le fichier entièrement écrit
+        if done < len(stories):
+            progress(done, total)
+
+    generator.generate_merged(stories, output, on_document=laid_out if progress else None)
+    if progress and stories:
+        progress(len(stories), total)
+    return len(stories)
@@ -1,56 +1,190 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Flowable
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from datetime import datetime
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.widgets.markers import makeMarker
+from datetime import date, datetime
+from types import MappingProxyType
+from xml.sax.saxutils import escape
+import threading
+
+# ---------------------------------------------------------------------------
+# Registre des styles, construit une seule fois par processus
+# ---------------------------------------------------------------------------
+
+_styles = None
+_styles_lock = threading.Lock()
+
+
+def _build_styles():
+    """Feuille de styles de base et styles personnalisés"""
+    styles = getSampleStyleSheet()
+
+    # Style pour le titre
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    ))
+
+    # Style pour les sous-titres
+    styles.add(ParagraphStyle(
+        name='CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#34495e'),
+        spaceAfter=12,
+        spaceBefore=12
+    ))
+
+    # Style pour le texte normal
+    styles.add(ParagraphStyle(
+        name='CustomBody',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=8
+    ))
+
+    return MappingProxyType(dict(styles.byName))
+
+
+def get_styles():
+    """Styles de paragraphe partagés (lecture seule)"""
+    global _styles
+    if _styles is None:
+        with _styles_lock:
+            if _styles is None:
+                _styles = _build_styles()
+    return _styles
+
+
+# Styles de tableau réutilisés par tous les documents
+LABEL_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+])
+
+LABEL_TABLE_STYLE_TOP = TableStyle(
+    list(LABEL_TABLE_STYLE.getCommands()) + [('VALIGN', (0, 0), (-1, -1), 'TOP')]
+)
+
+GRID_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8)
+])
+
+
+HISTORY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#ecf0f1')),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+])
+
+# Couleurs des courbes, dans l'ordre des séries
+CHART_COLORS = [colors.HexColor('#2980b9'), colors.HexColor('#c0392b'), colors.HexColor('#27ae60'),
+                colors.HexColor('#8e44ad'), colors.HexColor('#d35400')]
+
+
+class _Milestone(Flowable):
+    """Repère invisible : appelle `callback` quand la mise en page l'atteint"""
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        self.callback()
+
+
+def register_fonts(fonts):
+    """Enregistrer les polices TrueType {nom: chemin} (une fois, au démarrage)"""
+    registered = set(pdfmetrics.getRegisteredFontNames())
+    for name, path in (fonts or {}).items():
+        if name not in registered:
+            pdfmetrics.registerFont(TTFont(name, path))
+
+
+def init_pdf_resources(app):
+    """Préparer polices et styles au démarrage de l'application"""
+    register_fonts(app.config['PDF_FONTS'])
+    get_styles()
+
 
 class PDFGenerator:
     """Générateur de documents PDF au format A4"""
 
+    # À incrémenter à chaque changement de mise en page (invalide le cache des PDF)
+    TEMPLATE_VERSION = 2
+
+    # Lignes par tableau d'historique (petits tableaux répartis sur les pages)
+    HISTORY_ROWS_PER_TABLE = 40
+
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.setup_custom_styles()
-
-    def setup_custom_styles(self):
-        """Configurer les styles personnalisés"""
-        # Style pour le titre
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#2c3e50'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        ))
-
-        # Style pour les sous-titres
-        self.styles.add(ParagraphStyle(
-            name='CustomHeading',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#34495e'),
-            spaceAfter=12,
-            spaceBefore=12
-        ))
-
-        # Style pour le texte normal
-        self.styles.add(ParagraphStyle(
-            name='CustomBody',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            spaceAfter=8
-        ))
+        self.styles = get_styles()
 
-    def generate_session_report(self, session, filepath):
-        """Générer un compte-rendu de séance"""
+    def _build(self, filepath, story):
+        """Mettre en page un contenu au format A4 (chemin ou fichier ouvert)"""
         doc = SimpleDocTemplate(filepath, pagesize=A4,
                               rightMargin=2*cm, leftMargin=2*cm,
                               topMargin=2*cm, bottomMargin=2*cm)
+        doc.build(story)
+
+    def _footer(self, story):
+        """Ajouter la date de génération en fin de document"""
+        story.append(Spacer(1, 1*cm))
+        footer_text = f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
+        story.append(Paragraph(footer_text, self.styles['Normal']))
 
+    def generate_session_report(self, session, filepath):
+        """Générer un compte-rendu de séance"""
+        self._build(filepath, self.session_report_story(session))
+
+    def generate_questionnaire_report(self, response, filepath):
+        """Générer un rapport de questionnaire"""
+        self._build(filepath, self.questionnaire_report_story(response))
+
+    def generate_patient_file(self, patient, filepath, history=None):
+        """Générer le dossier patient complet (avec séances et scores si `history` est fourni)"""
+        self._build(filepath, self.patient_file_story(patient, history))
+
+    def generate_merged(self, stories, filepath, on_document=None):
+        """Réunir plusieurs documents dans un seul PDF (un document par page)
+
+        `on_document()` est appelé à la fin de la mise en page de chaque document.
+        """
+        merged = []
+        for story in stories:
+            if merged:
+                merged.append(PageBreak())
+            merged.extend(story)
+            if on_document:
+                merged.append(_Milestone(on_document))
+        self._build(filepath, merged)
+
+    def session_report_story(self, session):
+        """Contenu d'un compte-rendu de séance"""
         story = []
 
         # En-tête
@@ -67,15 +201,7 @@ class PDFGenerator:
         ]
 
         info_table = Table(info_data, colWidths=[5*cm, 12*cm])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-        ]))
+        info_table.setStyle(LABEL_TABLE_STYLE)
 
         story.append(info_table)
         story.append(Spacer(1, 0.7*cm))
@@ -108,12 +234,7 @@ class PDFGenerator:
                 eval_data.append(['Anxiété:', f"{session.anxiety_score}/10"])
 
             eval_table = Table(eval_data, colWidths=[5*cm, 12*cm])
-            eval_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8)
-            ]))
+            eval_table.setStyle(GRID_TABLE_STYLE)
             story.append(eval_table)
             story.append(Spacer(1, 0.5*cm))
 
@@ -129,19 +250,12 @@ class PDFGenerator:
             story.append(Paragraph(session.next_session_plan, self.styles['CustomBody']))
 
         # Pied de page
-        story.append(Spacer(1, 1*cm))
-        footer_text = f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-        story.append(Paragraph(footer_text, self.styles['Normal']))
+        self._footer(story)
 
-        # Générer le PDF
-        doc.build(story)
-
-    def generate_questionnaire_report(self, response, filepath):
-        """Générer un rapport de questionnaire"""
-        doc = SimpleDocTemplate(filepath, pagesize=A4,
-                              rightMargin=2*cm, leftMargin=2*cm,
-                              topMargin=2*cm, bottomMargin=2*cm)
+        return story
 
+    def questionnaire_report_story(self, response):
+        """Contenu d'un rapport de questionnaire"""
         story = []
 
         # En-tête
@@ -158,15 +272,7 @@ class PDFGenerator:
         ]
 
         info_table = Table(info_data, colWidths=[5*cm, 12*cm])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-        ]))
+        info_table.setStyle(LABEL_TABLE_STYLE)
 
         story.append(info_table)
         story.append(Spacer(1, 0.7*cm))
@@ -197,19 +303,12 @@ class PDFGenerator:
             story.append(Paragraph(response.notes, self.styles['CustomBody']))
 
         # Pied de page
-        story.append(Spacer(1, 1*cm))
-        footer_text = f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-        story.append(Paragraph(footer_text, self.styles['Normal']))
+        self._footer(story)
 
-        # Générer le PDF
-        doc.build(story)
-
-    def generate_patient_file(self, patient, filepath):
-        """Générer le dossier patient complet"""
-        doc = SimpleDocTemplate(filepath, pagesize=A4,
-                              rightMargin=2*cm, leftMargin=2*cm,
-                              topMargin=2*cm, bottomMargin=2*cm)
+        return story
 
+    def patient_file_story(self, patient, history=None):
+        """Contenu du dossier patient complet"""
         story = []
 
         # En-tête
@@ -229,13 +328,7 @@ class PDFGenerator:
         ]
 
         info_table = Table(info_data, colWidths=[5*cm, 12*cm])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8)
-        ]))
+        info_table.setStyle(LABEL_TABLE_STYLE)
 
         story.append(info_table)
         story.append(Spacer(1, 0.7*cm))
@@ -251,14 +344,7 @@ class PDFGenerator:
         ]
 
         medical_table = Table(medical_data, colWidths=[5*cm, 12*cm])
-        medical_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP')
-        ]))
+        medical_table.setStyle(LABEL_TABLE_STYLE_TOP)
 
         story.append(medical_table)
         story.append(Spacer(1, 0.7*cm))
@@ -272,13 +358,7 @@ class PDFGenerator:
         ]
 
         therapy_table = Table(therapy_data, colWidths=[5*cm, 12*cm])
-        therapy_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8)
-        ]))
+        therapy_table.setStyle(LABEL_TABLE_STYLE)
 
         story.append(therapy_table)
         story.append(Spacer(1, 0.5*cm))
@@ -288,10 +368,87 @@ class PDFGenerator:
             story.append(Paragraph("Notes", self.styles['CustomHeading']))
             story.append(Paragraph(patient.notes, self.styles['CustomBody']))
 
-        # Pied de page
-        story.append(Spacer(1, 1*cm))
-        footer_text = f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-        story.append(Paragraph(footer_text, self.styles['Normal']))
+        if history is not None:
+            self._history_section(story, history)
 
-        # Générer le PDF
-        doc.build(story)
+        # Pied de page
+        self._footer(story)
+
+        return story
+
+    def _history_section(self, story, history):
+        """Évolution des scores et historique des séances"""
+        session_series = history.session_series()
+        questionnaire_series = history.questionnaire_series()
+        if session_series or questionnaire_series:
+            story.append(PageBreak())
+            story.append(Paragraph("Évolution des scores", self.styles['CustomHeading']))
+            if session_series:
+                story.append(self._line_chart("Humeur et anxiété (séances)", session_series, 0, 10))
+                story.append(Spacer(1, 0.5*cm))
+            for name, points in questionnaire_series.values():
+                story.append(self._line_chart(name, {'Score total': points}))
+                story.append(Spacer(1, 0.5*cm))
+
+        header = ['Date', 'N°', 'Type', 'Humeur', 'Anxiété', 'Objectifs']
+        cell_style = self.styles['BodyText']
+        rows = []
+        started = False
+        for session_date, number, therapy_type, mood, anxiety, objectives in history.session_rows():
+            if not started:
+                story.append(Paragraph("Historique des séances", self.styles['CustomHeading']))
+                started = True
+            rows.append([
+                session_date.strftime('%d/%m/%Y'),
+                str(number) if number else '',
+                Paragraph(escape(therapy_type or ''), cell_style),
+                f"{mood}/10" if mood else '',
+                f"{anxiety}/10" if anxiety else '',
+                # Extrait tronqué : échappé pour ne pas laisser de balise ouverte
+                Paragraph(escape(objectives or ''), cell_style)
+            ])
+            if len(rows) == self.HISTORY_ROWS_PER_TABLE:
+                story.append(self._history_table(header, rows))
+                rows = []
+        if rows:
+            story.append(self._history_table(header, rows))
+
+    def _history_table(self, header, rows):
+        table = Table([header] + rows, colWidths=[2.2*cm, 1*cm, 3*cm, 1.6*cm, 1.6*cm, 7.6*cm], repeatRows=1)
+        table.setStyle(HISTORY_TABLE_STYLE)
+        return table
+
+    def _line_chart(self, title, series, y_min=None, y_max=None):
+        """Courbe(s) {libellé: [(jour ordinal, valeur)]} avec les dates en abscisse"""
+        drawing = Drawing(17*cm, 6.5*cm)
+        drawing.add(String(0, 6.5*cm - 12, title, fontName='Helvetica-Bold', fontSize=10))
+
+        plot = LinePlot()
+        plot.x, plot.y = 1.2*cm, 1*cm
+        plot.width, plot.height = 12.5*cm, 4.6*cm
+        plot.data = list(series.values())
+
+        xs = [x for points in plot.data for x, _ in points]
+        ys = [y for points in plot.data for _, y in points]
+        plot.xValueAxis.valueMin = min(xs) - 1
+        plot.xValueAxis.valueMax = max(xs) + 1
+        plot.xValueAxis.labelTextFormat = lambda x: date.fromordinal(int(x)).strftime('%m/%Y')
+        plot.xValueAxis.labels.fontSize = 7
+        plot.xValueAxis.maximumTicks = 6
+        plot.yValueAxis.valueMin = y_min if y_min is not None else min(0, min(ys))
+        plot.yValueAxis.valueMax = y_max if y_max is not None else max(ys) * 1.1 or 1
+        plot.yValueAxis.labels.fontSize = 7
+
+        for index, points in enumerate(plot.data):
+            color = CHART_COLORS[index % len(CHART_COLORS)]
+            plot.lines[index].strokeColor = color
+            if len(points) <= 40:
+                plot.lines[index].symbol = makeMarker('FilledCircle', size=3, fillColor=color)
+        drawing.add(plot)
+
+        legend = Legend()
+        legend.x, legend.y = 14.2*cm, 4.8*cm
+        legend.fontSize = 8
+        legend.colorNamePairs = [(CHART_COLORS[i % len(CHART_COLORS)], label) for i, label in enumerate(series)]
+        drawing.add(legend)
+        return drawing
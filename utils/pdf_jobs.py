@@ -0,0 +1,379 @@
+"""
+File d'attente des générations PDF
+Les rendus ReportLab sont exécutés par un pool de threads borné ;
+chaque travail est enregistré dans la table pdf_jobs (reprise après redémarrage).
+Un document dont les données sources n'ont pas changé est resservi depuis le cache ;
+les exports groupés passent par la même file, avec leur avancement
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+
+from extensions import db
+from models import Document, Patient, PdfJob, QuestionnaireResponse, TherapySession
+from utils import pdf_cache
+from utils.patient_dossier import PatientHistory
+from utils.pdf_export import count_items, export_merged, export_zip, iter_items
+from utils.pdf_generator import PDFGenerator
+
+
+class PdfSpec:
+    """Description d'un document à produire : données sources, métadonnées et rendu"""
+
+    def __init__(self, kind, patient_id, download_name, document_type, title, payload, render):
+        self.kind = kind
+        self.patient_id = patient_id
+        self.download_name = download_name
+        self.document_type = document_type
+        self.title = title
+        self.fingerprint = pdf_cache.fingerprint(kind, payload)
+        self.render = render
+
+
+def _model_values(instance):
+    """Valeurs de toutes les colonnes d'un enregistrement"""
+    return {column.key: getattr(instance, column.key) for column in instance.__table__.columns}
+
+
+def _session_report_spec(session_id):
+    """Compte-rendu de séance"""
+    session = db.session.get(TherapySession, session_id)
+    if session is None:
+        raise LookupError(f'Séance {session_id} introuvable')
+    patient = session.patient
+
+    return PdfSpec(
+        kind='session_report',
+        patient_id=session.patient_id,
+        download_name=f"compte_rendu_seance_{session.id}_{session.session_date.strftime('%Y%m%d')}.pdf",
+        document_type='Compte-rendu de séance',
+        title=f"Séance du {session.session_date.strftime('%d/%m/%Y')}",
+        payload={
+            'session': _model_values(session),
+            'patient': [patient.first_name, patient.last_name],
+        },
+        render=lambda path: PDFGenerator().generate_session_report(session, path)
+    )
+
+
+def _questionnaire_report_spec(response_id):
+    """Rapport de questionnaire"""
+    response = db.session.get(QuestionnaireResponse, response_id)
+    if response is None:
+        raise LookupError(f'Réponse {response_id} introuvable')
+    questionnaire = response.questionnaire
+    patient = response.patient
+
+    return PdfSpec(
+        kind='questionnaire_report',
+        patient_id=response.patient_id,
+        download_name=f"questionnaire_{questionnaire.short_name}_{response.patient_id}_{response.completed_at.strftime('%Y%m%d')}.pdf",
+        document_type='Questionnaire',
+        title=f"{questionnaire.name} - {response.completed_at.strftime('%d/%m/%Y')}",
+        payload={
+            'response': _model_values(response),
+            'questionnaire': [questionnaire.name, questionnaire.questions],
+            'patient': [patient.first_name, patient.last_name],
+        },
+        render=lambda path: PDFGenerator().generate_questionnaire_report(response, path)
+    )
+
+
+def _patient_file_spec(patient_id):
+    """Dossier patient complet"""
+    patient = db.session.get(Patient, patient_id)
+    if patient is None:
+        raise LookupError(f'Patient {patient_id} introuvable')
+
+    history = PatientHistory(
+        patient.id,
+        chunk_size=current_app.config['PDF_DOSSIER_CHUNK_SIZE'],
+        max_points=current_app.config['PDF_CHART_MAX_POINTS']
+    )
+
+    return PdfSpec(
+        kind='patient_file',
+        patient_id=patient.id,
+        download_name=f"dossier_patient_{patient.id}_{patient.last_name.replace(' ', '_')}.pdf",
+        document_type='Dossier patient',
+        title=f"Dossier complet - {patient.first_name} {patient.last_name}",
+        payload={'patient': _model_values(patient), 'history': history.fingerprint()},
+        render=lambda path: PDFGenerator().generate_patient_file(patient, path, history)
+    )
+
+
+SPEC_BUILDERS = {
+    'session_report': _session_report_spec,
+    'questionnaire_report': _questionnaire_report_spec,
+    'patient_file': _patient_file_spec,
+}
+
+
+def build_spec(kind, target_id):
+    """Construire la description du document demandé"""
+    if kind not in SPEC_BUILDERS:
+        raise ValueError(f'Type de document inconnu: {kind}')
+    return SPEC_BUILDERS[kind](target_id)
+
+
+def get_or_create_document(spec, path):
+    """Document correspondant aux données sources (créé s'il n'existe pas encore)
+
+    Un Document dont le fichier a été évincé du cache y est rattaché à nouveau.
+    """
+    document = pdf_cache.find_document(spec.patient_id, spec.fingerprint, path)
+    if document is None:
+        document = Document(
+            patient_id=spec.patient_id,
+            document_type=spec.document_type,
+            title=spec.title,
+            file_path=path,
+            fingerprint=spec.fingerprint
+        )
+        db.session.add(document)
+        db.session.flush()
+    elif document.file_path != path or document.fingerprint != spec.fingerprint:
+        document.file_path = path
+        document.fingerprint = spec.fingerprint
+        db.session.flush()
+    return document
+
+
+def render_to_spool(spec, max_size):
+    """Rendre le document en mémoire (sur disque seulement au-delà de max_size octets)"""
+    buffer = tempfile.SpooledTemporaryFile(max_size=max_size, mode='w+b')
+    spec.render(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def persist_spool(buffer, path):
+    """Enregistrer dans le cache une copie d'un rendu en mémoire"""
+    def copy(tmp_path):
+        with open(tmp_path, 'wb') as target:
+            shutil.copyfileobj(buffer, target)
+
+    buffer.seek(0)
+    pdf_cache.store(path, copy)
+    buffer.seek(0)
+
+
+class PdfJobQueue:
+    """Exécution des générations PDF hors de la requête HTTP"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self._recovered = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config['PDF_WORKERS'],
+            thread_name_prefix='pdf-job'
+        )
+
+    def enqueue(self, kind, target_id, patient_id=None):
+        """Enregistrer un travail et le confier au pool ; retourne le PdfJob"""
+        spec = build_spec(kind, target_id)
+        self._recover_pending()
+
+        job = PdfJob(kind=kind, target_id=target_id, patient_id=patient_id or spec.patient_id,
+                     status='pending', download_name=spec.download_name)
+
+        # Rendu déjà en cache : le travail est terminé sans passer par le pool
+        path = self.cache_path(spec)
+        if pdf_cache.lookup(path):
+            self._complete(job, spec, path)
+            db.session.add(job)
+            db.session.commit()
+            return job
+
+        db.session.add(job)
+        db.session.commit()
+
+        self.executor.submit(self._run, job.id)
+        return job
+
+    def enqueue_export(self, patient_id, start, end, output_format, download_name):
+        """Enregistrer un export groupé (ZIP ou PDF unique) et le confier au pool"""
+        self._recover_pending()
+
+        job = PdfJob(kind='export', target_id=patient_id or 0, patient_id=patient_id,
+                     status='pending', download_name=download_name, params={
+                         'patient_id': patient_id,
+                         'start': start.isoformat() if start else None,
+                         'end': end.isoformat() if end else None,
+                         'format': output_format,
+                     })
+        db.session.add(job)
+        db.session.commit()
+
+        self.executor.submit(self._run, job.id)
+        return job
+
+    def rerun(self, job):
+        """Relancer une génération terminée dont le fichier a disparu du cache"""
+        job.status = 'pending'
+        job.file_path = None
+        job.attempts = 0
+        job.error = None
+        db.session.commit()
+
+        self.executor.submit(self._run, job.id)
+        return job
+
+    def cache_path(self, spec):
+        """Emplacement du rendu en cache pour ce document"""
+        return pdf_cache.cache_path(self.app.config['PDF_CACHE_FOLDER'], spec.kind, spec.fingerprint)
+
+    def _complete(self, job, spec, path):
+        """Associer au travail le fichier produit et son Document (sans doublon)"""
+        document = get_or_create_document(spec, path)
+
+        job.file_path = path
+        job.download_name = spec.download_name
+        job.document_id = document.id
+        job.status = 'done'
+        job.error = None
+
+    def _recover_pending(self):
+        """Relancer une fois les travaux interrompus par un redémarrage"""
+        with self._lock:
+            if self._recovered:
+                return
+            self._recovered = True
+
+        # Seuls les travaux sans nouvelles depuis PDF_JOB_TIMEOUT sont repris :
+        # les autres appartiennent peut-être à un autre worker encore actif
+        stale_before = datetime.utcnow() - timedelta(seconds=self.app.config['PDF_JOB_TIMEOUT'])
+        interrupted = PdfJob.query.filter(
+            PdfJob.status.in_(['pending', 'running']),
+            PdfJob.updated_at < stale_before
+        ).all()
+        for job in interrupted:
+            job.status = 'pending'
+        db.session.commit()
+        for job in interrupted:
+            self.executor.submit(self._run, job.id)
+
+    def _claim(self, job_id):
+        """Passer un travail de 'pending' à 'running' ; False s'il est déjà pris"""
+        claimed = db.session.execute(
+            update(PdfJob)
+            .where(PdfJob.id == job_id, PdfJob.status == 'pending')
+            .values(status='running', attempts=PdfJob.attempts + 1, updated_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        return claimed == 1
+
+    def _export(self, job):
+        """Rendre un export groupé dans PDF_EXPORT_FOLDER (documents lus par lots)"""
+        params = job.params
+        patient_id = params.get('patient_id')
+        start = date.fromisoformat(params['start']) if params.get('start') else None
+        end = date.fromisoformat(params['end']) if params.get('end') else None
+
+        total = count_items(patient_id, start, end)
+        progress = self._progress_reporter(job.id, total)
+        progress(0, total)
+
+        items = iter_items(patient_id, start, end)
+        if params['format'] == 'pdf':
+            def render(path):
+                export_merged(items, path, total=total, progress=progress)
+        else:
+            def render(path):
+                export_zip(items, path, total=total, workers=self.app.config['PDF_EXPORT_WORKERS'],
+                           fonts=self.app.config['PDF_FONTS'], progress=progress)
+
+        folder = self.app.config['PDF_EXPORT_FOLDER']
+        path = os.path.join(folder, f"export_{job.id}.{params['format']}")
+        pdf_cache.store(path, render)
+        pdf_cache.evict(folder, 0, self.app.config['PDF_EXPORT_MAX_AGE_DAYS'])
+
+        job.file_path = path
+        job.progress_done = job.progress_total = total
+        job.status = 'done'
+        job.error = None
+
+    def _progress_reporter(self, job_id, total, interval=1.0):
+        """Avancement d'un export, enregistré au plus une fois par `interval` secondes
+
+        Écrit sur une connexion à part (la session lit encore les documents par lots) ;
+        la mise à jour de updated_at signale aussi que le travail est toujours actif.
+        """
+        last = 0.0
+
+        def progress(done, _total):
+            nonlocal last
+            now = time.monotonic()
+            if done and done < total and now - last < interval:
+                return
+            last = now
+            with db.engine.begin() as connection:
+                connection.execute(
+                    PdfJob.__table__.update().where(PdfJob.id == job_id)
+                    .values(progress_done=done, progress_total=total, updated_at=datetime.utcnow())
+                )
+        return progress
+
+    def _schedule_retry(self, job_id, attempts):
+        """Relancer un travail en échec après un délai croissant"""
+        delay = self.app.config['PDF_JOB_RETRY_DELAY'] * 2 ** (attempts - 1)
+        timer = threading.Timer(delay, self.executor.submit, args=(self._run, job_id))
+        timer.daemon = True
+        timer.start()
+
+    def _run(self, job_id):
+        """Exécuter un travail (dans un thread du pool)"""
+        with self.app.app_context():
+            try:
+                if not self._claim(job_id):
+                    return
+                job = db.session.get(PdfJob, job_id)
+
+                try:
+                    if job.kind == 'export':
+                        self._export(job)
+                    else:
+                        spec = build_spec(job.kind, job.target_id)
+                        path = self.cache_path(spec)
+                        if not pdf_cache.lookup(path):
+                            pdf_cache.store(path, spec.render)
+                            pdf_cache.evict(
+                                self.app.config['PDF_CACHE_FOLDER'],
+                                self.app.config['PDF_CACHE_MAX_BYTES'],
+                                self.app.config['PDF_CACHE_MAX_AGE_DAYS']
+                            )
+
+                        self._complete(job, spec, path)
+                    db.session.commit()
+
+                except Exception as e:
+                    db.session.rollback()
+                    job = db.session.get(PdfJob, job_id)
+                    job.error = str(e)
+                    if job.attempts < self.app.config['PDF_JOB_MAX_ATTEMPTS']:
+                        job.status = 'pending'
+                        db.session.commit()
+                        self._schedule_retry(job_id, job.attempts)
+                    else:
+                        job.status = 'failed'
+                        db.session.commit()
+            finally:
+                db.session.remove()
+
+
+pdf_job_queue = PdfJobQueue()
@@ -70,6 +70,16 @@ Interprétation pour chaque sous-échelle:
 - 8-10: Symptomatologie douteuse
 - 11-21: Symptomatologie certaine
         ''',
+        'scoring': {
+            'aggregate': 'sum',
+            'reliability': 0.83,
+            'subscales': {
+                'anxiety': {'label': 'Anxiété (A)',
+                            'cutoffs': [[0, 'Absence de symptomatologie'], [8, 'Symptomatologie douteuse'], [11, 'Symptomatologie certaine']]},
+                'depression': {'label': 'Dépression (D)',
+                               'cutoffs': [[0, 'Absence de symptomatologie'], [8, 'Symptomatologie douteuse'], [11, 'Symptomatologie certaine']]}
+            }
+        },
         'interpretation': '''
 L'échelle HAD permet d'évaluer l'anxiété et la dépression chez les patients.
 Chaque sous-échelle (A et D) est cotée de 0 à 21.
@@ -138,6 +148,12 @@ Interprétation (version complète 21 items):
 - 20-28: Dépression modérée
 - 29-63: Dépression sévère
         ''',
+        'scoring': {
+            'aggregate': 'sum',
+            'reliability': 0.92,
+            'cutoffs': [[0, 'Dépression minimale'], [14, 'Dépression légère'],
+                        [20, 'Dépression modérée'], [29, 'Dépression sévère']]
+        },
         'interpretation': '''
 Le BDI-II est un outil de référence pour évaluer la sévérité de la dépression.
 Cette version simplifiée ne permet qu'une estimation partielle.
@@ -184,6 +200,12 @@ Interprétation:
 - Score moyen (17-24): Inflexibilité modérée
 - Score faible (<17): Bonne flexibilité psychologique
         ''',
+        'scoring': {
+            'aggregate': 'sum',
+            'reliability': 0.84,
+            'cutoffs': [[7, 'Bonne flexibilité psychologique'], [17, 'Inflexibilité modérée'],
+                        [24, 'Forte inflexibilité psychologique, évitement expérientiel important', 'strict']]
+        },
         'interpretation': '''
 L'AAQ-II mesure l'inflexibilité psychologique et l'évitement expérientiel,
 des concepts centraux en thérapie ACT (Acceptance and Commitment Therapy).
@@ -225,6 +247,14 @@ Interprétation:
 - Score moyen (3-4.5): Capacité modérée
 - Score faible (<3): Faible capacité de pleine conscience, tendance à l'inattention
         ''',
+        'scoring': {
+            'aggregate': 'mean',
+            'label': 'Score moyen',
+            'reliability': 0.82,
+            'higher_is_better': True,
+            'cutoffs': [[1, 'Faible capacité de pleine conscience, tendance à l\'inattention'],
+                        [3, 'Capacité modérée'], [4.5, 'Bonne capacité de pleine conscience', 'strict']]
+        },
         'interpretation': '''
 La MAAS évalue la disposition à être attentif et conscient de l'expérience du moment présent
 dans la vie quotidienne. Les scores élevés indiquent une plus grande conscience et attention.
@@ -265,6 +295,12 @@ Interprétation:
 - Score moyen (12-18): Évolution modérée
 - Score faible (<12): Difficultés persistantes
         ''',
+        'scoring': {
+            'aggregate': 'sum',
+            'higher_is_better': True,
+            'cutoffs': [[5, 'Difficultés persistantes'], [12, 'Évolution modérée'],
+                        [18, 'Bonne évolution', 'strict']]
+        },
         'interpretation': '''
 Ce questionnaire permet un suivi régulier de l'évolution du patient
 entre les séances et d'identifier rapidement les domaines nécessitant attention.
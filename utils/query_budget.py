@@ -0,0 +1,41 @@
+"""
+Budget de requêtes SQL par route
+En mode test, une requête HTTP qui dépasse le nombre de requêtes SQL
+autorisé pour sa route échoue : les régressions N+1 sont détectées tout de suite
+"""
+
+from flask import current_app, g, request
+
+
+class QueryBudgetExceeded(AssertionError):
+    """La route a envoyé plus de requêtes SQL que son budget"""
+
+
+def query_budget(max_queries):
+    """Déclarer le nombre maximal de requêtes SQL d'une vue (à placer juste au-dessus du def)"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def _check_budget(response):
+    """Vérifier le budget de la route à la fin de la requête"""
+    app = current_app
+    if not (app.config['TESTING'] or app.config['QUERY_BUDGET_ENFORCE']):
+        return response
+
+    view = app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    # Compteur alimenté par le profileur SQL (utils.query_profiler)
+    count = g.sql_stats.count if 'sql_stats' in g else 0
+    if budget is not None and count > budget:
+        raise QueryBudgetExceeded(
+            f'{request.endpoint}: {count} requêtes SQL pour un budget de {budget}'
+        )
+    return response
+
+
+def init_query_budget(app):
+    """Vérifier les budgets de requêtes (nécessite le profileur SQL)"""
+    app.after_request(_check_budget)
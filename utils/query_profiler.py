@@ -0,0 +1,136 @@
+"""
+Profilage des requêtes SQL
+Nombre de requêtes, temps total et requêtes les plus lentes par requête HTTP,
+en-tête Server-Timing, panneau de debug optionnel et journal des requêtes lentes
+"""
+
+import heapq
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import g, has_request_context, request
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('cedricia.slow_queries')
+
+
+class RequestSQLStats:
+    """Statistiques SQL d'une requête HTTP"""
+
+    def __init__(self, keep_slowest=5):
+        self.count = 0
+        self.total_time = 0.0
+        self.keep_slowest = keep_slowest
+        self._slowest = []  # tas (durée, rang, requête)
+
+    def record(self, duration, statement):
+        self.count += 1
+        self.total_time += duration
+        entry = (duration, self.count, statement)
+        if len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        """Requêtes les plus lentes [(durée en secondes, requête)], la plus lente en premier"""
+        return [(duration, statement) for duration, _, statement in sorted(self._slowest, reverse=True)]
+
+
+def current_stats():
+    """Statistiques SQL de la requête HTTP en cours"""
+    if 'sql_stats' not in g:
+        g.sql_stats = RequestSQLStats()
+    return g.sql_stats
+
+
+class QueryProfiler:
+    """Extension Flask d'instrumentation des requêtes SQL"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.threshold = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.threshold = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000.0
+
+        log_path = app.config['SLOW_QUERY_LOG']
+        if log_path and not logger.handlers:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            handler = RotatingFileHandler(
+                log_path,
+                maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                backupCount=app.config['SLOW_QUERY_LOG_BACKUPS'],
+                encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            logger.addHandler(handler)
+            logger.setLevel(logging.WARNING)
+            logger.propagate = False
+
+        if not event.contains(Engine, 'before_cursor_execute', self._before_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_execute)
+            event.listen(Engine, 'handle_error', self._on_error)
+
+        app.after_request(self._after_request)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_start_time'].pop()
+
+        endpoint = '-'
+        if has_request_context():
+            current_stats().record(duration, statement)
+            endpoint = request.endpoint or request.path
+
+        if self.threshold is not None and duration >= self.threshold:
+            logger.warning('%.1f ms [%s] %s', duration * 1000, endpoint, ' '.join(statement.split()))
+
+    def _on_error(self, exception_context):
+        starts = exception_context.connection.info.get('query_start_time') if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+    def _after_request(self, response):
+        config = self.app.config
+        if 'sql_stats' not in g:
+            return response
+        stats = g.sql_stats
+
+        if config['SQL_SERVER_TIMING']:
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={stats.total_time * 1000:.2f};desc="{stats.count} requetes SQL"'
+            )
+
+        if config['SQL_DEBUG_PANEL'] and response.mimetype == 'text/html' and not response.direct_passthrough:
+            body = response.get_data(as_text=True)
+            if '</body>' in body:
+                response.set_data(body.replace('</body>', self._render_panel(stats) + '</body>', 1))
+
+        return response
+
+    def _render_panel(self, stats):
+        """Panneau HTML listant les requêtes de la page"""
+        rows = ''.join(
+            f'<li><strong>{duration * 1000:.2f} ms</strong> <code>{escape(statement)}</code></li>'
+            for duration, statement in stats.slowest
+        )
+        return (
+            '<div class="sql-debug-panel">'
+            f'<p>{stats.count} requêtes SQL, {stats.total_time * 1000:.2f} ms '
+            f'({escape(request.endpoint or request.path)})</p>'
+            f'<ol>{rows}</ol>'
+            '</div>'
+        )
@@ -0,0 +1,284 @@
+"""
+Cotation des questionnaires
+Chaque définition (questions, barèmes, sous-échelles, seuils) est compilée une fois
+en plan de cotation, mis en cache par questionnaire tant que la définition ne change pas
+"""
+
+import hashlib
+import json
+import threading
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from extensions import db
+from models import Questionnaire, QuestionnaireResponse
+from utils.predefined_questionnaires import get_predefined_questionnaires
+from utils.patient_summary import refresh_summaries
+from utils.change_log import record_changes
+from utils.cache import invalidate
+
+_plans = {}
+_plans_lock = threading.Lock()
+_predefined_scoring = None
+
+AGGREGATES = {
+    'sum': lambda values: sum(values),
+    'mean': lambda values: sum(values) / len(values),
+}
+
+
+def _default_scoring(short_name):
+    """Règles de cotation des questionnaires pré-définis (bases créées avant la colonne scoring)"""
+    global _predefined_scoring
+    if _predefined_scoring is None:
+        _predefined_scoring = {
+            q['short_name']: q.get('scoring') for q in get_predefined_questionnaires()
+        }
+    return _predefined_scoring.get(short_name)
+
+
+def _compile_cutoffs(cutoffs):
+    """[[seuil, libellé], ...] ou [seuil, libellé, 'strict'] (score > seuil), par seuil croissant"""
+    compiled = []
+    for cutoff in cutoffs or []:
+        threshold, label = cutoff[0], cutoff[1]
+        strict = len(cutoff) > 2 and cutoff[2] == 'strict'
+        compiled.append((float(threshold), strict, label))
+    return tuple(compiled)
+
+
+def _interpret(cutoffs, score):
+    """Libellé de la tranche du score (la première tranche couvre aussi les scores inférieurs)"""
+    if not cutoffs:
+        return None
+    label = cutoffs[0][2]
+    for threshold, strict, band in cutoffs:
+        if score > threshold or (not strict and score == threshold):
+            label = band
+        else:
+            break
+    return label
+
+
+class ScoringPlan:
+    """Plan de cotation compilé d'un questionnaire"""
+
+    def __init__(self, questions, scoring):
+        scoring = scoring or {}
+        self.aggregate = scoring.get('aggregate', 'sum')
+        self.cutoffs = _compile_cutoffs(scoring.get('cutoffs'))
+        self.total_label = scoring.get('label', 'Score total')
+        # Fidélité (alpha) et sens d'amélioration, pour l'indice de changement fiable
+        self.reliability = scoring.get('reliability')
+        self.higher_is_better = bool(scoring.get('higher_is_better'))
+
+        # (id de question, {réponse: score pondéré} ou None pour une valeur libre, poids, sous-échelle)
+        self.items = []
+        subscale_names = []
+        for idx, question in enumerate(questions or [], 1):
+            question_id = str(question.get('id', idx))
+            weight = float(question.get('weight', 1))
+            options = question.get('options') or []
+            scores = question.get('scores')
+            if options and scores is None:
+                scores = list(range(len(options)))
+                if question.get('reverse'):
+                    scores.reverse()
+
+            lookup = None
+            if scores is not None:
+                lookup = {}
+                # Le score lui-même est accepté (formulaires qui envoient la valeur cotée)
+                for score in scores:
+                    lookup[str(score)] = float(score) * weight
+                    lookup[str(float(score))] = float(score) * weight
+                for option, score in zip(options, scores):
+                    lookup[option] = float(score) * weight
+
+            subscale = question.get('subscale')
+            if subscale and subscale not in subscale_names:
+                subscale_names.append(subscale)
+            self.items.append((question_id, lookup, weight, subscale))
+
+        definitions = scoring.get('subscales') or {}
+        self.subscales = []
+        for name in subscale_names:
+            definition = definitions.get(name, {})
+            self.subscales.append((
+                name,
+                definition.get('label', name),
+                definition.get('aggregate', self.aggregate),
+                _compile_cutoffs(definition.get('cutoffs'))
+            ))
+
+    @property
+    def interprets(self):
+        """Le questionnaire définit-il des seuils d'interprétation ?"""
+        return bool(self.cutoffs) or any(cutoffs for _, _, _, cutoffs in self.subscales)
+
+    def _item_score(self, lookup, weight, value):
+        if value is None or value == '':
+            return None
+        if lookup is not None:
+            return lookup.get(str(value))
+        try:
+            return float(value) * weight
+        except (ValueError, TypeError):
+            return None
+
+    def score(self, answers):
+        """Coter un jeu de réponses : (score total, scores par sous-échelle, interprétation)"""
+        answers = answers or {}
+        values = []
+        by_subscale = {}
+        for question_id, lookup, weight, subscale in self.items:
+            item = self._item_score(lookup, weight, answers.get(question_id))
+            if item is None:
+                continue
+            values.append(item)
+            if subscale:
+                by_subscale.setdefault(subscale, []).append(item)
+
+        total = round(AGGREGATES[self.aggregate](values), 2) if values else None
+
+        subscale_scores = {}
+        lines = []
+        for name, label, aggregate, cutoffs in self.subscales:
+            items = by_subscale.get(name)
+            if not items:
+                continue
+            subscale_score = round(AGGREGATES[aggregate](items), 2)
+            subscale_scores[name] = subscale_score
+            band = _interpret(cutoffs, subscale_score)
+            if band:
+                lines.append(f"{label} : {subscale_score:g} - {band}")
+
+        if total is not None:
+            band = _interpret(self.cutoffs, total)
+            if band:
+                lines.append(f"{self.total_label} : {total:g} - {band}")
+
+        return total, subscale_scores or None, '\n'.join(lines) or None
+
+
+def _definition_digest(questionnaire, scoring):
+    raw = json.dumps([questionnaire.questions, scoring], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_plan(questionnaire):
+    """Plan de cotation du questionnaire (recompilé seulement si sa définition a changé)"""
+    scoring = questionnaire.scoring or _default_scoring(questionnaire.short_name)
+    digest = _definition_digest(questionnaire, scoring)
+
+    cached = _plans.get(questionnaire.id)
+    if cached is not None and cached[0] == digest:
+        return cached[1]
+
+    plan = ScoringPlan(questionnaire.questions, scoring)
+    with _plans_lock:
+        _plans[questionnaire.id] = (digest, plan)
+    return plan
+
+
+def evaluate(plan, answers, interpretation=None):
+    """(score total, sous-échelles, interprétation) ; sans seuils, l'interprétation fournie est conservée"""
+    total, subscales, computed = plan.score(answers)
+    if plan.interprets:
+        interpretation = computed
+    return total, subscales, interpretation
+
+
+def _apply(plan, response):
+    """Appliquer un plan à une réponse ; True si score ou interprétation ont changé"""
+    current = (response.total_score, response.subscale_scores, response.interpretation)
+    scored = evaluate(plan, response.responses, response.interpretation)
+    response.total_score, response.subscale_scores, response.interpretation = scored
+    return scored != current
+
+
+def score_response(response, questionnaire=None):
+    """Renseigner score total, sous-échelles et interprétation d'une réponse ; True si modifiée"""
+    return _apply(get_plan(questionnaire or response.questionnaire), response)
+
+
+def rescore_responses(responses, questionnaires):
+    """Recoter un lot de réponses ({id: Questionnaire}) ; retourne le nombre de réponses modifiées"""
+    plans = {}
+    changed = 0
+    for response in responses:
+        plan = plans.get(response.questionnaire_id)
+        if plan is None:
+            plan = plans[response.questionnaire_id] = get_plan(questionnaires[response.questionnaire_id])
+        if _apply(plan, response):
+            changed += 1
+    return changed
+
+
+def backfill_scores(chunk_size=1000, questionnaire_ids=None, dry_run=False, progress=None):
+    """Recoter toutes les réponses enregistrées, par lots ; retourne (lues, modifiées)
+
+    Chaque lot est lu par clé (id > dernier id), recoté, puis seules les lignes modifiées
+    sont réécrites en une mise à jour groupée et validées : aucune transaction longue
+    ne bloque la base. `progress(lues, modifiées)` est appelé après chaque lot.
+    """
+    questionnaires = Questionnaire.query
+    if questionnaire_ids:
+        questionnaires = questionnaires.filter(Questionnaire.id.in_(questionnaire_ids))
+    plans = {questionnaire.id: get_plan(questionnaire) for questionnaire in questionnaires}
+    if not plans:
+        return 0, 0
+
+    query = (
+        select(QuestionnaireResponse.id, QuestionnaireResponse.questionnaire_id,
+               QuestionnaireResponse.patient_id, QuestionnaireResponse.responses, QuestionnaireResponse.total_score,
+               QuestionnaireResponse.subscale_scores, QuestionnaireResponse.interpretation)
+        .where(QuestionnaireResponse.questionnaire_id.in_(list(plans)))
+        .order_by(QuestionnaireResponse.id)
+        .limit(chunk_size)
+    )
+
+    scanned = changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(QuestionnaireResponse.id > last_id)).all()
+        if not rows:
+            break
+
+        updates = []
+        changed_rows = []
+        now = datetime.utcnow()
+        for response_id, questionnaire_id, patient_id, answers, total, subscales, interpretation in rows:
+            scored = evaluate(plans[questionnaire_id], answers, interpretation)
+            if scored != (total, subscales, interpretation):
+                updates.append({
+                    'id': response_id,
+                    'total_score': scored[0],
+                    'subscale_scores': scored[1],
+                    'interpretation': scored[2],
+                    'updated_at': now,
+                })
+                changed_rows.append((response_id, patient_id))
+
+        if updates and not dry_run:
+            db.session.execute(update(QuestionnaireResponse), updates)
+            # La mise à jour groupée ne passe pas par le flush : synthèses, journal et caches
+            # (analyse, empreintes des PDF via updated_at) tenus à jour ici
+            connection = db.session.connection()
+            refresh_summaries(connection, {patient_id for _, patient_id in changed_rows})
+            record_changes(connection, QuestionnaireResponse.__tablename__, changed_rows, 'update',
+                           ['interpretation', 'subscale_scores', 'total_score'])
+        db.session.commit()
+        if updates and not dry_run:
+            invalidate(QuestionnaireResponse)
+
+        scanned += len(rows)
+        changed += len(updates)
+        last_id = rows[-1][0]
+        if progress:
+            progress(scanned, changed)
+        if len(rows) < chunk_size:
+            break
+
+    return scanned, changed
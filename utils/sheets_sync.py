@@ -0,0 +1,271 @@
+"""
+Synchronisation des feuilles de suivi Google Sheets
+Les séances et réponses d'un patient sont comparées (empreinte SHA-1) à ce qui a
+déjà été écrit ; seules les lignes nouvelles, modifiées ou supprimées partent,
+regroupées en un seul appel values.batchUpdate par feuille, sous un quota à jetons
+avec reprise exponentielle sur les erreurs 429 et 5xx
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from googleapiclient.errors import HttpError
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import QuestionnaireResponse, SheetSyncState, TherapySession
+
+SESSIONS_SHEET = 'Séances'
+QUESTIONNAIRES_SHEET = 'Questionnaires'
+
+SESSION_HEADERS = [
+    'Date', 'Numéro', 'Type de thérapie', 'Objectifs',
+    'Interventions', 'Progrès', 'Humeur (1-10)', 'Anxiété (1-10)',
+    'Exercices', 'Prochaine séance'
+]
+QUESTIONNAIRE_HEADERS = [
+    'Date', 'Questionnaire', 'Score total', 'Interprétation', 'Notes'
+]
+
+# Onglet et nombre de colonnes par type d'enregistrement
+TABS = {
+    'session': (SESSIONS_SHEET, len(SESSION_HEADERS)),
+    'questionnaire': (QUESTIONNAIRES_SHEET, len(QUESTIONNAIRE_HEADERS)),
+}
+
+# Erreurs HTTP passagères : quota dépassé ou serveur indisponible
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def session_row(session):
+    """Valeurs d'une séance dans l'onglet Séances"""
+    return [
+        session.session_date.strftime('%d/%m/%Y'),
+        session.session_number or '',
+        session.therapy_type or '',
+        session.objectives or '',
+        session.interventions or '',
+        session.patient_progress or '',
+        session.mood_score or '',
+        session.anxiety_score or '',
+        session.homework or '',
+        session.next_session_plan or ''
+    ]
+
+
+def questionnaire_row(response):
+    """Valeurs d'une réponse dans l'onglet Questionnaires"""
+    return [
+        response.completed_at.strftime('%d/%m/%Y'),
+        response.questionnaire.name,
+        response.total_score or '',
+        response.interpretation or '',
+        response.notes or ''
+    ]
+
+
+def content_hash(values):
+    """Empreinte des valeurs d'une ligne"""
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def _column_letter(number):
+    """Numéro de colonne (1 = A) en lettres A1"""
+    letters = ''
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+class TokenBucket:
+    """Limiteur de débit : `rate` jetons par seconde, au plus `capacity` d'avance"""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Prendre un jeton, en attendant qu'il soit disponible"""
+        with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self._sleep((1 - self._tokens) / self.rate)
+
+
+def _retry_after(error):
+    """Délai demandé par le serveur (en-tête Retry-After), en secondes"""
+    value = getattr(error.resp, 'get', lambda key: None)('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def execute_with_backoff(request, bucket=None, max_retries=5, base_delay=1.0, max_delay=32.0, sleep=time.sleep):
+    """Exécuter une requête Google API ; 429 et 5xx sont rejoués avec un délai croissant"""
+    attempt = 0
+    while True:
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return request.execute()
+        except HttpError as error:
+            if int(error.resp.status) not in RETRY_STATUSES or attempt >= max_retries:
+                raise
+            delay = _retry_after(error)
+            if delay is None:
+                # Délai exponentiel avec gigue pour ne pas relancer tous en même temps
+                delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1)
+            sleep(delay)
+            attempt += 1
+
+
+# Quota partagé par toutes les synchronisations du processus
+_shared_bucket = None
+_shared_bucket_lock = threading.Lock()
+
+
+def shared_bucket(config):
+    """Limiteur de débit commun, créé au premier usage selon la configuration"""
+    global _shared_bucket
+    with _shared_bucket_lock:
+        if _shared_bucket is None:
+            _shared_bucket = TokenBucket(config['SHEETS_REQUESTS_PER_MINUTE'] / 60, config['SHEETS_BURST'])
+        return _shared_bucket
+
+
+class SheetsSync:
+    """Pousse vers une feuille les lignes qui ont changé depuis la dernière synchronisation"""
+
+    def __init__(self, service, bucket=None, max_retries=5, sleep=time.sleep):
+        self.service = service
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.sleep = sleep
+
+    @classmethod
+    def from_config(cls, service, config=None):
+        """Synchroniseur avec le quota et les reprises de la configuration"""
+        config = config or current_app.config
+        return cls(service, bucket=shared_bucket(config), max_retries=config['SHEETS_MAX_RETRIES'])
+
+    def sync_patient(self, patient):
+        """Synchroniser toutes les séances et réponses d'un patient dans sa feuille"""
+        if not patient.google_spreadsheet_id:
+            raise ValueError(f'Aucune feuille Google Sheets pour le patient {patient.id}')
+
+        sessions = TherapySession.query.filter_by(patient_id=patient.id).order_by(
+            TherapySession.session_date, TherapySession.id
+        ).all()
+        responses = QuestionnaireResponse.query.options(
+            joinedload(QuestionnaireResponse.questionnaire)
+        ).filter_by(patient_id=patient.id).order_by(
+            QuestionnaireResponse.completed_at, QuestionnaireResponse.id
+        ).all()
+
+        return self.push(patient.google_spreadsheet_id, {
+            'session': [(session.id, session_row(session)) for session in sessions],
+            'questionnaire': [(response.id, questionnaire_row(response)) for response in responses],
+        })
+
+    def push(self, spreadsheet_id, records):
+        """Écrire les différences entre `records` ({type: [(id, valeurs)]}) et l'état enregistré
+
+        Tous les enregistrements de la feuille doivent être fournis : ceux qui n'y sont
+        plus voient leur ligne effacée. L'état n'est mis à jour qu'après l'écriture.
+        """
+        states = {
+            (state.record_type, state.record_id): state
+            for state in SheetSyncState.query.filter_by(spreadsheet_id=spreadsheet_id)
+        }
+        next_rows = {record_type: 2 for record_type in TABS}
+        for state in states.values():
+            next_rows[state.record_type] = max(next_rows[state.record_type], state.row_number + 1)
+
+        writes = []  # (type, ligne, valeurs)
+        added, changed = [], []
+        stats = {'written': 0, 'cleared': 0, 'unchanged': 0, 'requests': 0}
+
+        for record_type, rows in records.items():
+            for record_id, values in rows:
+                digest = content_hash(values)
+                state = states.pop((record_type, record_id), None)
+                if state is None:
+                    row_number = next_rows[record_type]
+                    next_rows[record_type] += 1
+                    writes.append((record_type, row_number, values))
+                    added.append((record_type, record_id, row_number, digest))
+                elif state.content_hash != digest:
+                    writes.append((record_type, state.row_number, values))
+                    changed.append((state, digest))
+                else:
+                    stats['unchanged'] += 1
+
+        # Enregistrements supprimés localement : la ligne est vidée
+        removed = list(states.values())
+        for state in removed:
+            writes.append((state.record_type, state.row_number, [''] * TABS[state.record_type][1]))
+
+        if writes:
+            request = self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={'valueInputOption': 'USER_ENTERED', 'data': self._ranges(writes)}
+            )
+            execute_with_backoff(request, self.bucket, self.max_retries, sleep=self.sleep)
+            stats['requests'] = 1
+
+        now = datetime.utcnow()
+        for record_type, record_id, row_number, digest in added:
+            db.session.add(SheetSyncState(
+                spreadsheet_id=spreadsheet_id, record_type=record_type, record_id=record_id,
+                row_number=row_number, content_hash=digest
+            ))
+        for state, digest in changed:
+            state.content_hash = digest
+            state.synced_at = now
+        for state in removed:
+            db.session.delete(state)
+        db.session.commit()
+
+        stats['written'] = len(added) + len(changed)
+        stats['cleared'] = len(removed)
+        return stats
+
+    @staticmethod
+    def _ranges(writes):
+        """Regrouper les lignes consécutives d'un même onglet en une seule plage A1"""
+        data = []
+        for record_type, row_number, values in sorted(writes, key=lambda write: write[:2]):
+            previous = data[-1] if data else None
+            if previous and previous['_type'] == record_type and previous['_end'] == row_number - 1:
+                previous['values'].append(values)
+                previous['_end'] = row_number
+            else:
+                data.append({'_type': record_type, '_start': row_number, '_end': row_number,
+                             'values': [values]})
+
+        ranges = []
+        for block in data:
+            sheet, width = TABS[block['_type']]
+            last_column = _column_letter(width)
+            ranges.append({
+                'range': f"{sheet}!A{block['_start']}:{last_column}{block['_end']}",
+                'values': block['values'],
+            })
+        return ranges